@@ -0,0 +1,295 @@
+"""
+Admission Control Module
+
+This module keeps slow report queries from starving order placement:
+
+    - Statement budgets: every request runs its queries under the
+      statement_timeout configured for its blueprint (STATEMENT_TIMEOUTS).
+      The pool applies it when a connection is checked out (see
+      database.set_statement_timeout), so handlers need no changes.
+    - Report admission: at most REPORTS_MAX_CONCURRENT report requests run
+      at once per worker, a dashboard counting as many as it has threads.
+      Up to REPORTS_MAX_QUEUE more wait up to REPORTS_QUEUE_TIMEOUT seconds for
+      a slot; anything beyond that is turned away with HTTP 503 and a
+      Retry-After header. The remaining pooled connections stay free for
+      order placement.
+    - Disconnect cancellation: while a report query runs, a watcher thread
+      polls the client's socket and cancels the query on the server once the
+      client has gone away. This needs the socket from the WSGI server
+      (gunicorn provides it); elsewhere queries simply run to completion.
+
+Optional Settings:
+    - STATEMENT_TIMEOUTS: Comma-separated blueprint=milliseconds budgets
+      (defaults to "reports=30000,transactions=10000"; blueprints not listed
+      use the server's statement_timeout)
+    - REPORTS_MAX_CONCURRENT: Report slots per worker process (defaults to 4)
+    - REPORTS_MAX_QUEUE: Report requests that may wait for a slot (defaults to 8)
+    - REPORTS_QUEUE_TIMEOUT: Seconds a report request waits for a slot (defaults to 5)
+    - REPORTS_RETRY_AFTER: Retry-After seconds sent with a 503 (defaults to 5)
+    - REPORTS_DISCONNECT_POLL: Seconds between client socket checks (defaults to 0.5)
+"""
+
+import contextvars
+import os
+import select
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import g, jsonify, request
+
+from .database import reset_statement_timeout, set_statement_timeout
+
+
+def _parse_budgets(value):
+    budgets = {}
+    for part in value.split(","):
+        if "=" in part:
+            name, ms = part.split("=", 1)
+            budgets[name.strip()] = int(ms)
+    return budgets
+
+
+STATEMENT_TIMEOUTS = _parse_budgets(os.getenv("STATEMENT_TIMEOUTS", "reports=30000,transactions=10000"))
+REPORTS_MAX_CONCURRENT = int(os.getenv("REPORTS_MAX_CONCURRENT", "4"))
+REPORTS_MAX_QUEUE = int(os.getenv("REPORTS_MAX_QUEUE", "8"))
+REPORTS_QUEUE_TIMEOUT = float(os.getenv("REPORTS_QUEUE_TIMEOUT", "5"))
+REPORTS_RETRY_AFTER = int(os.getenv("REPORTS_RETRY_AFTER", "5"))
+REPORTS_DISCONNECT_POLL = float(os.getenv("REPORTS_DISCONNECT_POLL", "0.5"))
+
+# socket of the client whose request this context is serving, if the server exposes it
+_client_socket = contextvars.ContextVar("client_socket", default=None)
+
+
+class _Slot:
+    """Admission granted to one request; release() is safe to call more than once."""
+
+    __slots__ = ("_limiter", "_weight", "_released")
+
+    def __init__(self, limiter, weight):
+        self._limiter = limiter
+        self._weight = weight
+        self._released = False
+
+    def release(self):
+        with self._limiter._cond:
+            if self._released:
+                return
+            self._released = True
+            self._limiter._active -= self._weight
+            self._limiter._cond.notify_all()
+
+
+class ConcurrencyLimiter:
+    """
+    Bounded, first-come first-served admission with a short waiting queue.
+
+    Args:
+        max_active: Total weight of requests allowed to run at once
+        max_queue: Requests allowed to wait for capacity
+        queue_timeout: Seconds a request waits before giving up
+    """
+
+    def __init__(self, max_active, max_queue, queue_timeout):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition(threading.Lock())
+        self._active = 0
+        self._waiters = deque()
+        self._admitted = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._cancelled = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self, weight=1):
+        """
+        Waits for capacity for one request.
+
+        Args:
+            weight: Capacity the request uses, capped at max_active
+
+        Returns:
+            _Slot: Admission to release when the request is done, or None if
+                the queue was full or the wait timed out
+        """
+        weight = max(1, min(weight, self.max_active))
+        started = time.monotonic()
+        with self._cond:
+            if not self._waiters and self._active + weight <= self.max_active:
+                return self._admit(weight, started)
+            if len(self._waiters) >= self.max_queue:
+                self._rejected += 1
+                return None
+
+            ticket = object()
+            self._waiters.append(ticket)
+            deadline = started + self.queue_timeout
+            while self._waiters[0] is not ticket or self._active + weight > self.max_active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiters.remove(ticket)
+                    self._timeouts += 1
+                    self._cond.notify_all()
+                    return None
+                self._cond.wait(remaining)
+            self._waiters.popleft()
+            self._cond.notify_all()
+            return self._admit(weight, started)
+
+    def _admit(self, weight, started):
+        waited = time.monotonic() - started
+        self._active += weight
+        self._admitted += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        return _Slot(self, weight)
+
+    def record_cancel(self):
+        with self._cond:
+            self._cancelled += 1
+
+    def stats(self):
+        """
+        Reports admission state for monitoring.
+
+        Returns:
+            dict: Limits, current load and queue depth, and lifetime counters
+        """
+        with self._cond:
+            admitted = self._admitted
+            return {
+                "max_active": self.max_active,
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout,
+                "active": self._active,
+                "queued": len(self._waiters),
+                "admitted": admitted,
+                "rejected": self._rejected,
+                "timed_out": self._timeouts,
+                "cancelled_on_disconnect": self._cancelled,
+                "wait_time_avg": round(self._wait_total / admitted, 6) if admitted else 0.0,
+                "wait_time_max": round(self._wait_max, 6),
+                "statement_timeouts_ms": dict(STATEMENT_TIMEOUTS),
+            }
+
+
+report_limiter = ConcurrencyLimiter(REPORTS_MAX_CONCURRENT, REPORTS_MAX_QUEUE, REPORTS_QUEUE_TIMEOUT)
+
+
+def install_statement_budgets(app):
+    """
+    Applies each blueprint's STATEMENT_TIMEOUTS budget to the queries of its requests.
+
+    Args:
+        app: Flask application
+    """
+
+    @app.before_request
+    def _apply_budget():
+        g.statement_timeout_token = set_statement_timeout(STATEMENT_TIMEOUTS.get(request.blueprint))
+
+    @app.teardown_request
+    def _clear_budget(exc):
+        token = g.pop("statement_timeout_token", None)
+        if token is not None:
+            reset_statement_timeout(token)
+
+
+def install_report_admission(blueprint, exempt=(), weights=None):
+    """
+    Puts a blueprint's requests behind report_limiter.
+
+    A request keeps its slot until its response has been sent, so streamed
+    exports count for as long as they read from the database.
+
+    Args:
+        blueprint: Flask blueprint to guard
+        exempt: Endpoint names that bypass the limiter (e.g. long-lived streams)
+        weights: Dictionary of endpoint name to slots it uses (defaults to 1)
+    """
+    weights = weights or {}
+
+    @blueprint.before_request
+    def _admit():
+        g.client_socket_token = _client_socket.set(
+            request.environ.get("gunicorn.socket") or request.environ.get("werkzeug.socket")
+        )
+        if request.endpoint in exempt:
+            return None
+        slot = report_limiter.acquire(weights.get(request.endpoint, 1))
+        if slot is None:
+            return (
+                jsonify({"error": "Too many report requests in progress, try again shortly"}),
+                503,
+                {"Retry-After": str(REPORTS_RETRY_AFTER)},
+            )
+        g.report_slot = slot
+        return None
+
+    @blueprint.after_request
+    def _release_when_sent(response):
+        slot = g.pop("report_slot", None)
+        if slot is not None:
+            response.call_on_close(slot.release)
+        return response
+
+    @blueprint.teardown_request
+    def _release(exc):
+        # after_request does not run when the view raised
+        slot = g.pop("report_slot", None)
+        if slot is not None:
+            slot.release()
+        token = g.pop("client_socket_token", None)
+        if token is not None:
+            _client_socket.reset(token)
+
+
+def _client_gone(sock):
+    """Returns whether the peer has closed the connection."""
+    try:
+        if not select.select([sock], [], [], 0)[0]:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b""
+    except ValueError:
+        # e.g. TLS sockets, which cannot peek; assume the client is still there
+        return False
+    except OSError:
+        return True
+
+
+@contextmanager
+def cancel_on_disconnect(conn):
+    """
+    Cancels the query running on `conn` if the current request's client disconnects.
+
+    The cancelled query raises psycopg2.errors.QueryCanceled in the request
+    thread. Outside a request served with a client socket this does nothing.
+
+    Args:
+        conn: Connection the guarded block runs its queries on
+    """
+    sock = _client_socket.get()
+    if sock is None:
+        yield
+        return
+
+    done = threading.Event()
+
+    def watch():
+        while not done.wait(REPORTS_DISCONNECT_POLL):
+            if _client_gone(sock):
+                conn.cancel()
+                report_limiter.record_cancel()
+                return
+
+    watcher = threading.Thread(target=watch, name="report-disconnect", daemon=True)
+    watcher.start()
+    try:
+        yield
+    finally:
+        done.set()
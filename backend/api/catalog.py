@@ -0,0 +1,277 @@
+"""
+Menu Catalog Cache Module
+
+This module keeps an in-process, read-only snapshot of the menu catalog so the
+order and menu endpoints do not look up menu_items, recipes and allergens on
+every request.
+
+Each snapshot is built completely before it is published and is never mutated
+afterwards, so a request that grabbed a snapshot keeps a consistent view even
+if the catalog is rebuilt while it is running. The menu items blueprint calls
+invalidate_catalog() after every committed create, update or delete; the next
+reader then builds a fresh snapshot with a higher version number.
+
+The same changes also bump a menu version counter stored in the database
+(bump_menu_version). Each snapshot remembers the counter it was built at, and
+get_catalog() re-reads the counter at most every CATALOG_VERSION_CHECK seconds
+with a single primary-key lookup, rebuilding the snapshot once it has moved, so
+menu edits made through any worker reach every other worker within that interval.
+
+Optional Settings:
+    - CATALOG_MAX_AGE: Seconds after which a snapshot is rebuilt even if the
+      menu version has not moved (defaults to 300)
+    - CATALOG_VERSION_CHECK: Seconds between checks of the menu version
+      counter; 0 checks on every call (defaults to 1)
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+
+from .database import get_db_connection
+
+CATALOG_MAX_AGE = float(os.getenv("CATALOG_MAX_AGE", "300"))
+CATALOG_VERSION_CHECK = float(os.getenv("CATALOG_VERSION_CHECK", "1"))
+
+MENU_VERSION_MARK = "menu_version"
+
+MenuItemEntry = namedtuple(
+    "MenuItemEntry",
+    [
+        "menu_item_id",
+        "menu_item_name",
+        "category",
+        "price",
+        "calories",
+        "flavor",
+        "seasonal",
+        "active",
+        "allergens",  # tuple of (allergen_id, allergen_name)
+        "recipe",  # tuple of (ingredient_id, ingredient_amount)
+    ],
+)
+
+
+class CatalogSnapshot:
+    """
+    Immutable view of the menu catalog at one point in time.
+
+    Attributes:
+        version: Monotonically increasing snapshot number
+        menu_version: Shared menu version counter the snapshot was built at
+        loaded_at: Monotonic time the snapshot was built
+        by_name: Dictionary of menu item name to MenuItemEntry
+        by_id: Dictionary of menu item ID to MenuItemEntry
+    """
+
+    __slots__ = ("version", "menu_version", "loaded_at", "by_name", "by_id")
+
+    def __init__(self, version, menu_version, entries):
+        self.version = version
+        self.menu_version = menu_version
+        self.loaded_at = time.monotonic()
+        self.by_id = {entry.menu_item_id: entry for entry in entries}
+        # entries arrive inactive-first, so an active item wins a name clash
+        self.by_name = {entry.menu_item_name: entry for entry in entries}
+
+    def get(self, menu_item_name):
+        """
+        Looks up a menu item by name.
+
+        Args:
+            menu_item_name (str): Name of the menu item
+
+        Returns:
+            MenuItemEntry: The entry, or None if no such item exists
+        """
+        return self.by_name.get(menu_item_name)
+
+
+_lock = threading.Lock()
+_load_lock = threading.Lock()
+_snapshot = None
+_generation = 0
+_version = 0
+_checked_at = 0.0
+
+
+def _read_menu_version(cur):
+    cur.execute("SELECT position FROM job_watermarks WHERE name = %s", (MENU_VERSION_MARK,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def _current_menu_version():
+    """Reads the shared menu version counter on a pooled connection."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            return _read_menu_version(cur)
+
+
+def _load_entries():
+    """
+    Reads the menu version, menu items, recipes and allergens on one connection.
+
+    The version is read first, so a menu edit committing while the rows are
+    read only causes one extra rebuild later, never a snapshot tagged newer
+    than its rows.
+
+    Returns:
+        tuple: (menu_version, list of MenuItemEntry)
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            menu_version = _read_menu_version(cur)
+
+            cur.execute(
+                """
+                SELECT menu_item_id, menu_item_name, category, price, calories,
+                       flavor, seasonal, active
+                FROM menu_items
+                ORDER BY active NULLS FIRST, menu_item_id;
+            """
+            )
+            items = cur.fetchall()
+
+            cur.execute(
+                """
+                SELECT menu_item_id, ingredient_id, ingredient_amount
+                FROM menu_items_ingredients
+                ORDER BY menu_item_id, ingredient_id;
+            """
+            )
+            recipes = {}
+            for menu_item_id, ingredient_id, amount in cur.fetchall():
+                recipes.setdefault(menu_item_id, []).append((ingredient_id, amount))
+
+            cur.execute(
+                """
+                SELECT mia.menu_item_id, a.id, a.name
+                FROM menu_item_allergens mia
+                JOIN allergens a ON mia.allergen_id = a.id
+                ORDER BY mia.menu_item_id, a.id;
+            """
+            )
+            allergens = {}
+            for menu_item_id, allergen_id, allergen_name in cur.fetchall():
+                allergens.setdefault(menu_item_id, []).append((allergen_id, allergen_name))
+
+    return menu_version, [
+        MenuItemEntry(
+            menu_item_id=row[0],
+            menu_item_name=row[1],
+            category=row[2],
+            price=row[3],
+            calories=row[4],
+            flavor=row[5],
+            seasonal=row[6],
+            active=row[7],
+            allergens=tuple(allergens.get(row[0], ())),
+            recipe=tuple(recipes.get(row[0], ())),
+        )
+        for row in items
+    ]
+
+
+def _fresh(snapshot, now):
+    """Tells whether a snapshot may be served without rebuilding, checking the menu version when due."""
+    global _checked_at
+
+    if snapshot is None or now - snapshot.loaded_at >= CATALOG_MAX_AGE:
+        return False
+    if now - _checked_at < CATALOG_VERSION_CHECK:
+        return True
+    if _current_menu_version() != snapshot.menu_version:
+        return False
+    _checked_at = now
+    return True
+
+
+def get_catalog():
+    """
+    Returns the current catalog snapshot, building it if needed.
+
+    Callers should hold on to the returned snapshot for the whole request
+    instead of calling get_catalog() repeatedly, so every lookup sees the
+    same version.
+
+    Returns:
+        CatalogSnapshot: Current snapshot
+
+    Raises:
+        psycopg2.Error: If the menu version or the catalog has to be read and the query fails
+    """
+    global _snapshot, _version, _checked_at
+
+    snapshot = _snapshot
+    now = time.monotonic()
+    if (
+        snapshot is not None
+        and now - snapshot.loaded_at < CATALOG_MAX_AGE
+        and now - _checked_at < CATALOG_VERSION_CHECK
+    ):
+        return snapshot
+
+    # one loader (or version check) at a time; everyone else waiting here reuses its result
+    with _load_lock:
+        snapshot = _snapshot
+        if _fresh(snapshot, time.monotonic()):
+            return snapshot
+        with _lock:
+            generation = _generation
+
+        menu_version, entries = _load_entries()
+
+        with _lock:
+            _version += 1
+            snapshot = CatalogSnapshot(_version, menu_version, entries)
+            # an invalidation that landed while loading means these rows may
+            # already be stale, so hand them to this caller but don't publish them
+            if generation == _generation:
+                _snapshot = snapshot
+                _checked_at = snapshot.loaded_at
+        return snapshot
+
+
+def invalidate_catalog():
+    """
+    Discards the current snapshot after a committed menu change.
+
+    The next call to get_catalog() rebuilds it; requests already holding the
+    old snapshot finish with it unchanged.
+    """
+    global _snapshot, _generation
+    with _lock:
+        _generation += 1
+        _snapshot = None
+
+
+def catalog_version():
+    """
+    Returns the version of the published snapshot.
+
+    Returns:
+        int: Snapshot version, or 0 if no snapshot is currently published
+    """
+    snapshot = _snapshot
+    return snapshot.version if snapshot is not None else 0
+
+
+def bump_menu_version(cur):
+    """
+    Increments the shared menu version counter.
+
+    Must run inside the transaction that changes the menu, so the new version
+    becomes visible together with the change.
+
+    Args:
+        cur: Cursor inside the transaction changing the menu
+    """
+    cur.execute(
+        """
+        INSERT INTO job_watermarks (name, position) VALUES (%s, 1)
+        ON CONFLICT (name) DO UPDATE SET position = job_watermarks.position + 1
+    """,
+        (MENU_VERSION_MARK,),
+    )
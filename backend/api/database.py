@@ -2,8 +2,8 @@
 Database Connection Module
 
 This module handles PostgreSQL database connections for the POS system.
-It uses environment variables for secure configuration and implements
-connection management using psycopg2.
+It uses environment variables for secure configuration and keeps a bounded,
+fork-safe pool of psycopg2 connections that every blueprint borrows from.
 
 Environment Variables Required:
     - DB_NAME: Database name
@@ -11,43 +11,510 @@ Environment Variables Required:
     - DB_PASSWORD: Database password
     - DB_URL: Database host URL
     - DB_PORT: Database port (defaults to 5432)
+
+Optional Pool Settings:
+    - DB_POOL_MIN: Connections opened eagerly and kept idle (defaults to 1)
+    - DB_POOL_MAX: Hard upper bound on open connections (defaults to 10)
+    - DB_POOL_TIMEOUT: Seconds to wait for a free connection (defaults to 5)
+    - DB_POOL_MAX_USES: Checkouts before a connection is recycled (defaults to 500)
+    - DB_POOL_MAX_AGE: Seconds before a connection is recycled (defaults to 1800)
+    - DB_POOL_PING_AFTER: Idle seconds after which a checkout runs SELECT 1 (defaults to 30)
+    - DB_RETRY_ATTEMPTS: Attempts run_transaction() makes on deadlock or serialization failure (defaults to 5)
+    - DB_RETRY_BACKOFF: Base delay in seconds between those attempts, doubled each time (defaults to 0.02)
+
+Statement timeouts are set per request rather than per pool: set_statement_timeout()
+records a budget for the current context, and every connection checked out
+under it runs with that statement_timeout (see admission.py).
 """
 
+import contextvars
 import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import errors, extensions
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 
 load_dotenv()
 
+DB_RETRY_ATTEMPTS = int(os.getenv('DB_RETRY_ATTEMPTS', '5'))
+DB_RETRY_BACKOFF = float(os.getenv('DB_RETRY_BACKOFF', '0.02'))
+
+# errors after which the whole transaction can safely be run again
+RETRYABLE_ERRORS = (errors.DeadlockDetected, errors.SerializationFailure)
+
+# statement_timeout (milliseconds) for connections checked out in this context; None keeps the server default
+_statement_timeout = contextvars.ContextVar("statement_timeout", default=None)
+
+
+def set_statement_timeout(ms):
+    """
+    Sets the statement_timeout of connections checked out from now on in this context.
+
+    Args:
+        ms: Timeout in milliseconds, or None for the server default
+
+    Returns:
+        contextvars.Token: Token to pass to reset_statement_timeout()
+    """
+    return _statement_timeout.set(ms)
+
+
+def reset_statement_timeout(token):
+    """Restores the statement_timeout in effect before set_statement_timeout()."""
+    _statement_timeout.reset(token)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """
+    Raised when no connection becomes available within the checkout timeout.
+
+    Subclasses psycopg2.OperationalError so the existing `except psycopg2.Error`
+    handlers in the blueprints turn it into an HTTP 500 like any other database error.
+    """
+
+
+class _PooledConnection:
+    """
+    Bookkeeping wrapper around a raw psycopg2 connection.
+
+    Attributes:
+        conn: The underlying psycopg2 connection
+        created_at: Monotonic time the connection was opened
+        last_used: Monotonic time the connection was last returned to the pool
+        uses: Number of times the connection has been checked out
+        statement_timeout: statement_timeout last set on the session (None for the default)
+    """
+
+    __slots__ = ("conn", "created_at", "last_used", "uses", "statement_timeout")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.uses = 0
+        self.statement_timeout = None
+
+
+class ConnectionPool:
+    """
+    Thread-safe, fork-aware pool of PostgreSQL connections.
+
+    Connections are opened lazily up to `maxconn`, validated on checkout,
+    and recycled once they exceed `max_uses` checkouts or `max_age` seconds.
+    When the owning process forks (e.g. gunicorn workers with --preload) the
+    child drops the inherited connections and starts with a fresh pool.
+
+    Usage:
+        pool = ConnectionPool(minconn=1, maxconn=10, dbname="pos", ...)
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+    """
+
+    def __init__(self, minconn=1, maxconn=10, timeout=5.0, max_uses=500,
+                 max_age=1800.0, ping_after=30.0, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("pool bounds must satisfy 0 <= minconn <= maxconn and maxconn >= 1")
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.ping_after = ping_after
+        self._connect_kwargs = connect_kwargs
+
+        # Connections inherited across fork() are parked here rather than closed
+        # or garbage collected, since either would tear down the parent's session.
+        self._orphaned = []
+        self._reset_state()
+
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+        self._prefill()
+
+    def _reset_state(self):
+        """Initializes (or re-initializes after fork) all per-process state."""
+        self._pid = os.getpid()
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = []
+        self._in_use = {}
+        self._opening = 0
+        self._closed = False
+        self._checkouts = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._discarded = 0
+        self._waiting = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _after_fork(self):
+        """Drops connections inherited from the parent process without closing them."""
+        inherited = [pooled.conn for pooled in self._idle]
+        inherited.extend(self._in_use.values())
+        self._orphaned.extend(inherited)
+        self._reset_state()
+
+    def _check_pid(self):
+        # register_at_fork covers os.fork(); this covers anything that bypasses it
+        if self._pid != os.getpid():
+            self._after_fork()
+
+    def _prefill(self):
+        for _ in range(self.minconn):
+            try:
+                pooled = self._open()
+            except psycopg2.Error as e:
+                print(f"Error connecting to the database: {e}")
+                return
+            with self._cond:
+                self._idle.append(pooled)
+
+    def _open(self):
+        return _PooledConnection(psycopg2.connect(**self._connect_kwargs))
+
+    def _is_expired(self, pooled, now):
+        if self.max_uses and pooled.uses >= self.max_uses:
+            return True
+        return bool(self.max_age) and now - pooled.created_at >= self.max_age
+
+    def _is_alive(self, pooled, now):
+        conn = pooled.conn
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if now - pooled.last_used < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    @staticmethod
+    def _apply_statement_timeout(pooled):
+        """Sets the session's statement_timeout to the current context's budget if it differs."""
+        wanted = _statement_timeout.get()
+        if pooled.statement_timeout == wanted:
+            return
+        with pooled.conn.cursor() as cur:
+            if wanted is None:
+                cur.execute("SET statement_timeout TO DEFAULT")
+            else:
+                cur.execute("SELECT set_config('statement_timeout', %s, false)", (str(int(wanted)),))
+        # committed so a later rollback by the borrower keeps the setting
+        pooled.conn.commit()
+        pooled.statement_timeout = wanted
+
+    def getconn(self):
+        """
+        Checks a connection out of the pool, opening a new one if under `maxconn`.
+
+        Blocks for up to `timeout` seconds when the pool is exhausted.
+
+        Returns:
+            psycopg2.connection: A live connection owned by the caller until putconn()
+
+        Raises:
+            PoolTimeout: If no connection became available in time
+            psycopg2.Error: If opening a new connection fails
+        """
+        self._check_pid()
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        while True:
+            pooled = None
+            with self._cond:
+                if self._closed:
+                    raise psycopg2.InterfaceError("connection pool is closed")
+                while not self._idle and len(self._in_use) + self._opening >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"timed out after {self.timeout}s waiting for a database connection"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    pooled = self._idle.pop()
+                else:
+                    self._opening += 1
+
+            now = time.monotonic()
+            if pooled is None:
+                try:
+                    pooled = self._open()
+                finally:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+            elif self._is_expired(pooled, now) or not self._is_alive(pooled, now):
+                self._close_quietly(pooled.conn)
+                with self._cond:
+                    self._recycled += 1
+                    self._cond.notify()
+                continue
+
+            try:
+                self._apply_statement_timeout(pooled)
+            except psycopg2.Error:
+                self._close_quietly(pooled.conn)
+                with self._cond:
+                    self._discarded += 1
+                    self._cond.notify()
+                raise
+
+            waited = now - started
+            with self._cond:
+                pooled.uses += 1
+                self._in_use[id(pooled.conn)] = pooled
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            return pooled.conn
+
+    def putconn(self, conn, discard=False):
+        """
+        Returns a connection to the pool.
+
+        Connections that are broken, left mid-transaction, past their recycle
+        limits, or explicitly discarded are closed instead of being reused.
+
+        Args:
+            conn: Connection previously obtained from getconn()
+            discard: Close the connection instead of returning it to the pool
+        """
+        if self._pid != os.getpid():
+            # Checked out before a fork; the child must not reuse or close it.
+            self._orphaned.append(conn)
+            return
+
+        with self._cond:
+            pooled = self._in_use.pop(id(conn), None)
+            if pooled is None:
+                return
+
+        now = time.monotonic()
+        reusable = (
+            not discard
+            and not self._closed
+            and not conn.closed
+            and conn.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE
+            and not self._is_expired(pooled, now)
+        )
+
+        with self._cond:
+            if reusable:
+                pooled.last_used = now
+                self._idle.append(pooled)
+            else:
+                self._discarded += 1
+            self._cond.notify()
+
+        if not reusable:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrows a connection for the duration of a `with` block.
+
+        Mirrors psycopg2's own connection context manager: the transaction is
+        committed when the block exits normally and rolled back on an exception.
+        The connection is then handed back to the pool rather than left open.
+
+        Yields:
+            psycopg2.connection: Pooled database connection
+        """
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def stats(self):
+        """
+        Reports pool utilisation for monitoring.
+
+        Returns:
+            dict: Current sizes, lifetime counters and checkout wait times (seconds)
+        """
+        self._check_pid()
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "pid": self._pid,
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "opening": self._opening,
+                "waiting": self._waiting,
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "discarded": self._discarded,
+                "wait_time_total": round(self._wait_total, 6),
+                "wait_time_avg": round(self._wait_total / checkouts, 6) if checkouts else 0.0,
+                "wait_time_max": round(self._wait_max, 6),
+            }
+
+    def closeall(self):
+        """Closes every idle connection and refuses further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close_quietly(pooled.conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use.
+
+    Returns:
+        ConnectionPool: Pool configured from the DB_* environment variables
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    minconn=int(os.getenv('DB_POOL_MIN', '1')),
+                    maxconn=int(os.getenv('DB_POOL_MAX', '10')),
+                    timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+                    max_uses=int(os.getenv('DB_POOL_MAX_USES', '500')),
+                    max_age=float(os.getenv('DB_POOL_MAX_AGE', '1800')),
+                    ping_after=float(os.getenv('DB_POOL_PING_AFTER', '30')),
+                    **_connect_settings(),
+                )
+    return _pool
+
+
+def _connect_settings():
+    """Returns the psycopg2.connect() arguments from the DB_* environment variables."""
+    return dict(
+        dbname=os.getenv('DB_NAME'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD'),
+        host=os.getenv('DB_URL'),
+        port=os.getenv('DB_PORT', '5432'),
+    )
+
+
+def connect():
+    """
+    Opens a dedicated connection outside the pool.
+
+    Meant for long-lived sessions, such as a LISTEN connection, that would
+    otherwise hold a pooled connection forever. The caller must close it.
+
+    Returns:
+        psycopg2.connection: New database connection
+    """
+    return psycopg2.connect(**_connect_settings())
+
+
 def get_db_connection():
     """
-    Creates and returns a new PostgreSQL database connection.
-    
-    Uses environment variables for connection parameters to ensure security.
-    The connection object is configured with RealDictCursor for JSON-like results.
-    
+    Borrows a PostgreSQL connection from the shared pool.
+
+    The returned object is a context manager: the connection is committed on
+    success, rolled back on error, and returned to the pool when the block exits.
+    Cursors can still be created with RealDictCursor for JSON-like results.
+
     Returns:
-        psycopg2.connection: Database connection object if successful
-        None: If connection fails
-        
+        contextmanager: Yields a psycopg2.connection
+
     Raises:
-        psycopg2.Error: Prints error message if connection fails
-    
+        PoolTimeout: If the pool is exhausted for longer than DB_POOL_TIMEOUT
+        psycopg2.Error: If a new connection cannot be opened
+
     Usage:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT * FROM table")
     """
-    try:
-        conn = psycopg2.connect(
-            dbname=os.getenv('DB_NAME'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            host=os.getenv('DB_URL'),
-            port=os.getenv('DB_PORT', '5432')
-        )
-        return conn
-    except psycopg2.Error as e:
-        print(f"Error connecting to the database: {e}")
-        return None
\ No newline at end of file
+    return get_pool().connection()
+
+
+def get_pool_stats():
+    """
+    Returns utilisation statistics for the shared pool.
+
+    Returns:
+        dict: See ConnectionPool.stats()
+    """
+    return get_pool().stats()
+
+
+def run_transaction(work, attempts=None, backoff=None):
+    """
+    Runs `work(conn)` in its own transaction, retrying on deadlocks and serialization failures.
+
+    Each attempt borrows a pooled connection and commits when `work` returns.
+    If Postgres aborts the transaction with a deadlock or serialization
+    failure, it is rolled back and `work` is called again after an
+    exponentially growing, jittered delay. `work` must therefore only have
+    side effects inside the database.
+
+    Args:
+        work: Callable taking a psycopg2.connection and returning a result
+        attempts: Maximum number of attempts (defaults to DB_RETRY_ATTEMPTS)
+        backoff: Base delay in seconds (defaults to DB_RETRY_BACKOFF)
+
+    Returns:
+        The value returned by `work`
+
+    Raises:
+        psycopg2.Error: The last error if every attempt failed, or any non-retryable error
+    """
+    attempts = attempts or DB_RETRY_ATTEMPTS
+    backoff = DB_RETRY_BACKOFF if backoff is None else backoff
+
+    for attempt in range(1, attempts + 1):
+        try:
+            with get_db_connection() as conn:
+                return work(conn)
+        except RETRYABLE_ERRORS as e:
+            if attempt == attempts:
+                raise
+            delay = backoff * (2 ** (attempt - 1))
+            print(f"Retrying transaction after {type(e).__name__} (attempt {attempt}/{attempts})")
+            time.sleep(delay + random.uniform(0, delay))
@@ -5,7 +5,7 @@ This module provides REST API endpoints for managing employee data in the system
 It handles creating, reading, updating, and soft-deleting employee records.
 
 Endpoints:
-    - GET /api/employees/ : Retrieve all active employees
+    - GET /api/employees/ : Retrieve active employees, optionally a page at a time
     - POST /api/employees/create : Create a new employee
     - PUT /api/employees/update-role : Update an employee's role
     - PUT /api/employees/delete : Soft delete an employee
@@ -15,28 +15,52 @@ from flask import Flask, request, jsonify, Blueprint
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from .database import get_db_connection
+from .pagination import PageError, page_request
 
 employees_bp = Blueprint("employees", __name__, url_prefix="/api/employees")
 
+# columns `fields` may select
+EMPLOYEE_COLUMNS = ("employee_id", "employee_name", "position", "hire_date", "active")
+
 
 @employees_bp.route("/", methods=["GET"])
 def get_employees():
     """
-    Fetches all active employees from the database.
+    Fetches active employees from the database, ordered by employee_id.
+
+    Query Parameters:
+        limit (int): Employees per page (all of them if neither limit nor cursor is given)
+        cursor (str): X-Next-Cursor header of the previous page
+        fields (str): Comma-separated columns to return (see EMPLOYEE_COLUMNS)
 
     Returns:
         tuple: JSON response containing:
             - list of employee records (each with id, name, position, hire_date)
-            - HTTP status code 200 on success
+            - HTTP status code 200 on success, with X-Next-Cursor while more pages follow
+            - HTTP status code 400 on an invalid limit, cursor or fields parameter
             - HTTP status code 500 on database errors
     """
 
+    try:
+        page = page_request("employees", ("employee_id",), EMPLOYEE_COLUMNS)
+    except PageError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM employees WHERE active = true;")
-                employees = cur.fetchall()
-        return jsonify(employees), 200
+                after, params = page.after_sql()
+                cur.execute(
+                    f"""
+                    SELECT {page.select()} FROM employees
+                    WHERE active = true AND {after}
+                    ORDER BY employee_id
+                    LIMIT %s;
+                """,
+                    params + [page.fetch],
+                )
+                employees, headers = page.finish(cur.fetchall())
+        return jsonify(employees), 200, headers
     except psycopg2.Error as e:
         return jsonify({"error": str(e)}), 500
 
@@ -0,0 +1,104 @@
+"""
+Report Export Module
+
+This module streams query results to the client as CSV or NDJSON without
+holding the whole result in worker memory. Rows are read from a named
+(server-side) cursor a fixed number at a time and each chunk is encoded and
+written to the response before the next one is fetched, so memory stays flat
+however large the requested range is.
+
+The pooled connection is held for the duration of the download and returned
+when the stream finishes or the client disconnects.
+
+Optional Settings:
+    - EXPORT_CHUNK_ROWS: Rows fetched from the server-side cursor per chunk (defaults to 2000)
+"""
+
+import csv
+import io
+import json
+import os
+
+from flask import Response
+
+from .database import get_db_connection
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "2000"))
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _encode_csv(columns, rows, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _encode_ndjson(columns, rows, header):
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=_json_default) + "\n" for row in rows
+    ).encode()
+
+
+def _generate(prepare, encode, chunk_rows):
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            sql, params = prepare(cur)
+        with conn.cursor(name="report_export") as cur:
+            cur.itersize = chunk_rows
+            cur.execute(sql, params)
+            rows = cur.fetchmany(chunk_rows)
+            columns = [column.name for column in cur.description]
+            yield encode(columns, rows, True)
+            while rows:
+                rows = cur.fetchmany(chunk_rows)
+                if rows:
+                    yield encode(columns, rows, False)
+
+
+def _stream(first, chunks):
+    yield first
+    yield from chunks
+
+
+def export_response(prepare, fmt, filename, chunk_rows=None):
+    """
+    Builds a streaming response for a query.
+
+    The query is started before the response is returned, so a database
+    error still surfaces as psycopg2.Error to the caller instead of a
+    truncated download.
+
+    Args:
+        prepare: Callable (cur) returning (sql, params); it runs on a regular
+            cursor of the export's connection, e.g. to read rollup coverage
+        fmt: "csv" or "ndjson"
+        filename: Download file name without extension
+        chunk_rows: Rows per fetch, defaults to EXPORT_CHUNK_ROWS
+
+    Returns:
+        flask.Response: Streaming response with an attachment disposition
+
+    Raises:
+        psycopg2.Error: If the query cannot be started
+    """
+    encode = _encode_csv if fmt == "csv" else _encode_ndjson
+    chunks = _generate(prepare, encode, chunk_rows or EXPORT_CHUNK_ROWS)
+    first = next(chunks)
+    return Response(
+        _stream(first, chunks),
+        mimetype=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
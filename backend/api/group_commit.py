@@ -0,0 +1,147 @@
+"""
+Group Commit Module
+
+This module batches concurrent order placements into a single database
+transaction so that a burst of POST /api/transactions/create calls pays for
+one commit instead of one each.
+
+The first request to arrive opens a batch and becomes its leader. Requests
+arriving within the collection window join the batch and wait. When the
+window closes, or the batch reaches its size limit, the leader writes the
+whole batch through the supplied `commit_batch` callable and hands every
+waiting request its own result. No background thread is involved, so the
+mechanism is unaffected by gunicorn forking workers; it only has an effect
+when a worker serves requests concurrently (e.g. --threads or gthread workers).
+
+Optional Settings:
+    - GROUP_COMMIT: Set to "true" to enable group commit (defaults to false)
+    - GROUP_COMMIT_WINDOW_MS: Milliseconds a batch stays open (defaults to 5)
+    - GROUP_COMMIT_MAX_BATCH: Orders after which a batch closes early (defaults to 50)
+"""
+
+import os
+import threading
+import time
+
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "false").lower() == "true"
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "5"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "50"))
+
+
+class _Pending:
+    """One caller's order waiting in a batch, and the slot its result is delivered to."""
+
+    __slots__ = ("order", "done", "result", "error")
+
+    def __init__(self, order):
+        self.order = order
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class GroupCommitter:
+    """
+    Collects concurrently submitted orders and commits them together.
+
+    Args:
+        commit_batch: Callable taking a list of orders and returning a list of
+            per-order results in the same order; it runs the single database
+            transaction for the batch
+        window: Seconds a batch stays open for more orders
+        max_batch: Number of orders after which a batch closes immediately
+    """
+
+    def __init__(self, commit_batch, window, max_batch):
+        self.commit_batch = commit_batch
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._lock = threading.Lock()
+        self._closed = threading.Condition(self._lock)
+        self._batch = None
+        self._batches = 0
+        self._orders = 0
+        self._largest = 0
+        self._failed_batches = 0
+
+    def submit(self, order):
+        """
+        Adds an order to the open batch and waits for that batch to commit.
+
+        Args:
+            order: Order to place; passed through to commit_batch unchanged
+
+        Returns:
+            The result commit_batch produced for this order
+
+        Raises:
+            Exception: Whatever commit_batch raised if the batch as a whole failed
+        """
+        pending = _Pending(order)
+
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = [pending]
+            else:
+                batch.append(pending)
+            if len(batch) >= self.max_batch:
+                # detach the full batch so later arrivals start a new one
+                self._batch = None
+                self._closed.notify_all()
+
+        if leader:
+            deadline = time.monotonic() + self.window
+            with self._lock:
+                while self._batch is batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._batch = None
+                        break
+                    self._closed.wait(remaining)
+            self._execute(batch)
+        else:
+            pending.done.wait()
+
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _execute(self, batch):
+        failed = False
+        try:
+            results = self.commit_batch([pending.order for pending in batch])
+            for pending, result in zip(batch, results):
+                pending.result = result
+        except Exception as e:
+            failed = True
+            for pending in batch:
+                pending.error = e
+        finally:
+            with self._lock:
+                self._batches += 1
+                self._orders += len(batch)
+                self._largest = max(self._largest, len(batch))
+                self._failed_batches += failed
+            for pending in batch:
+                pending.done.set()
+
+    def stats(self):
+        """
+        Reports batching effectiveness for monitoring.
+
+        Returns:
+            dict: Settings plus batch, order and failure counters
+        """
+        with self._lock:
+            return {
+                "enabled": GROUP_COMMIT,
+                "window_ms": self.window * 1000,
+                "max_batch": self.max_batch,
+                "batches": self._batches,
+                "orders": self._orders,
+                "failed_batches": self._failed_batches,
+                "largest_batch": self._largest,
+                "average_batch": round(self._orders / self._batches, 3) if self._batches else 0.0,
+            }
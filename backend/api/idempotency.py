@@ -0,0 +1,147 @@
+"""
+Idempotency Key Module
+
+This module lets clients retry POST /api/transactions/create safely by sending an
+Idempotency-Key header. The key is claimed in the same database transaction
+that writes the order, so either both commit or neither does:
+
+    1. claim_key() inserts the key. If another request holding the same key is
+       still in flight, the INSERT waits on the primary key until that request
+       commits or rolls back, so the two never execute concurrently.
+    2. If the key already exists, the stored response is returned and the order
+       is not placed again.
+    3. Otherwise the caller places the order and calls record_response() before
+       committing.
+
+Failed orders roll back their claim, so a retry after a failure runs again.
+Keys live in the idempotency_keys table (see models.IdempotencyKey).
+
+Optional Settings:
+    - IDEMPOTENCY_TTL: Seconds a key is remembered (defaults to 86400)
+"""
+
+import hashlib
+import itertools
+import json
+import os
+
+from psycopg2.extras import Json
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+MAX_KEY_LENGTH = 255
+
+# expired keys are swept opportunistically once every this many claims
+_PURGE_EVERY = 500
+# next() on a count is atomic, so concurrent requests never lose a claim
+_claims = itertools.count(1)
+
+
+class KeyReuseError(Exception):
+    """Raised when an idempotency key is replayed with a different request body."""
+
+
+def request_fingerprint(payload):
+    """
+    Hashes a request body so replays can be matched to the original request.
+
+    Args:
+        payload: Parsed JSON request body
+
+    Returns:
+        str: Hex SHA-256 digest of the canonical JSON encoding
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def claim_key(cur, key, fingerprint):
+    """
+    Claims an idempotency key inside the caller's transaction.
+
+    Args:
+        cur: Cursor inside an open transaction
+        key: Idempotency-Key header value
+        fingerprint: request_fingerprint() of the request body
+
+    Returns:
+        tuple: (status_code, response_body) stored for a completed earlier
+            request with this key, or None if the key was claimed and the
+            caller should go ahead
+
+    Raises:
+        KeyReuseError: If the key was used before for a different request body
+    """
+    if next(_claims) % _PURGE_EVERY == 0:
+        purge_expired_keys(cur)
+
+    cur.execute(
+        "DELETE FROM idempotency_keys WHERE key = %s AND expires_at < NOW()",
+        (key,),
+    )
+    cur.execute(
+        """
+        INSERT INTO idempotency_keys (key, request_hash, created_at, expires_at)
+        VALUES (%s, %s, NOW(), NOW() + %s * INTERVAL '1 second')
+        ON CONFLICT (key) DO NOTHING
+        RETURNING key
+    """,
+        (key, fingerprint, IDEMPOTENCY_TTL),
+    )
+    if cur.fetchone():
+        return None
+
+    cur.execute(
+        "SELECT request_hash, status_code, response FROM idempotency_keys WHERE key = %s",
+        (key,),
+    )
+    request_hash, status_code, response = cur.fetchone()
+    if request_hash != fingerprint:
+        raise KeyReuseError(f"Idempotency-Key {key} was already used for a different request")
+    return status_code, response
+
+
+def record_response(cur, key, transaction_id, status_code, body):
+    """
+    Stores the response for a claimed key; committed together with the order.
+
+    Args:
+        cur: Cursor inside the transaction that claimed the key
+        key: Idempotency-Key header value
+        transaction_id: ID of the created transaction
+        status_code: HTTP status code being returned
+        body: JSON-serializable response body being returned
+    """
+    cur.execute(
+        """
+        UPDATE idempotency_keys
+        SET transaction_id = %s, status_code = %s, response = %s
+        WHERE key = %s
+    """,
+        (transaction_id, status_code, Json(body), key),
+    )
+
+
+def purge_expired_keys(cur, batch_size=1000):
+    """
+    Deletes up to batch_size expired keys.
+
+    Args:
+        cur: Cursor inside an open transaction
+        batch_size: Maximum number of rows to delete in one call
+
+    Returns:
+        int: Number of keys deleted
+    """
+    cur.execute(
+        """
+        DELETE FROM idempotency_keys
+        WHERE key IN (
+            SELECT key FROM idempotency_keys
+            WHERE expires_at < NOW()
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+    """,
+        (batch_size,),
+    )
+    return cur.rowcount
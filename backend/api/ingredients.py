@@ -5,7 +5,7 @@ This module provides REST API endpoints for managing ingredient inventory in the
 It handles creating, reading, and updating ingredient records.
 
 Endpoints:
-    - GET /api/ingredients/ : Retrieve all ingredients
+    - GET /api/ingredients/ : Retrieve ingredients, optionally a page at a time
     - POST /api/ingredients/create : Create a new ingredient
     - PUT /api/ingredients/update-stock : Update ingredient stock level
 """
@@ -14,27 +14,46 @@ from flask import Flask, request, jsonify, Blueprint
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from .database import get_db_connection
+from .pagination import PageError, page_request
 
 ingredients_bp = Blueprint("ingredients", __name__, url_prefix="/api/ingredients")
 
+# columns `fields` may select
+INGREDIENT_COLUMNS = ("ingredient_id", "ingredient_name", "stock")
+
 
 @ingredients_bp.route("/", methods=["GET"])
 def get_ingredients():
     """
-    Fetches all ingredients from the database.
+    Fetches ingredients from the database, ordered by ingredient_id.
+
+    Query Parameters:
+        limit (int): Ingredients per page (all of them if neither limit nor cursor is given)
+        cursor (str): X-Next-Cursor header of the previous page
+        fields (str): Comma-separated columns to return (see INGREDIENT_COLUMNS)
 
     Returns:
         tuple: JSON response containing:
             - list of ingredient records (each with id, name, stock)
-            - HTTP status code 200 on success
+            - HTTP status code 200 on success, with X-Next-Cursor while more pages follow
+            - HTTP status code 400 on an invalid limit, cursor or fields parameter
             - HTTP status code 500 on database errors
     """
+    try:
+        page = page_request("ingredients", ("ingredient_id",), INGREDIENT_COLUMNS)
+    except PageError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM ingredients;")
-                ingredients = cur.fetchall()
-        return jsonify(ingredients), 200
+                after, params = page.after_sql()
+                cur.execute(
+                    f"SELECT {page.select()} FROM ingredients WHERE {after} ORDER BY ingredient_id LIMIT %s;",
+                    params + [page.fetch],
+                )
+                ingredients, headers = page.finish(cur.fetchall())
+        return jsonify(ingredients), 200, headers
     except psycopg2.Error as e:
         return jsonify({"error": str(e)}), 500
 
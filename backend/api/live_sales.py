@@ -0,0 +1,291 @@
+"""
+Live Sales Module
+
+This module pushes today's sales to dashboards as orders commit, so screens do
+not have to poll and re-aggregate the day.
+
+Order placement calls notify_sales() inside its transaction. It sends a
+Postgres NOTIFY on the "sales_events" channel carrying the order's
+(hour, employee, amount) deltas and the transaction's ID, and Postgres
+delivers it only if that transaction commits. Each worker process runs one
+LiveSalesHub. The hub holds a dedicated LISTEN connection, keeps today's
+totals per hour and per employee in memory, and fans every delta out to the
+worker's open SSE streams. Orders placed by any worker therefore reach every
+screen, and the database load is one snapshot query per worker per day (plus
+one on reconnect), however many screens are open.
+
+The snapshot is read in a REPEATABLE READ transaction on the listening
+connection, and the hub records that transaction's snapshot. A notification
+whose transaction is already visible in the snapshot is skipped, so orders
+that commit while the snapshot is being read are counted exactly once.
+
+Optional Settings:
+    - LIVE_SALES_HEARTBEAT: Seconds between keep-alive comments on idle streams (defaults to 15)
+    - LIVE_SALES_QUEUE: Events buffered per stream before a slow client is
+      resynchronized with a fresh snapshot (defaults to 1000)
+    - LIVE_SALES_DAY_CHECK: Seconds between checks for a new business day on
+      the listening connection (defaults to 30)
+"""
+
+import json
+import os
+import queue
+import select
+import threading
+import time
+from datetime import datetime
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from .database import connect
+from .rollups import floor_hour
+
+LIVE_SALES_HEARTBEAT = float(os.getenv("LIVE_SALES_HEARTBEAT", "15"))
+LIVE_SALES_QUEUE = int(os.getenv("LIVE_SALES_QUEUE", "1000"))
+LIVE_SALES_DAY_CHECK = float(os.getenv("LIVE_SALES_DAY_CHECK", "30"))
+
+CHANNEL = "sales_events"
+
+# NOTIFY payloads are limited to 8000 bytes; this many deltas stays well below
+_DELTAS_PER_NOTIFY = 100
+
+
+def notify_sales(cur, sales):
+    """
+    Announces committed sales to every worker's live dashboards.
+
+    Must run inside the transaction that placed the orders; Postgres only
+    delivers the notification if it commits.
+
+    Args:
+        cur: Cursor inside the transaction placing the orders
+        sales: Iterable of (order_timestamp, employee_name or None, amount)
+    """
+    deltas = {}
+    for order_timestamp, employee, amount in sales:
+        if isinstance(order_timestamp, str):
+            order_timestamp = datetime.fromisoformat(order_timestamp)
+        if order_timestamp.tzinfo is not None:
+            order_timestamp = order_timestamp.astimezone().replace(tzinfo=None)
+        key = (floor_hour(order_timestamp).isoformat(), employee)
+        deltas[key] = deltas.get(key, 0.0) + float(amount)
+
+    rows = [[hour, employee, amount] for (hour, employee), amount in deltas.items()]
+    for start in range(0, len(rows), _DELTAS_PER_NOTIFY):
+        cur.execute(
+            "SELECT pg_notify(%s, json_build_object('xid', txid_current(), 'deltas', %s::json)::text)",
+            (CHANNEL, json.dumps(rows[start:start + _DELTAS_PER_NOTIFY])),
+        )
+
+
+def _visible(xid, snapshot):
+    """Returns whether a transaction ID had committed in a txid_current_snapshot() value."""
+    xmin, xmax, xip = snapshot
+    return xid < xmin or (xid < xmax and xid not in xip)
+
+
+def _parse_snapshot(text):
+    xmin, xmax, xip = text.split(":")
+    return int(xmin), int(xmax), {int(xid) for xid in xip.split(",") if xid}
+
+
+class LiveSalesHub:
+    """
+    Per-process aggregator of today's sales that feeds the live dashboard streams.
+
+    Args:
+        load_snapshot: Callable (cur) returning (day, sales_by_hour,
+            sales_by_employee) for the current business day, run on a
+            RealDictCursor inside a REPEATABLE READ transaction
+    """
+
+    def __init__(self, load_snapshot):
+        self._load_snapshot = load_snapshot
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._subscribers = set()
+        self._day = None
+        self._by_hour = {}
+        self._by_employee = {}
+        self._snapshot = None
+        self._connected = False
+        self._events = 0
+        self._reloads = 0
+        self._reconnects = 0
+        self._resyncs = 0
+
+    def subscribe(self, timeout=10.0):
+        """
+        Registers a stream and queues the current snapshot as its first event.
+
+        Args:
+            timeout: Seconds to wait for the hub's first snapshot
+
+        Returns:
+            queue.Queue: Queue of (event, data) pairs, or None if the hub has
+                not loaded a snapshot within `timeout`
+        """
+        self._start()
+        if not self._ready.wait(timeout):
+            return None
+        events = queue.Queue(maxsize=LIVE_SALES_QUEUE)
+        with self._lock:
+            events.put_nowait(("snapshot", self._snapshot_payload()))
+            self._subscribers.add(events)
+        return events
+
+    def unsubscribe(self, events):
+        """Removes a stream's queue."""
+        with self._lock:
+            self._subscribers.discard(events)
+
+    def stats(self):
+        """
+        Reports the hub's state for monitoring.
+
+        Returns:
+            dict: Connection state, open streams and event counters
+        """
+        with self._lock:
+            return {
+                "connected": self._connected,
+                "day": self._day.isoformat() if self._day else None,
+                "subscribers": len(self._subscribers),
+                "events": self._events,
+                "snapshot_reloads": self._reloads,
+                "reconnects": self._reconnects,
+                "resyncs": self._resyncs,
+            }
+
+    def _start(self):
+        with self._lock:
+            # a thread inherited through fork does not exist in the child
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run, name="live-sales", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        backoff = 1.0
+        while True:
+            try:
+                self._listen()
+            except (psycopg2.Error, OSError) as e:
+                print(f"Live sales listener failed: {e}")
+            with self._lock:
+                if self._connected:
+                    backoff = 1.0
+                self._connected = False
+                self._reconnects += 1
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _listen(self):
+        conn = connect()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL}")
+            self._reload(conn)
+            with self._lock:
+                self._connected = True
+
+            last_check = time.monotonic()
+            while True:
+                if select.select([conn], [], [], LIVE_SALES_DAY_CHECK)[0]:
+                    conn.poll()
+                    reload = False
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        reload |= self._apply(json.loads(notify.payload))
+                    if reload:
+                        self._reload(conn)
+                if time.monotonic() - last_check >= LIVE_SALES_DAY_CHECK:
+                    last_check = time.monotonic()
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT CURRENT_DATE::timestamp")
+                        if cur.fetchone()[0] != self._day:
+                            self._reload(conn)
+        finally:
+            conn.close()
+
+    def _reload(self, conn):
+        """Reads a fresh snapshot of today and pushes it to every stream."""
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("BEGIN ISOLATION LEVEL REPEATABLE READ")
+            try:
+                cur.execute("SELECT txid_current_snapshot()::text AS snapshot")
+                snapshot = _parse_snapshot(cur.fetchone()["snapshot"])
+                day, by_hour, by_employee = self._load_snapshot(cur)
+            finally:
+                cur.execute("COMMIT")
+
+        with self._lock:
+            self._day = day
+            self._by_hour = dict(by_hour)
+            self._by_employee = dict(by_employee)
+            self._snapshot = snapshot
+            self._reloads += 1
+            payload = self._snapshot_payload()
+            for events in self._subscribers:
+                self._replace(events, payload)
+        self._ready.set()
+
+    def _apply(self, message):
+        """
+        Adds one notification's deltas to today's totals and fans them out.
+
+        Returns:
+            bool: True if the notification belongs to a later day, meaning
+                the day has rolled over and the snapshot must be reloaded
+        """
+        with self._lock:
+            if self._snapshot is None or _visible(message["xid"], self._snapshot):
+                return False
+            day = self._day.date()
+            later_day = False
+            for hour, employee, amount in message["deltas"]:
+                hour_day = datetime.fromisoformat(hour).date()
+                if hour_day != day:
+                    later_day |= hour_day > day
+                    continue
+                self._by_hour[hour] = self._by_hour.get(hour, 0.0) + amount
+                if employee is not None:
+                    self._by_employee[employee] = self._by_employee.get(employee, 0.0) + amount
+                self._events += 1
+                event = ("delta", {"hour": hour, "employee": employee, "amount": amount})
+                for events in self._subscribers:
+                    try:
+                        events.put_nowait(event)
+                    except queue.Full:
+                        # a client this far behind gets the totals instead of the backlog
+                        self._replace(events, self._snapshot_payload())
+                        self._resyncs += 1
+            return later_day
+
+    @staticmethod
+    def _replace(events, payload):
+        """Replaces whatever a stream has buffered with a fresh snapshot."""
+        while True:
+            try:
+                events.get_nowait()
+            except queue.Empty:
+                break
+        events.put_nowait(("snapshot", payload))
+
+    def _snapshot_payload(self):
+        return {
+            "day": self._day.date().isoformat(),
+            "salesByHour": dict(sorted(self._by_hour.items())),
+            "salesByEmployee": dict(self._by_employee),
+        }
+
+
+def format_event(event, data):
+    """Encodes one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,314 @@
+"""
+Menu Writes Module
+
+This module applies menu item create, update and import requests to the
+database. Instead of deleting an item's recipe and allergen rows and
+re-inserting them one statement at a time, it reads the current rows, works
+out what differs from the request and writes only that:
+
+    - one multi-row INSERT for new menu items, recipe lines and allergens
+    - one UPDATE per table for changed menu items and ingredient amounts
+    - one DELETE per table for recipe lines and allergens that were removed
+
+However many items a request carries, it costs a fixed number of round
+trips, and the rows it rewrites are only the ones that changed. A request
+that changes nothing writes nothing and leaves the menu version alone, so
+the catalog caches stay warm.
+
+Optional Settings:
+    - MENU_IMPORT_MAX_ITEMS: Largest number of menu items one import may carry (defaults to 2000)
+"""
+
+import os
+from decimal import Decimal
+
+from psycopg2.extras import execute_values
+
+MENU_IMPORT_MAX_ITEMS = int(os.getenv("MENU_IMPORT_MAX_ITEMS", "2000"))
+
+# menu_items columns a write request sets, in payload order
+_ITEM_FIELDS = ("menu_item_name", "category", "price", "calories", "flavor")
+
+
+class MenuItemError(ValueError):
+    """Raised for a malformed menu item in a write request; endpoints answer HTTP 400."""
+
+
+class MenuItemNotFound(LookupError):
+    """Raised when a write request names a menu_item_id that does not exist."""
+
+
+class MenuItemWrite:
+    """
+    One validated menu item from a write request.
+
+    Attributes:
+        menu_item_id: ID of the item to update, or None to create it
+        fields: Tuple of the _ITEM_FIELDS values
+        recipe: Dictionary of ingredient ID to amount
+        allergens: Set of allergen IDs
+    """
+
+    __slots__ = ("menu_item_id", "fields", "recipe", "allergens")
+
+    def __init__(self, menu_item_id, fields, recipe, allergens):
+        self.menu_item_id = menu_item_id
+        self.fields = fields
+        self.recipe = recipe
+        self.allergens = allergens
+
+
+def parse_menu_item(data, require_id=False):
+    """
+    Validates a menu item payload as sent to /create, /update and /import.
+
+    Args:
+        data: Dictionary with name, category, price, calories, flavor,
+            ingredients (list of {"ingredient_id", "amount"}), allergens (list
+            of allergen IDs) and, for updates, menu_item_id
+        require_id: menu_item_id must be given
+
+    Returns:
+        MenuItemWrite: The validated item; amounts of a repeated ingredient are added up
+
+    Raises:
+        MenuItemError: If a field is missing or has the wrong type
+    """
+    if not isinstance(data, dict):
+        raise MenuItemError("menu item must be an object")
+    name = data.get("name")
+    category = data.get("category")
+    price = data.get("price")
+    calories = data.get("calories")
+    menu_item_id = data.get("menu_item_id")
+    if not name or not category or price is None or calories is None or (require_id and menu_item_id is None):
+        raise MenuItemError("Missing required fields")
+    if menu_item_id is not None and (isinstance(menu_item_id, bool) or not isinstance(menu_item_id, int)):
+        raise MenuItemError("menu_item_id must be an integer")
+    for field, value in (("price", price), ("calories", calories)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise MenuItemError(f"{name}: {field} must be a number")
+
+    recipe = {}
+    for ingredient in data.get("ingredients") or ():
+        try:
+            ingredient_id = int(ingredient["ingredient_id"])
+            amount = ingredient["amount"]
+        except (KeyError, TypeError, ValueError):
+            raise MenuItemError(f"{name}: each ingredient needs an integer ingredient_id and an amount")
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+            raise MenuItemError(f"{name}: ingredient amounts must be numbers")
+        recipe[ingredient_id] = recipe.get(ingredient_id, 0) + amount
+
+    try:
+        allergens = {int(allergen_id) for allergen_id in data.get("allergens") or ()}
+    except (TypeError, ValueError):
+        raise MenuItemError(f"{name}: allergens must be a list of allergen IDs")
+
+    return MenuItemWrite(menu_item_id, (name, category, price, calories, data.get("flavor")), recipe, allergens)
+
+
+def _same(current, wanted):
+    """Compares a stored value with a requested one; numbers compare by value whatever their type."""
+    if isinstance(current, (int, float, Decimal)):
+        return wanted is not None and float(current) == float(wanted)
+    return current == wanted
+
+
+def _item_ids(cur, items):
+    """
+    Locks the menu items being updated, reserves IDs for the ones being created and
+    returns the current field values of the former.
+
+    Raises:
+        MenuItemNotFound: If an item names a menu_item_id that does not exist
+    """
+    ids = sorted({item.menu_item_id for item in items if item.menu_item_id is not None})
+    current = {}
+    if ids:
+        # in ID order, so concurrent writes touching the same items cannot deadlock
+        cur.execute(
+            f"""
+            SELECT menu_item_id, {', '.join(_ITEM_FIELDS)}
+            FROM menu_items
+            WHERE menu_item_id = ANY(%s)
+            ORDER BY menu_item_id
+            FOR UPDATE
+        """,
+            (ids,),
+        )
+        current = {row[0]: row[1:] for row in cur.fetchall()}
+        missing = [menu_item_id for menu_item_id in ids if menu_item_id not in current]
+        if missing:
+            raise MenuItemNotFound(f"Menu item not found: {', '.join(map(str, missing))}")
+
+    new = [item for item in items if item.menu_item_id is None]
+    if new:
+        cur.execute(
+            """
+            SELECT nextval(pg_get_serial_sequence('menu_items', 'menu_item_id'))
+            FROM generate_series(1, %s)
+        """,
+            (len(new),),
+        )
+        for item, row in zip(new, cur.fetchall()):
+            item.menu_item_id = row[0]
+    return current, new
+
+
+def _children(cur, table, column, ids):
+    """Returns {(menu_item_id, child_id): (value, rows)} for the items' recipe lines or allergens."""
+    value = "SUM(ingredient_amount)" if table == "menu_items_ingredients" else "NULL"
+    cur.execute(
+        f"""
+        SELECT menu_item_id, {column}, {value}, COUNT(*)
+        FROM {table}
+        WHERE menu_item_id = ANY(%s)
+        GROUP BY menu_item_id, {column}
+    """,
+        (ids,),
+    )
+    return {(row[0], row[1]): (row[2], row[3]) for row in cur.fetchall()}
+
+
+def _diff(current, wanted):
+    """
+    Splits the child rows of the written items into inserts, updates and deletes.
+
+    Args:
+        current: {(menu_item_id, child_id): (value, rows)} from _children()
+        wanted: {(menu_item_id, child_id): value} requested
+
+    Returns:
+        tuple: (inserts, updates, deletes) as lists of (menu_item_id, child_id[, value]);
+            keys stored more than once are deleted and inserted again as one row
+    """
+    inserts, updates, deletes = [], [], []
+    for key, (value, rows) in current.items():
+        if key not in wanted or rows > 1:
+            deletes.append(key)
+    for key, value in wanted.items():
+        stored = current.get(key)
+        if stored is None or stored[1] > 1:
+            inserts.append(key + (value,))
+        elif value is not None and not _same(stored[0], value):
+            updates.append(key + (value,))
+    return inserts, updates, deletes
+
+
+def _delete_children(cur, table, column, keys):
+    """Deletes the recipe lines or allergens of the given (menu_item_id, child_id) keys in one statement."""
+    if keys:
+        cur.execute(
+            f"""
+            DELETE FROM {table} t
+            USING unnest(%s::int[], %s::int[]) AS d(menu_item_id, child_id)
+            WHERE t.menu_item_id = d.menu_item_id AND t.{column} = d.child_id
+        """,
+            ([key[0] for key in keys], [key[1] for key in keys]),
+        )
+
+
+def write_menu_items(cur, items):
+    """
+    Creates and updates menu items, writing only what differs from the stored rows.
+
+    Must run inside the transaction making the change; the caller bumps the
+    menu version (see catalog.bump_menu_version) when anything changed.
+
+    Args:
+        cur: Cursor inside an open transaction
+        items: List of MenuItemWrite; items without a menu_item_id are
+            created and get their new ID assigned
+
+    Returns:
+        list: "created", "updated" or "unchanged" for each item, in order
+
+    Raises:
+        MenuItemError: If two items name the same menu_item_id
+        MenuItemNotFound: If an item names a menu_item_id that does not exist
+    """
+    ids = [item.menu_item_id for item in items if item.menu_item_id is not None]
+    if len(ids) != len(set(ids)):
+        raise MenuItemError("each menu_item_id may only appear once")
+
+    current, new = _item_ids(cur, items)
+    created = {id(item) for item in new}
+
+    if new:
+        execute_values(
+            cur,
+            f"INSERT INTO menu_items (menu_item_id, {', '.join(_ITEM_FIELDS)}) VALUES %s",
+            [(item.menu_item_id,) + item.fields for item in new],
+            page_size=1000,
+        )
+
+    changed_items = {
+        item.menu_item_id: item.fields
+        for item in items
+        if id(item) not in created
+        and not all(_same(stored, value) for stored, value in zip(current[item.menu_item_id], item.fields))
+    }
+    if changed_items:
+        execute_values(
+            cur,
+            """
+            UPDATE menu_items m
+            SET menu_item_name = v.menu_item_name, category = v.category, price = v.price,
+                calories = v.calories, flavor = v.flavor
+            FROM (VALUES %s) AS v(menu_item_id, menu_item_name, category, price, calories, flavor)
+            WHERE m.menu_item_id = v.menu_item_id
+        """,
+            [(menu_item_id,) + fields for menu_item_id, fields in changed_items.items()],
+            template="(%s, %s, %s, %s::float8, %s::int, %s)",
+            page_size=1000,
+        )
+
+    touched = set(changed_items) | {item.menu_item_id for item in new}
+
+    wanted_recipe = {
+        (item.menu_item_id, ingredient_id): amount for item in items for ingredient_id, amount in item.recipe.items()
+    }
+    wanted_allergens = {(item.menu_item_id, allergen_id): None for item in items for allergen_id in item.allergens}
+
+    existing = list(current)
+    recipe_inserts, recipe_updates, recipe_deletes = _diff(
+        _children(cur, "menu_items_ingredients", "ingredient_id", existing) if existing else {}, wanted_recipe
+    )
+    allergen_inserts, _, allergen_deletes = _diff(
+        _children(cur, "menu_item_allergens", "allergen_id", existing) if existing else {}, wanted_allergens
+    )
+
+    _delete_children(cur, "menu_items_ingredients", "ingredient_id", recipe_deletes)
+    _delete_children(cur, "menu_item_allergens", "allergen_id", allergen_deletes)
+    if recipe_updates:
+        cur.execute(
+            """
+            UPDATE menu_items_ingredients t
+            SET ingredient_amount = u.amount
+            FROM unnest(%s::int[], %s::int[], %s::numeric[]) AS u(menu_item_id, ingredient_id, amount)
+            WHERE t.menu_item_id = u.menu_item_id AND t.ingredient_id = u.ingredient_id
+        """,
+            [list(column) for column in zip(*recipe_updates)],
+        )
+    if recipe_inserts:
+        execute_values(
+            cur,
+            "INSERT INTO menu_items_ingredients (menu_item_id, ingredient_id, ingredient_amount) VALUES %s",
+            recipe_inserts,
+            page_size=1000,
+        )
+    if allergen_inserts:
+        execute_values(
+            cur,
+            "INSERT INTO menu_item_allergens (menu_item_id, allergen_id) VALUES %s",
+            [key[:2] for key in allergen_inserts],
+            page_size=1000,
+        )
+
+    for key in recipe_inserts + recipe_updates + recipe_deletes + allergen_inserts + allergen_deletes:
+        touched.add(key[0])
+    return [
+        "created" if id(item) in created else "updated" if item.menu_item_id in touched else "unchanged"
+        for item in items
+    ]
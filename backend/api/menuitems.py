@@ -5,43 +5,85 @@ This module provides REST API endpoints for managing menu items in the POS syste
 Handles CRUD operations for menu items, including their ingredients, allergens,
 and related properties.
 
+The seasonal, recommendations, preference and availableAllergens listings
+accept `limit`, `cursor` and `fields` for keyset pagination and column
+projection (see pagination.py).
+
 Endpoints:
-    - GET /api/menuitems/ : Get all active menu items with details
+    - GET /api/menuitems/ : Get all active menu items with details (supports If-None-Match)
     - GET /api/menuitems/seasonal : Get seasonal menu items
     - GET /api/menuitems/allergens : Get allergens for a specific menu item
     - GET /api/menuitems/calories : Get calories for a specific menu item
+    - GET|POST /api/menuitems/lookup : Get allergens, calories and flavor for many menu items
     - GET /api/menuitems/recommendations : Get personalized menu recommendations
     - GET /api/menuitems/preference : Get menu items based on preferences
     - GET /api/menuitems/availableAllergens : Get list of all possible allergens
     - POST /api/menuitems/create : Create a new menu item
     - PUT /api/menuitems/update : Update an existing menu item
+    - POST /api/menuitems/import : Create and update many menu items in one transaction
     - DELETE /api/menuitems/delete : Soft delete a menu item
 """
 
-from flask import request, jsonify, Blueprint
-from .database import get_db_connection
+import gzip
+import hashlib
+import threading
+from decimal import Decimal
+
+from flask import request, jsonify, Blueprint, current_app
+from .database import get_db_connection, run_transaction
+from .catalog import bump_menu_version, get_catalog, invalidate_catalog
+from .menu_writes import (
+    MENU_IMPORT_MAX_ITEMS,
+    MenuItemError,
+    MenuItemNotFound,
+    MenuItemWrite,
+    parse_menu_item,
+    write_menu_items,
+)
+from .pagination import PageError, page_request
+from .preference_index import PREFERENCE_INDEX, preference_index
+from .recommendations import recommend, recommendations_ready
 from psycopg2.extras import RealDictCursor
 import psycopg2
 
 menuitem_bp = Blueprint('menuitems', __name__, url_prefix='/api/menuitems')
 
+# columns `fields` may select
+MENU_ITEM_COLUMNS = ('menu_item_id', 'menu_item_name', 'category', 'price', 'calories', 'seasonal', 'active', 'flavor')
+ALLERGEN_COLUMNS = ('id', 'name')
+
 @menuitem_bp.route('/seasonal', methods=['GET'])
 def get_seasonal_menuitems():
     """
-    Retrieves all seasonal menu items.
+    Retrieves seasonal menu items, ordered by menu_item_id.
+
+    Query Parameters:
+        limit (int): Items per page (all of them if neither limit nor cursor is given)
+        cursor (str): X-Next-Cursor header of the previous page
+        fields (str): Comma-separated columns to return (see MENU_ITEM_COLUMNS)
 
     Returns:
         tuple: JSON response with:
             - list of seasonal menu items
-            - HTTP 200 on success
+            - HTTP 200 on success, with X-Next-Cursor while more pages follow
+            - HTTP 400 on an invalid limit, cursor or fields parameter
             - HTTP 500 on error
     """
+    try:
+        page = page_request('menuitems.seasonal', ('menu_item_id',), MENU_ITEM_COLUMNS)
+    except PageError as e:
+        return jsonify({'error': str(e)}), 400
+
     try:
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM menu_items WHERE seasonal = 't'")
-                ingredients = cur.fetchall()
-        return jsonify(ingredients), 200
+                after, params = page.after_sql()
+                cur.execute(
+                    f"SELECT {page.select()} FROM menu_items WHERE seasonal = 't' AND {after} ORDER BY menu_item_id LIMIT %s",
+                    params + [page.fetch]
+                )
+                ingredients, headers = page.finish(cur.fetchall())
+        return jsonify(ingredients), 200, headers
     except psycopg2.Error as e:
         print(f'Error getting seasonal items: {e}')
         return jsonify({"error": "could not get seasonal menu items"}), 500
@@ -69,23 +111,14 @@ def get_menuitem_allergens():
         return jsonify({'error': 'menu_item_name parameter is required'}), 400
 
     try:
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                query = """
-                    SELECT a.name AS allergen_name
-                    FROM menu_items mi
-                    JOIN menu_item_allergens mia ON mi.menu_item_id = mia.menu_item_id
-                    JOIN allergens a ON mia.allergen_id = a.id
-                    WHERE mi.menu_item_name = %s;
-                """
-                cur.execute(query, (menu_item_name,))
-                allergens = cur.fetchall()
+        entry = get_catalog().get(menu_item_name)
+        allergens = entry.allergens if entry else ()
 
         if not allergens:
             return jsonify({'message': 'No allergens found for the menu item'}), 404
         
         # Return the list of allergen names
-        return jsonify([allergen['allergen_name'] for allergen in allergens]), 200
+        return jsonify([allergen_name for _, allergen_name in allergens]), 200
     except psycopg2.Error as e:
         return jsonify({'error': str(e)}), 500
 
@@ -98,23 +131,102 @@ def get_menuitem_calories():
         return jsonify({'error': 'menu_item_name parameter is required'}), 400
 
     try:
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                query = """
-                    SELECT mi.calories
-                    FROM menu_items mi
-                    WHERE mi.menu_item_name = %s;
-                """
-                cur.execute(query, (menu_item_name,))
-                result = cur.fetchone()
+        entry = get_catalog().get(menu_item_name)
 
-        if result is None:
+        if entry is None:
             return jsonify({'error': 'Menu item not found'}), 404
         
-        return jsonify({'calories': result['calories']}), 200
+        return jsonify({'calories': entry.calories}), 200
+    except psycopg2.Error as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@menuitem_bp.route('/lookup', methods=['GET', 'POST'])
+def lookup_menuitems():
+    """
+    Returns allergens, calories and flavor for many menu items at once.
+
+    Replaces one /allergens and one /calories request per item on screen.
+    Served from the in-process menu catalog, so a batch costs no database
+    round trip unless the catalog has to be rebuilt. Items that cannot be
+    found are reported individually instead of failing the batch.
+
+    Query Parameters (GET):
+        menu_item_name (str): Name of a menu item, repeatable
+        menu_item_id (int): ID of a menu item, repeatable
+
+    Expected JSON payload (POST):
+        {
+            "menu_items": list  # Menu item names (str) and/or IDs (int)
+        }
+
+    Returns:
+        tuple: JSON response with:
+            - results: one entry per requested item, in request order, with
+              the requested value, its type ("name" or "id") and a status:
+              200 with the item's {menu_item_id, menu_item_name, allergens,
+              calories, flavor, active}, 404 for an unknown item or 400 for
+              a value that is neither a name nor an integer ID (type null)
+            - HTTP 200 on success
+            - HTTP 400 if no menu items are given
+            - HTTP 500 on error
+    """
+    # (value as requested, catalog index to look in, value to look up)
+    lookups = []
+    if request.method == 'POST':
+        data = request.json or {}
+        keys = data.get('menu_items') if isinstance(data, dict) else None
+        if not isinstance(keys, list):
+            return jsonify({'error': 'menu_items must be a list'}), 400
+        for key in keys:
+            if isinstance(key, str) and key:
+                lookups.append((key, 'name', key))
+            elif isinstance(key, int) and not isinstance(key, bool):
+                lookups.append((key, 'id', key))
+            else:
+                lookups.append((key, None, None))
+    else:
+        for param, value in request.args.items(multi=True):
+            if param == 'menu_item_name':
+                lookups.append((value, 'name', value))
+            elif param == 'menu_item_id':
+                try:
+                    lookups.append((value, 'id', int(value)))
+                except ValueError:
+                    lookups.append((value, None, None))
+
+    if not lookups:
+        return jsonify({'error': 'at least one menu item name or ID is required'}), 400
+
+    try:
+        catalog = get_catalog()
     except psycopg2.Error as e:
         return jsonify({'error': str(e)}), 500
 
+    results = []
+    for key, index, value in lookups:
+        result = {'requested': key, 'type': index}
+        if index is None:
+            result.update(status=400, error='Expected a menu item name or integer ID')
+            results.append(result)
+            continue
+
+        entry = catalog.get(value) if index == 'name' else catalog.by_id.get(value)
+        if entry is None:
+            result.update(status=404, error='Menu item not found')
+        else:
+            result.update(status=200, item={
+                'menu_item_id': entry.menu_item_id,
+                'menu_item_name': entry.menu_item_name,
+                'allergens': [allergen_name for _, allergen_name in entry.allergens],
+                'calories': entry.calories,
+                'flavor': entry.flavor,
+                'active': entry.active,
+            })
+        results.append(result)
+
+    return jsonify({'results': results}), 200
+
 
 @menuitem_bp.route('/create', methods=['POST'])
 def create_menuitems():
@@ -136,48 +248,28 @@ def create_menuitems():
         tuple: JSON response with:
             - created menu_item_id
             - HTTP 200 on success
+            - HTTP 400 if a required field is missing or malformed
             - HTTP 500 on error
     """
     data = request.json
-    name = data['name']
-    category = data['category']
-    price = data['price']
-    calories = data['calories']
-    ingredients = data['ingredients']
-    allergens = data['allergens']  # list of allergen ids (1-8)
-    flavor = data['flavor']
 
     print(f"Received data: {data}")
 
     try:
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(
-                    "INSERT INTO menu_items (menu_item_name, category, price, calories, flavor) VALUES (%s, %s, %s, %s, %s) RETURNING menu_item_id;",
-                    (name, category, price, calories, flavor)
-                )
-                row = cur.fetchone()
-                menu_item_id = row['menu_item_id']
-                print(f"Created menu item with ID: {menu_item_id}")
-
-                for ingredient in ingredients:
-                    ingredient_id = ingredient['ingredient_id']
-                    amount = ingredient['amount']
-
-                    cur.execute(
-                        "INSERT INTO menu_items_ingredients (menu_item_id, ingredient_id, ingredient_amount) VALUES (%s, %s, %s);",
-                        (menu_item_id, ingredient_id, amount)
-                    )
-                    print(f"Added ingredient with ID {ingredient_id} and amount {amount}")
+        item = parse_menu_item(data)
+    except MenuItemError as e:
+        return jsonify({"error": str(e)}), 400
+    item.menu_item_id = None
 
-                for allergen_id in allergens:
-                    cur.execute(
-                        "INSERT INTO menu_item_allergens (menu_item_id, allergen_id) VALUES (%s, %s);",
-                        (menu_item_id, allergen_id)
-                    )
-                    print(f"Added allergen with ID {allergen_id}")
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                write_menu_items(cur, [item])
+                bump_menu_version(cur)
+                print(f"Created menu item with ID: {item.menu_item_id}")
 
-        return jsonify(menu_item_id), 200
+        invalidate_catalog()
+        return jsonify(item.menu_item_id), 200
     except psycopg2.Error as e:
         print(f"Error creating menu item: {e}")
         return jsonify({"error": "could not create menu item"}), 500
@@ -185,69 +277,173 @@ def create_menuitems():
 
 @menuitem_bp.route('/update', methods=['PUT'])
 def update_menuitem():
-    data = request.json
-    name = data['name']
-    category = data['category']
-    price = data['price']
-    calories = data['calories']
-    ingredients = data['ingredients']
-    allergens = data['allergens']
-    flavor = data['flavor']
-    menu_item_id = data['menu_item_id']
-    
-    print('allergens', allergens)
-
-    if not name or not category or price is None or calories is None or menu_item_id is None:
-        return jsonify({"error": "Missing required fields"}), 400
+    """
+    Updates a menu item, its ingredients and its allergens.
+
+    Only the fields, recipe lines and allergens that differ from the stored
+    ones are written, so the cost of an edit follows the size of the change.
+
+    Expected JSON payload:
+        The /create payload plus menu_item_id
+
+    Returns:
+        tuple: JSON response with:
+            - success flag and whether anything changed
+            - HTTP 200 on success
+            - HTTP 400 if a required field is missing or malformed
+            - HTTP 404 if the menu item does not exist
+            - HTTP 500 on error
+    """
+    try:
+        item = parse_menu_item(request.json, require_id=True)
+    except MenuItemError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
         with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            with conn.cursor() as cur:
+                status, = write_menu_items(cur, [item])
+                if status != 'unchanged':
+                    bump_menu_version(cur)
+
+        if status != 'unchanged':
+            invalidate_catalog()
+        return jsonify({"success": True, "changed": status != 'unchanged'}), 200
+    except MenuItemNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except psycopg2.Error as e:
+        print(f"Error updating menu item: {e}")
+        return jsonify({"error": "could not update menu item"}), 500
+
+
+@menuitem_bp.route('/import', methods=['POST'])
+def import_menuitems():
+    """
+    Applies a whole menu import in one database transaction.
+
+    Each item is the /create payload. An item with a menu_item_id updates that
+    item; one without is matched to the active menu item of the same name, and
+    created when there is none, so running the same import twice changes
+    nothing. Either every item is applied or none is.
+
+    Expected JSON payload:
+        {
+            "items": list[dict]  # At most MENU_IMPORT_MAX_ITEMS items
+        }
+
+    Returns:
+        tuple: JSON response with:
+            - created/updated/unchanged counts and, per item in order, its
+              menu_item_id and status
+            - HTTP 200 on success
+            - HTTP 400 if the import is malformed, too large or names the same item twice
+            - HTTP 404 if an item names a menu_item_id that does not exist
+            - HTTP 500 on error
+    """
+    data = request.json or {}
+    payload = data.get('items') if isinstance(data, dict) else None
+
+    if not isinstance(payload, list):
+        return jsonify({"error": "items must be a list"}), 400
+    if len(payload) > MENU_IMPORT_MAX_ITEMS:
+        return jsonify({"error": f"At most {MENU_IMPORT_MAX_ITEMS} menu items per import"}), 400
+
+    try:
+        parsed = [parse_menu_item(entry) for entry in payload]
+    except MenuItemError as e:
+        return jsonify({"error": str(e)}), 400
+    names = [item.fields[0] for item in parsed if item.menu_item_id is None]
+    if len(names) != len(set(names)):
+        return jsonify({"error": "each new menu item name may only appear once"}), 400
+
+    def apply(conn):
+        items = [MenuItemWrite(item.menu_item_id, item.fields, item.recipe, item.allergens) for item in parsed]
+        with conn.cursor() as cur:
+            names = sorted({item.fields[0] for item in items if item.menu_item_id is None})
+            if names:
                 cur.execute(
                     """
-                    UPDATE menu_items 
-                    SET menu_item_name = %s, category = %s, price = %s, calories = %s, flavor = %s 
-                    WHERE menu_item_id = %s;
+                    SELECT menu_item_name, MIN(menu_item_id)
+                    FROM menu_items
+                    WHERE active = 't' AND menu_item_name = ANY(%s)
+                    GROUP BY menu_item_name
                     """,
-                    (name, category, price, calories, flavor, menu_item_id)
+                    (names,)
                 )
+                by_name = dict(cur.fetchall())
+                for item in items:
+                    if item.menu_item_id is None:
+                        item.menu_item_id = by_name.get(item.fields[0])
+            statuses = write_menu_items(cur, items)
+            if any(status != 'unchanged' for status in statuses):
+                bump_menu_version(cur)
+        return items, statuses
 
-                cur.execute("DELETE FROM menu_items_ingredients WHERE menu_item_id = %s;", (menu_item_id,))
-                for ingredient in ingredients:
-                    ingredient_id = ingredient['ingredient_id']
-                    amount = ingredient['amount']
-                    cur.execute(
-                        """
-                        INSERT INTO menu_items_ingredients (menu_item_id, ingredient_id, ingredient_amount) 
-                        VALUES (%s, %s, %s);
-                        """,
-                        (menu_item_id, ingredient_id, amount)
-                    )
-
-                cur.execute("DELETE FROM menu_item_allergens WHERE menu_item_id = %s;", (menu_item_id,))
-                print(allergens)
-                for allergen_id in allergens:
-                    cur.execute(
-                        """
-                        INSERT INTO menu_item_allergens (menu_item_id, allergen_id) 
-                        VALUES (%s, %s);
-                        """,
-                        (menu_item_id, allergen_id)
-                    )
-
-        return jsonify({"success": True}), 200
+    try:
+        items, statuses = run_transaction(apply)
+    except MenuItemError as e:
+        return jsonify({"error": str(e)}), 400
+    except MenuItemNotFound as e:
+        return jsonify({"error": str(e)}), 404
     except psycopg2.Error as e:
-        print(f"Error updating menu item: {e}")
-        return jsonify({"error": "could not update menu item"}), 500
+        print(f"Error importing menu: {e}")
+        return jsonify({"error": "could not import menu"}), 500
+
+    if any(status != 'unchanged' for status in statuses):
+        invalidate_catalog()
+    return jsonify({
+        "message": "Menu imported",
+        "created": statuses.count('created'),
+        "updated": statuses.count('updated'),
+        "unchanged": statuses.count('unchanged'),
+        "results": [
+            {"index": index, "menu_item_id": item.menu_item_id, "status": status}
+            for index, (item, status) in enumerate(zip(items, statuses))
+        ],
+    }), 200
 
 
 @menuitem_bp.route('/recommendations', methods=['GET'])
 def get_recommendations():
+    """
+    Recommends menu items for a customer: what they buy most, then what is
+    often bought with it, then the most popular items.
+
+    Answered from the tables kept by `flask refresh-recommendations` (see
+    recommendations.py), so the cost does not grow with the customer's
+    history. Until that job has run once, falls back to ranking the items
+    the customer bought from their raw order history.
+
+    Query Parameters:
+        customerId (int): Customer to recommend for
+        limit (int): Items per page (defaults to 6)
+        cursor (str): X-Next-Cursor header of the previous page
+        fields (str): Comma-separated columns to return (see MENU_ITEM_COLUMNS)
+
+    Returns:
+        tuple: JSON response with:
+            - list of menu items
+            - HTTP 200 on success, with X-Next-Cursor while more pages follow
+            - HTTP 400 on an invalid limit, cursor or fields parameter
+            - HTTP 500 on error
+    """
     customer_id = request.args.get("customerId")
+    try:
+        # ties on score are broken by menu_item_id so pages never overlap
+        page = page_request('menuitems.recommendations', ('tier', 'score', 'menu_item_id'), MENU_ITEM_COLUMNS,
+                            default_limit=6, hidden=('tier', 'score'))
+    except PageError as e:
+        return jsonify({'error': str(e)}), 400
+
     try:
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                string ="""SELECT m.*
+                if recommendations_ready(cur):
+                    recommended_items, headers = page.finish(recommend(cur, customer_id, page))
+                    return jsonify(recommended_items), 200, headers
+
+                after, params = page.after_sql(('2', 'top_items.total_quantity', 'm.menu_item_id'), descending=True)
+                string =f"""SELECT {page.select('m')}, 2 AS tier, top_items.total_quantity AS score
                             FROM menu_items m
                             JOIN (
                                 SELECT td.menu_item_id, SUM(td.item_quantity_sold) AS total_quantity
@@ -255,79 +451,128 @@ def get_recommendations():
                                 JOIN transaction_details td ON t.transaction_id = td.transaction_id
                                 WHERE t.customer_id = %s
                                 GROUP BY td.menu_item_id
-                                ORDER BY total_quantity DESC
-                                LIMIT 6
                             ) AS top_items ON m.menu_item_id = top_items.menu_item_id
-                            ORDER BY top_items.total_quantity DESC;
+                            WHERE {after}
+                            ORDER BY top_items.total_quantity DESC, m.menu_item_id DESC
+                            LIMIT %s;
                         """
-                cur.execute(string, (customer_id,))
-                recommended_items = cur.fetchall()
-        return jsonify(recommended_items), 200
+                cur.execute(string, [customer_id] + params + [page.fetch])
+                recommended_items, headers = page.finish(cur.fetchall())
+        return jsonify(recommended_items), 200, headers
     except psycopg2.Error as e:
         print(f"Error getting the recommended menu items for user: {e}")
         return jsonify({"error": "could not get recommended menu items"}), 500
 
+
+class _MenuBody:
+    """
+    Serialized GET /api/menuitems/ response for one catalog snapshot.
+
+    Attributes:
+        version: Catalog snapshot version the body was built from
+        body: JSON body
+        gzipped: The same body gzip-compressed
+        etag: Entity tag of the uncompressed body (the gzipped one adds "-gz")
+    """
+
+    __slots__ = ("version", "body", "gzipped", "etag")
+
+    def __init__(self, version, body):
+        self.version = version
+        self.body = body
+        self.gzipped = gzip.compress(body, mtime=0)
+        # a content hash, so every worker hands out the same tag for the same menu
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+
+
+_menu_body_lock = threading.Lock()
+_menu_body = None
+
+
+def _menu_item_details(entry):
+    """Formats one catalog entry the way the menu items listing returns it."""
+    return {
+        'menu_item_id': entry.menu_item_id,
+        'menu_item_name': entry.menu_item_name,
+        'category': entry.category,
+        'price': entry.price,
+        'calories': entry.calories,
+        'seasonal': entry.seasonal,
+        'active': entry.active,
+        'flavor': entry.flavor,
+        'allergens': [{"id": allergen_id, "name": allergen_name} for allergen_id, allergen_name in entry.allergens],
+        'ingredients': [
+            {"id": ingredient_id, "amount": float(amount) if isinstance(amount, Decimal) else amount}
+            for ingredient_id, amount in entry.recipe
+        ] or None,
+    }
+
+
+def _menu_listing(snapshot):
+    """Returns the serialized menu for a catalog snapshot, building it once per snapshot."""
+    global _menu_body
+
+    menu_body = _menu_body
+    if menu_body is not None and menu_body.version == snapshot.version:
+        return menu_body
+    with _menu_body_lock:
+        menu_body = _menu_body
+        if menu_body is None or menu_body.version != snapshot.version:
+            items = [
+                _menu_item_details(entry)
+                for _, entry in sorted(snapshot.by_id.items())
+                if entry.active
+            ]
+            menu_body = _MenuBody(snapshot.version, current_app.json.dumps(items).encode())
+            if _menu_body is None or _menu_body.version < snapshot.version:
+                _menu_body = menu_body
+    return menu_body
+
+
 @menuitem_bp.route('/', methods=['GET'])
 def get_menuitems():
     """
     Retrieves all active menu items with their complete details.
     Includes ingredients, allergens, and other properties.
 
+    The body is served from the in-process menu catalog (see catalog.py),
+    serialized and gzipped once per catalog snapshot, so a request costs no
+    database query while the snapshot is current. Responses carry an ETag;
+    a request whose If-None-Match matches gets 304 Not Modified and no body.
+
     Returns:
         tuple: JSON response with:
-            - list of menu items with full details
-            - HTTP 200 on success
+            - list of menu items with full details, ordered by menu_item_id
+            - HTTP 200 on success (gzip-encoded if the client accepts it)
+            - HTTP 304 if the client's copy is current
             - HTTP 500 on error
 
     Note:
         Inactive menu items are excluded from results
     """
     try:
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                query = """
-                    SELECT 
-                        mi.menu_item_id,
-                        mi.menu_item_name,
-                        mi.category,
-                        mi.price,
-                        mi.calories,
-                        mi.seasonal,
-                        mi.active,
-                        mi.flavor,
-                        ARRAY_AGG(DISTINCT a.id) FILTER (WHERE a.id IS NOT NULL) AS allergen_ids,
-                        ARRAY_AGG(DISTINCT a.name) FILTER (WHERE a.name IS NOT NULL) AS allergen_names,
-                        JSON_AGG(DISTINCT jsonb_build_object('id', mi_ing.ingredient_id, 'amount', mi_ing.ingredient_amount)) 
-                            FILTER (WHERE mi_ing.ingredient_id IS NOT NULL) AS ingredients
-                    FROM menu_items mi
-                    LEFT JOIN menu_item_allergens mia ON mi.menu_item_id = mia.menu_item_id
-                    LEFT JOIN allergens a ON mia.allergen_id = a.id
-                    LEFT JOIN menu_items_ingredients mi_ing ON mi.menu_item_id = mi_ing.menu_item_id
-                    WHERE mi.active = 't'
-                    GROUP BY mi.menu_item_id, mi.menu_item_name, mi.category, mi.price, mi.calories, mi.seasonal, mi.active, mi.flavor;
-                """
-                cur.execute(query)
-                menu_items = cur.fetchall()
-                
-                for item in menu_items:
-                    # Combine allergen IDs and names into a list of dictionaries
-                    if item['allergen_ids'] and item['allergen_ids'][0] is not None:
-                        item['allergens'] = [
-                            {"id": allergen_id, "name": allergen_name}
-                            for allergen_id, allergen_name in zip(item['allergen_ids'], item['allergen_names'])
-                        ]
-                    else:
-                        item['allergens'] = []
-
-                    # Remove the separate allergen_ids and allergen_names from the response
-                    del item['allergen_ids']
-                    del item['allergen_names']
-
-                return jsonify(menu_items), 200
+        menu_body = _menu_listing(get_catalog())
     except psycopg2.Error as e:
         print(f"Error getting menu items with details: {e}")
         return jsonify({"error": "could not get menu items with details"}), 500
 
+    gzipped = 'gzip' in request.accept_encodings
+    etag = menu_body.etag + '-gz' if gzipped else menu_body.etag
+    headers = {
+        'ETag': f'"{etag}"',
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding',
+    }
+    if request.if_none_match.contains_weak(etag):
+        return current_app.response_class(status=304, headers=headers)
+
+    if gzipped:
+        headers['Content-Encoding'] = 'gzip'
+        body = menu_body.gzipped
+    else:
+        body = menu_body.body
+    return current_app.response_class(body, status=200, mimetype='application/json', headers=headers)
+
 @menuitem_bp.route('/delete', methods=['DELETE'])
 def delete_menuitem():
     menu_item_id = request.args.get('menu_item_id')
@@ -341,57 +586,137 @@ def delete_menuitem():
                 print(f"Menu Item ID: {menu_item_id}")
  
                 cur.execute("UPDATE menu_items SET active = FALSE WHERE menu_item_id = %s;", (menu_item_id,))
+                bump_menu_version(cur)
 
+        invalidate_catalog()
         return jsonify({'message': 'Menu item deleted successfully'}), 200
     except psycopg2.Error as e:
         print(f"Error deleting menu item: {e}")
         return jsonify({'error': 'could not delete menu item'}), 500
 
+# preference quiz filter; {columns} and {after} come from the Page, parameters
+# are (chicken, chicken, flavors, allergens, calorie_min, calorie_max, *after, limit)
+PREFERENCE_SQL = """SELECT {columns}
+                    FROM menu_items
+                    WHERE
+                    (
+                        CASE
+                            WHEN %s = 'true' THEN menu_item_name ILIKE '%%Chicken%%'
+                            WHEN %s = 'false' THEN menu_item_name NOT ILIKE '%%Chicken%%'
+                            ELSE TRUE
+                        END
+                    )
+                    AND flavor IN %s
+                    AND menu_item_id NOT IN (
+                        SELECT DISTINCT menu_item_id
+                        FROM menu_item_allergens
+                        WHERE allergen_id = ANY(%s::integer[])
+                    )
+                    AND calories BETWEEN %s AND %s
+                    AND active = 't'
+                    AND {after}
+                    ORDER BY menu_item_id
+                    LIMIT %s;
+                """
+
+
 @menuitem_bp.route('/preference', methods=['GET'])
 def get_preferences():
+    """
+    Finds active menu items matching the customer's quiz answers.
+
+    Answered from the in-process preference index (see preference_index.py)
+    unless PREFERENCE_INDEX is off, in which case the filter runs in SQL.
+
+    Query Parameters:
+        chicken (str): "true" for items with chicken, "false" for items without, anything else for either
+        flavors (list[str]): Flavors to accept; no flavors returns an empty list
+        allergens (list[int]): Allergen IDs to avoid
+        calorie_min (int): Fewest calories, inclusive (defaults to 0)
+        calorie_max (int): Most calories, inclusive (defaults to 1000)
+        limit, cursor, fields: Pagination and projection (see pagination.py)
+
+    Returns:
+        tuple: JSON response with:
+            - list of menu items, ordered by menu_item_id
+            - HTTP 200 on success, with X-Next-Cursor while more pages follow
+            - HTTP 400 on an invalid limit, cursor or fields parameter
+            - HTTP 500 on error
+    """
     chicken = request.args.get('chicken', type=str)
     flavors = request.args.getlist('flavors')
-    allergens = request.args.getlist('allergens', type=tuple)
+    allergens = request.args.getlist('allergens', type=int)
     calorie_min = request.args.get('calorie_min', default=0, type=int)
     calorie_max = request.args.get('calorie_max', default=1000, type=int)
     if not flavors:
         return jsonify([]), 200
     try:
+        page = page_request('menuitems.preference', ('menu_item_id',), MENU_ITEM_COLUMNS)
+    except PageError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        if PREFERENCE_INDEX:
+            index = preference_index(get_catalog())
+            mask = index.match(
+                flavors,
+                allergens,
+                calorie_min,
+                calorie_max,
+                with_proteins=('chicken',) if chicken == 'true' else (),
+                without_proteins=('chicken',) if chicken == 'false' else (),
+            )
+            columns = page.fields or MENU_ITEM_COLUMNS
+            after = page.after[0] if page.after else None
+            rows = [
+                {name: getattr(entry, name) for name in set(columns) | {'menu_item_id'}}
+                for entry in index.entries_of(mask, after, page.fetch)
+            ]
+            prefered, headers = page.finish(rows)
+            return jsonify(prefered), 200, headers
+
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                string ="""SELECT * 
-                            FROM menu_items 
-                            WHERE 
-                            (
-                                CASE
-                                    WHEN %s = 'true' THEN menu_item_name ILIKE '%%Chicken%%'
-                                    WHEN %s = 'false' THEN menu_item_name NOT ILIKE '%%Chicken%%'
-                                    ELSE TRUE
-                                END
-                            )
-                            AND flavor IN %s
-                            AND menu_item_id NOT IN (
-                                SELECT DISTINCT menu_item_id
-                                FROM menu_item_allergens
-                                WHERE allergen_id = ANY(%s::integer[])
-                            )
-                            AND calories BETWEEN %s AND %s;
-                        """
-                cur.execute(string, (chicken, chicken, tuple(flavors), allergens, calorie_min, calorie_max))
-                prefered = cur.fetchall()
-        return jsonify(prefered), 200
+                after, params = page.after_sql()
+                cur.execute(
+                    PREFERENCE_SQL.format(columns=page.select(), after=after),
+                    [chicken, chicken, tuple(flavors), allergens, calorie_min, calorie_max] + params + [page.fetch]
+                )
+                prefered, headers = page.finish(cur.fetchall())
+        return jsonify(prefered), 200, headers
     except psycopg2.Error as e:
         print(f"Error getting the preference driven recommended menu items: {e}")
         return jsonify({"error": "Error getting the preference driven recommended menu items"}), 500
 
 @menuitem_bp.route('/availableAllergens', methods=['GET'])
 def get_allergens():
+    """
+    Lists every allergen, ordered by id.
+
+    Query Parameters:
+        limit (int): Allergens per page (all of them if neither limit nor cursor is given)
+        cursor (str): X-Next-Cursor header of the previous page
+        fields (str): Comma-separated columns to return (id, name)
+
+    Returns:
+        tuple: JSON response with:
+            - list of allergens
+            - HTTP 200 on success, with X-Next-Cursor while more pages follow
+            - HTTP 400 on an invalid limit, cursor or fields parameter
+            - HTTP 500 on error
+    """
+    try:
+        page = page_request('menuitems.availableAllergens', ('id',), ALLERGEN_COLUMNS)
+    except PageError as e:
+        return jsonify({'error': str(e)}), 400
+
     try:
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM allergens;")
-                allergens = cur.fetchall()
-        return jsonify(allergens), 200
+                after, params = page.after_sql()
+                cur.execute(f"SELECT {page.select()} FROM allergens WHERE {after} ORDER BY id LIMIT %s;", params + [page.fetch])
+                allergens, headers = page.finish(cur.fetchall())
+        return jsonify(allergens), 200, headers
     except psycopg2.Error as e:
         print(f"Error getting the list of allergens: {e}")
         return jsonify({"error": "Error getting the list of allergens"}), 500
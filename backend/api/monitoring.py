@@ -0,0 +1,100 @@
+"""
+Monitoring API Module
+
+This module exposes runtime statistics of the backend for dashboards and alerting.
+
+Endpoints:
+    - GET /api/monitoring/pool : Get database connection pool statistics
+    - GET /api/monitoring/groupCommit : Get order group commit statistics
+    - GET /api/monitoring/reportCache : Get report cache statistics
+    - GET /api/monitoring/liveSales : Get live sales stream statistics
+    - GET /api/monitoring/reportAdmission : Get report admission and cancellation statistics
+"""
+
+from flask import jsonify, Blueprint
+from .admission import report_limiter
+from .database import get_pool_stats
+from .report_cache import report_cache
+from .reports import live_sales_hub
+from .transactions import group_commit_stats
+
+monitoring_bp = Blueprint("monitoring", __name__, url_prefix="/api/monitoring")
+
+
+@monitoring_bp.route("/pool", methods=["GET"])
+def get_pool_status():
+    """
+    Reports the state of this worker's database connection pool.
+
+    Returns:
+        tuple: JSON response containing:
+            - in_use, idle, waiting and opening connection counts
+            - lifetime checkout, timeout, recycle and discard counters
+            - total, average and maximum checkout wait time in seconds
+            - HTTP status code 200
+
+    Note:
+        Each gunicorn worker owns its own pool, so the figures are per process (see "pid").
+    """
+    return jsonify(get_pool_stats()), 200
+
+
+@monitoring_bp.route("/groupCommit", methods=["GET"])
+def get_group_commit_status():
+    """
+    Reports how well order placements are being batched by group commit.
+
+    Returns:
+        tuple: JSON response containing:
+            - enabled flag, window and maximum batch size
+            - number of batches and orders committed, failed batches
+            - largest and average batch size
+            - HTTP status code 200
+    """
+    return jsonify(group_commit_stats()), 200
+
+
+@monitoring_bp.route("/reportCache", methods=["GET"])
+def get_report_cache_status():
+    """
+    Reports the size and effectiveness of this worker's report cache.
+
+    Returns:
+        tuple: JSON response containing:
+            - enabled flag, byte budget, cached bytes and entry count
+            - per-endpoint hits, misses, invalidations and evictions
+            - HTTP status code 200
+    """
+    return jsonify(report_cache.stats()), 200
+
+
+@monitoring_bp.route("/liveSales", methods=["GET"])
+def get_live_sales_status():
+    """
+    Reports the state of this worker's live sales listener.
+
+    Returns:
+        tuple: JSON response containing:
+            - connected flag and the business day being tracked
+            - number of open streams
+            - delta events, snapshot reloads, reconnects and slow-client resyncs
+            - HTTP status code 200
+    """
+    return jsonify(live_sales_hub.stats()), 200
+
+
+@monitoring_bp.route("/reportAdmission", methods=["GET"])
+def get_report_admission_status():
+    """
+    Reports how this worker is admitting report requests.
+
+    Returns:
+        tuple: JSON response containing:
+            - slot and queue limits, and the statement_timeout budget per blueprint
+            - slots in use and requests queued right now
+            - admitted, rejected (queue full) and timed out (waited too long) counters
+            - queries cancelled because the client disconnected
+            - average and maximum queue wait time in seconds
+            - HTTP status code 200
+    """
+    return jsonify(report_limiter.stats()), 200
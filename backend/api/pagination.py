@@ -0,0 +1,222 @@
+"""
+Pagination Module
+
+This module provides keyset pagination and field projection for the list
+endpoints.
+
+A paged request passes `limit`, and `cursor` for every page after the first.
+Rows come back ordered by a unique key, and each page only reads the rows
+after the previous page's last key, through the key's index, so a page costs
+the same however deep into the table it is. The response body stays a JSON
+array; while more rows follow, the X-Next-Cursor header carries an opaque
+token to pass as `cursor` for the next page. Requests without `limit` or
+`cursor` get every row, as before.
+
+`fields` is a comma-separated list of columns to return, checked against each
+endpoint's allowlist, and narrows the SELECT list itself. The key columns are
+selected as well, to build the cursor, but only returned when requested.
+
+Usage:
+    page = page_request("menuitems.seasonal", ("menu_item_id",), MENU_ITEM_COLUMNS)
+    after, params = page.after_sql(("m.menu_item_id",))
+    cur.execute(f"SELECT {page.select('m')} FROM menu_items m WHERE {after} "
+                "ORDER BY m.menu_item_id LIMIT %s", params + [page.fetch])
+    rows, headers = page.finish(cur.fetchall())
+
+Optional Settings:
+    - PAGE_SIZE_DEFAULT: Page size when a cursor is given without a limit (defaults to 100)
+    - PAGE_SIZE_MAX: Largest page a request may ask for (defaults to 500)
+"""
+
+import base64
+import binascii
+import json
+import os
+
+from flask import request
+
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "500"))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageError(ValueError):
+    """Raised for an invalid limit, cursor or fields parameter; endpoints answer HTTP 400."""
+
+
+def encode_cursor(scope, values):
+    """
+    Builds the opaque cursor token for the row with the given key values.
+
+    Args:
+        scope: Name of the listing, so a cursor cannot be replayed against another one
+        values: JSON-serializable key values of the last row returned
+    """
+    raw = json.dumps([scope, list(values)], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(scope, token, size):
+    """
+    Reads the key values out of a cursor token.
+
+    Args:
+        scope: Name of the listing the cursor must belong to
+        token: Token from a previous X-Next-Cursor header
+        size: Number of key columns
+
+    Returns:
+        list: Key values of the previous page's last row
+
+    Raises:
+        PageError: If the token is malformed or belongs to another listing
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        cursor_scope, values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise PageError("cursor is not valid")
+    if cursor_scope != scope or not isinstance(values, list) or len(values) != size:
+        raise PageError("cursor is not valid for this listing")
+    return values
+
+
+class Page:
+    """
+    One validated page request.
+
+    Attributes:
+        scope: Name of the listing the cursors belong to
+        key: Key column names the listing is ordered by
+        fields: Columns to return, or None for every column
+        limit: Rows per page, or None for every row
+        after: Key values of the previous page's last row, or None on the first page
+        hidden: Key columns computed by the query rather than read from the
+            table, never returned unless requested
+    """
+
+    __slots__ = ("scope", "key", "fields", "limit", "after", "hidden")
+
+    def __init__(self, scope, key, fields, limit, after, hidden=()):
+        self.scope = scope
+        self.key = key
+        self.fields = fields
+        self.limit = limit
+        self.after = after
+        self.hidden = tuple(hidden)
+
+    @property
+    def fetch(self):
+        """LIMIT value for the query: one row beyond the page to tell whether more follow (None for all)."""
+        return None if self.limit is None else self.limit + 1
+
+    def select(self, alias=None):
+        """
+        Builds the SELECT list of the table's columns; hidden key columns are left to the caller.
+
+        Args:
+            alias: Table alias to qualify the columns with
+
+        Returns:
+            str: Requested columns plus the key columns, or every column when no fields were requested
+        """
+        prefix = f"{alias}." if alias else ""
+        if self.fields is None:
+            return f"{prefix}*"
+        columns = list(self.fields)
+        columns += [name for name in self.key if name not in self.fields and name not in self.hidden]
+        return ", ".join(f"{prefix}{name}" for name in columns)
+
+    def after_sql(self, key_sql=None, descending=False, named=False):
+        """
+        Builds the keyset condition for rows after the cursor.
+
+        Args:
+            key_sql: SQL expressions of the key columns (defaults to their names)
+            descending: The listing is ordered by the key descending
+            named: Use %(after_N)s placeholders and return the params as a
+                dictionary, for queries with named parameters
+
+        Returns:
+            tuple: (condition, params), with condition "TRUE" on the first page
+        """
+        if self.after is None:
+            return "TRUE", {} if named else []
+        key_sql = key_sql or self.key
+        op = "<" if descending else ">"
+        if named:
+            placeholders = ", ".join(f"%(after_{i})s" for i in range(len(key_sql)))
+            params = {f"after_{i}": value for i, value in enumerate(self.after)}
+        else:
+            placeholders = ", ".join(["%s"] * len(key_sql))
+            params = list(self.after)
+        return f"({', '.join(key_sql)}) {op} ({placeholders})", params
+
+    def finish(self, rows):
+        """
+        Trims the look-ahead row, drops key columns that were not requested and builds the headers.
+
+        Args:
+            rows: Rows fetched with LIMIT self.fetch, as dictionaries
+
+        Returns:
+            tuple: (rows, headers) with X-Next-Cursor set while more rows follow
+        """
+        headers = {}
+        if self.limit is not None and len(rows) > self.limit:
+            rows = rows[: self.limit]
+            headers[NEXT_CURSOR_HEADER] = encode_cursor(self.scope, [rows[-1][name] for name in self.key])
+        if self.fields is None:
+            drop = self.hidden
+        else:
+            drop = [name for name in self.key if name not in self.fields]
+        if drop:
+            rows = [{name: value for name, value in row.items() if name not in drop} for row in rows]
+        return rows, headers
+
+
+def page_request(scope, key, columns, default_limit=None, hidden=()):
+    """
+    Reads `limit`, `cursor` and `fields` from the query string.
+
+    Args:
+        scope: Name of the listing, used to tag its cursors
+        key: Key column names the listing is ordered by (together unique)
+        columns: Columns `fields` may name
+        default_limit: Page size when no limit is given (None returns every
+            row unless a cursor is given)
+        hidden: Key columns the query computes rather than reads from the table
+
+    Returns:
+        Page: The validated page request
+
+    Raises:
+        PageError: On an invalid limit, cursor or fields parameter
+    """
+    key = tuple(key)
+    limit = request.args.get("limit")
+    cursor = request.args.get("cursor")
+    fields = request.args.get("fields")
+
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PageError("limit must be an integer")
+        if not 1 <= limit <= PAGE_SIZE_MAX:
+            raise PageError(f"limit must be between 1 and {PAGE_SIZE_MAX}")
+    elif cursor:
+        limit = default_limit or PAGE_SIZE_DEFAULT
+    else:
+        limit = default_limit
+
+    after = decode_cursor(scope, cursor, len(key)) if cursor else None
+
+    if fields is not None:
+        fields = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        unknown = [name for name in fields if name not in columns]
+        if unknown or not fields:
+            raise PageError(f"fields must be a comma-separated list of: {', '.join(columns)}")
+
+    return Page(scope, key, fields, limit, after, hidden)
@@ -0,0 +1,427 @@
+"""
+Loyalty Points Module
+
+This module owns every change to a customer's loyalty balance. Each order
+appends a row to points_ledger and adjusts users.current_points and
+users.total_points in the same statement, refusing any change that would take
+the current balance below zero. Balances read by GET /api/transactions/points
+are served from a small per-worker cache that order placement updates
+write-through after commit. Each cached balance carries the ID of the newest
+ledger row it includes, so a write that lands late with an older balance is
+ignored. Orders placed through other workers are not seen until the entry
+expires, so a cached balance is at most POINTS_CACHE_TTL seconds behind.
+
+reconcile_points() checks users against the ledger incrementally: it only
+reads ledger rows added since its last run (tracked in job_watermarks) and
+only compares the users those rows touched.
+
+Optional Settings:
+    - POINTS_CACHE_TTL: Seconds a cached balance is trusted, i.e. how far it may
+      lag orders placed through other workers (defaults to 5)
+    - POINTS_CACHE_SIZE: Maximum number of cached balances per worker (defaults to 10000)
+    - POINTS_RECONCILE_LAG: Seconds a ledger row must age before reconciliation
+      consumes it, so rows from transactions still in flight are not skipped (defaults to 60)
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+POINTS_CACHE_TTL = float(os.getenv("POINTS_CACHE_TTL", "5"))
+POINTS_CACHE_SIZE = int(os.getenv("POINTS_CACHE_SIZE", "10000"))
+POINTS_RECONCILE_LAG = int(os.getenv("POINTS_RECONCILE_LAG", "60"))
+
+RECONCILE_JOB = "points_reconcile"
+
+
+def points_earned(total_price):
+    """
+    Returns the loyalty points an order earns.
+
+    Args:
+        total_price: Total price of the order
+
+    Returns:
+        int: Ten points per whole dollar spent
+    """
+    return math.floor(total_price) * 10
+
+
+def apply_points(cur, user_id, transaction_id, earned, redeemed):
+    """
+    Records an order's points in the ledger and updates the balance in one statement.
+
+    Args:
+        cur: Cursor inside the transaction placing the order
+        user_id: ID of the customer, or None for guest orders
+        transaction_id: ID of the order's transaction
+        earned: Points earned by the order
+        redeemed: Points redeemed as a discount on the order
+
+    Returns:
+        tuple: (current_points, total_points, ledger_id) after the change,
+            where ledger_id is the new points_ledger row, or None if there is
+            no such customer
+
+    Raises:
+        psycopg2.DatabaseError: If the customer does not have enough points to redeem
+    """
+    if user_id is None:
+        return None
+
+    cur.execute(
+        """
+        WITH balance AS (
+            UPDATE users
+            SET total_points = COALESCE(total_points, 0) + %(earned)s,
+                current_points = COALESCE(current_points, 0) + %(earned)s - %(redeemed)s
+            WHERE id = %(user_id)s
+              AND COALESCE(current_points, 0) + %(earned)s - %(redeemed)s >= 0
+            RETURNING id, current_points, total_points
+        ),
+        ledger AS (
+            INSERT INTO points_ledger (user_id, transaction_id, points_earned, points_redeemed)
+            SELECT id, %(transaction_id)s, %(earned)s, %(redeemed)s FROM balance
+            RETURNING id
+        )
+        SELECT
+            (SELECT current_points FROM balance),
+            (SELECT total_points FROM balance),
+            (SELECT id FROM ledger),
+            EXISTS (SELECT 1 FROM users WHERE id = %(user_id)s)
+    """,
+        {
+            "user_id": user_id,
+            "transaction_id": transaction_id,
+            "earned": earned,
+            "redeemed": redeemed,
+        },
+    )
+    current_points, total_points, ledger_id, exists = cur.fetchone()
+    if current_points is None:
+        if exists:
+            raise psycopg2.DatabaseError(f"Insufficient points for user ID: {user_id}")
+        return None
+    return current_points, total_points, ledger_id
+
+
+def lock_balances(cur, user_ids):
+    """
+    Locks customer rows in ascending ID order and returns their current balances.
+
+    Args:
+        cur: Cursor inside an open transaction
+        user_ids: IDs of the customers a batch of orders touches
+
+    Returns:
+        dict: User ID to current_points for the customers that exist
+    """
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if not user_ids:
+        return {}
+    cur.execute(
+        """
+        SELECT id, COALESCE(current_points, 0) FROM users
+        WHERE id = ANY(%s)
+        ORDER BY id
+        FOR UPDATE
+    """,
+        (user_ids,),
+    )
+    return dict(cur.fetchall())
+
+
+def apply_points_batch(cur, entries):
+    """
+    Records many orders' points with one ledger insert and one balance UPDATE.
+
+    Callers are expected to have locked the rows with lock_balances() and
+    rejected any order that would overdraw a balance.
+
+    Args:
+        cur: Cursor inside an open transaction
+        entries: List of (user_id, transaction_id, earned, redeemed) for existing customers
+
+    Returns:
+        dict: User ID to (current_points, total_points, ledger_id) after the
+            change, where ledger_id is the user's newest new points_ledger row
+    """
+    if not entries:
+        return {}
+
+    ledger_ids = {}
+    for user_id, ledger_id in execute_values(
+        cur,
+        """
+        INSERT INTO points_ledger (user_id, transaction_id, points_earned, points_redeemed)
+        VALUES %s
+        RETURNING user_id, id
+    """,
+        entries,
+        page_size=1000,
+        fetch=True,
+    ):
+        ledger_ids[user_id] = max(ledger_id, ledger_ids.get(user_id, 0))
+
+    deltas = {}
+    for user_id, _, earned, redeemed in entries:
+        total, current = deltas.get(user_id, (0, 0))
+        deltas[user_id] = (total + earned, current + earned - redeemed)
+    user_ids = sorted(deltas)
+    cur.execute(
+        """
+        UPDATE users u
+        SET total_points = COALESCE(u.total_points, 0) + p.total_delta,
+            current_points = COALESCE(u.current_points, 0) + p.current_delta
+        FROM unnest(%s::int[], %s::int[], %s::int[]) AS p(id, total_delta, current_delta)
+        WHERE u.id = p.id
+        RETURNING u.id, u.current_points, u.total_points
+    """,
+        (
+            user_ids,
+            [deltas[user_id][0] for user_id in user_ids],
+            [deltas[user_id][1] for user_id in user_ids],
+        ),
+    )
+    return {user_id: (current, total, ledger_ids[user_id]) for user_id, current, total in cur.fetchall()}
+
+
+class BalanceCache:
+    """
+    Bounded, time-limited cache of customer balances for one worker process.
+
+    Order placement writes new balances through after commit; entries older
+    than `ttl` are reloaded so changes made by other workers show up within
+    `ttl` seconds. Every balance is stored with the ID of the newest ledger
+    row it includes; ledger rows of one customer are written under the lock
+    on their users row, so a higher ID always means a newer balance, and a
+    put() carrying an older one than the cached entry is ignored.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """
+        Returns a cached balance.
+
+        Args:
+            user_id: ID of the customer
+
+        Returns:
+            tuple: (current_points, total_points), or None if not cached or expired
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or time.monotonic() - entry[3] >= self.ttl:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, user_id, current_points, total_points, ledger_id):
+        """
+        Stores a balance that is known to be committed, unless a newer one is cached.
+
+        Args:
+            user_id: ID of the customer
+            current_points: Committed current balance
+            total_points: Committed lifetime total
+            ledger_id: ID of the newest points_ledger row the balance includes,
+                or 0 if the customer has none
+        """
+        ledger_id = ledger_id or 0
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[2] > ledger_id:
+                return
+            self._entries[user_id] = (current_points, total_points, ledger_id, time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def update(self, balances):
+        """
+        Stores several committed balances.
+
+        Args:
+            balances: Dictionary of user ID to (current_points, total_points, ledger_id)
+        """
+        for user_id, balance in balances.items():
+            self.put(user_id, *balance)
+
+
+balance_cache = BalanceCache(POINTS_CACHE_TTL, POINTS_CACHE_SIZE)
+
+
+def reconcile_points(conn):
+    """
+    Checks user balances against the ledger rows added since the last run.
+
+    Ledger rows after the stored watermark and below the first row younger
+    than POINTS_RECONCILE_LAG are summed per user (an index range scan on
+    points_ledger's primary key) and added to that user's checkpoint in
+    points_checkpoints. A lower ID can belong to a younger row, since
+    created_at is when its transaction started, so stopping at the first
+    young row keeps such rows above the watermark for the next run. Only the users
+    touched by those rows are then compared with the users table, allowing
+    for their newer ledger rows that are not consumed yet. A user seen for
+    the first time gets an opening checkpoint equal to their balance minus
+    their unreconciled ledger rows, so history from before the ledger
+    existed is taken as given.
+
+    Runs in one REPEATABLE READ transaction, so the ledger and the balances
+    are read from the same snapshot.
+
+    Args:
+        conn: Database connection not currently in a transaction
+
+    Returns:
+        dict: Ledger rows processed, users checked, the new watermark and a
+            list of mismatches as {user_id, expected_current, expected_total,
+            current_points, total_points}
+    """
+    conn.set_session(isolation_level="REPEATABLE READ")
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT position FROM job_watermarks WHERE name = %s FOR UPDATE",
+                (RECONCILE_JOB,),
+            )
+            row = cur.fetchone()
+            watermark = row[0] if row else 0
+
+            # created_at is the transaction start, so IDs and ages do not line up:
+            # consume only the rows below the first one still younger than the lag
+            cur.execute(
+                """
+                WITH bound AS (
+                    SELECT MIN(id) AS before
+                    FROM points_ledger
+                    WHERE id > %(watermark)s
+                      AND created_at >= NOW() - %(lag)s * INTERVAL '1 second'
+                )
+                SELECT user_id,
+                       SUM(points_earned) AS earned,
+                       SUM(points_redeemed) AS redeemed,
+                       COUNT(*) AS entries,
+                       MAX(id) AS last_id
+                FROM points_ledger, bound
+                WHERE id > %(watermark)s
+                  AND (bound.before IS NULL OR id < bound.before)
+                GROUP BY user_id
+            """,
+                {"watermark": watermark, "lag": POINTS_RECONCILE_LAG},
+            )
+            deltas = cur.fetchall()
+            if not deltas:
+                conn.commit()
+                return {"processed": 0, "checked": 0, "watermark": watermark, "mismatches": []}
+
+            user_ids = [row[0] for row in deltas]
+            new_watermark = max(row[4] for row in deltas)
+
+            # newer rows for the same users are already reflected in their balances
+            cur.execute(
+                """
+                SELECT user_id, SUM(points_earned), SUM(points_redeemed)
+                FROM points_ledger
+                WHERE user_id = ANY(%s) AND id > %s
+                GROUP BY user_id
+            """,
+                (user_ids, new_watermark),
+            )
+            pending = {user_id: (earned, redeemed) for user_id, earned, redeemed in cur.fetchall()}
+
+            params = (
+                user_ids,
+                [row[1] for row in deltas],
+                [row[2] for row in deltas],
+                [pending.get(user_id, (0, 0))[0] for user_id in user_ids],
+                [pending.get(user_id, (0, 0))[1] for user_id in user_ids],
+            )
+
+            cur.execute(
+                """
+                INSERT INTO points_checkpoints (user_id, current_points, total_points)
+                SELECT d.user_id,
+                       COALESCE(u.current_points, 0)
+                           - (d.earned - d.redeemed) - (d.pending_earned - d.pending_redeemed),
+                       COALESCE(u.total_points, 0) - d.earned - d.pending_earned
+                FROM unnest(%s::int[], %s::bigint[], %s::bigint[], %s::bigint[], %s::bigint[])
+                    AS d(user_id, earned, redeemed, pending_earned, pending_redeemed)
+                JOIN users u ON u.id = d.user_id
+                ON CONFLICT (user_id) DO NOTHING
+            """,
+                params,
+            )
+            cur.execute(
+                """
+                WITH delta AS (
+                    SELECT * FROM unnest(%s::int[], %s::bigint[], %s::bigint[], %s::bigint[], %s::bigint[])
+                        AS d(user_id, earned, redeemed, pending_earned, pending_redeemed)
+                ),
+                advanced AS (
+                    UPDATE points_checkpoints c
+                    SET current_points = c.current_points + d.earned - d.redeemed,
+                        total_points = c.total_points + d.earned
+                    FROM delta d
+                    WHERE c.user_id = d.user_id
+                    RETURNING c.user_id, c.current_points, c.total_points
+                )
+                SELECT a.user_id,
+                       a.current_points + d.pending_earned - d.pending_redeemed,
+                       a.total_points + d.pending_earned,
+                       u.current_points, u.total_points
+                FROM advanced a
+                JOIN delta d ON d.user_id = a.user_id
+                JOIN users u ON u.id = a.user_id
+                WHERE a.current_points + d.pending_earned - d.pending_redeemed
+                          IS DISTINCT FROM COALESCE(u.current_points, 0)
+                   OR a.total_points + d.pending_earned
+                          IS DISTINCT FROM COALESCE(u.total_points, 0)
+            """,
+                params,
+            )
+            mismatches = [
+                {
+                    "user_id": user_id,
+                    "expected_current": expected_current,
+                    "expected_total": expected_total,
+                    "current_points": current_points,
+                    "total_points": total_points,
+                }
+                for user_id, expected_current, expected_total, current_points, total_points in cur.fetchall()
+            ]
+
+            cur.execute(
+                """
+                INSERT INTO job_watermarks (name, position) VALUES (%s, %s)
+                ON CONFLICT (name) DO UPDATE SET position = EXCLUDED.position
+            """,
+                (RECONCILE_JOB, new_watermark),
+            )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.set_session(isolation_level="DEFAULT")
+
+    return {
+        "processed": sum(row[3] for row in deltas),
+        "checked": len(user_ids),
+        "watermark": new_watermark,
+        "mismatches": mismatches,
+    }
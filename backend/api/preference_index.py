@@ -0,0 +1,192 @@
+"""
+Preference Index Module
+
+This module answers the preference quiz (GET /api/menuitems/preference) from
+memory instead of sending a scan with ILIKE, IN and NOT IN to Postgres for
+every answer a customer changes.
+
+Each worker keeps a PreferenceIndex over the active menu items of its catalog
+snapshot (see catalog.py). Items are numbered in menu_item_id order and every
+attribute is a bitset over those numbers, held in a Python int:
+
+    - one bitset per flavor
+    - one bitset per allergen, of the items containing it
+    - one bitset per protein tag, of the items whose name mentions it
+      (case-insensitively, like the ILIKE filter it replaces)
+    - the items sorted by calories, with a cumulative bitset every
+      _CALORIE_BLOCK items, so a calorie range becomes two binary searches
+      and at most 2 * _CALORIE_BLOCK single-bit ORs
+
+A query is then a handful of ANDs, ORs and NOTs on those ints. The index is
+rebuilt from the next catalog snapshot after a menu change, so it follows
+create, update and delete like the rest of the catalog.
+
+Optional Settings:
+    - PREFERENCE_INDEX: Set to "false" to answer the quiz with SQL (defaults to "true")
+    - PREFERENCE_PROTEINS: Comma-separated protein tags to index (defaults to
+      "chicken,beef,pork,shrimp,fish,tofu")
+"""
+
+import os
+import threading
+from bisect import bisect_left, bisect_right
+
+PREFERENCE_INDEX = os.getenv("PREFERENCE_INDEX", "true").lower() == "true"
+PREFERENCE_PROTEINS = tuple(
+    tag.strip().lower()
+    for tag in os.getenv("PREFERENCE_PROTEINS", "chicken,beef,pork,shrimp,fish,tofu").split(",")
+    if tag.strip()
+)
+
+# items between cumulative calorie bitsets
+_CALORIE_BLOCK = 64
+
+
+class PreferenceIndex:
+    """
+    Bitset index over the active menu items of one catalog snapshot.
+
+    Attributes:
+        version: Catalog snapshot version the index was built from
+        entries: Indexed MenuItemEntry objects, in menu_item_id order
+        ids: menu_item_id of each entry, ascending
+        everything: Bitset with every entry set
+        flavors: Dictionary of flavor to bitset
+        allergens: Dictionary of allergen ID to bitset
+        proteins: Dictionary of protein tag to bitset
+    """
+
+    __slots__ = (
+        "version",
+        "entries",
+        "ids",
+        "everything",
+        "flavors",
+        "allergens",
+        "proteins",
+        "_calories",
+        "_calorie_order",
+        "_calorie_prefix",
+    )
+
+    def __init__(self, version, entries, proteins=PREFERENCE_PROTEINS):
+        self.version = version
+        self.entries = sorted(entries, key=lambda entry: entry.menu_item_id)
+        self.ids = [entry.menu_item_id for entry in self.entries]
+        self.everything = (1 << len(self.entries)) - 1
+        self.flavors = {}
+        self.allergens = {}
+        self.proteins = dict.fromkeys(proteins, 0)
+
+        for position, entry in enumerate(self.entries):
+            bit = 1 << position
+            self.flavors[entry.flavor] = self.flavors.get(entry.flavor, 0) | bit
+            for allergen_id, _ in entry.allergens:
+                self.allergens[allergen_id] = self.allergens.get(allergen_id, 0) | bit
+            name = (entry.menu_item_name or "").lower()
+            for tag in self.proteins:
+                if tag in name:
+                    self.proteins[tag] |= bit
+
+        # items without calories never match a range, like BETWEEN on NULL
+        order = sorted(
+            (entry.calories, position) for position, entry in enumerate(self.entries) if entry.calories is not None
+        )
+        self._calories = [calories for calories, _ in order]
+        self._calorie_order = [position for _, position in order]
+        self._calorie_prefix = [0]
+        for start in range(0, len(order), _CALORIE_BLOCK):
+            mask = self._calorie_prefix[-1]
+            for position in self._calorie_order[start:start + _CALORIE_BLOCK]:
+                mask |= 1 << position
+            self._calorie_prefix.append(mask)
+
+    def _lowest(self, count):
+        """Bitset of the `count` items with the fewest calories."""
+        block, rest = divmod(count, _CALORIE_BLOCK)
+        mask = self._calorie_prefix[block]
+        start = block * _CALORIE_BLOCK
+        for position in self._calorie_order[start:start + rest]:
+            mask |= 1 << position
+        return mask
+
+    def calorie_range(self, low, high):
+        """Returns the bitset of items with low <= calories <= high."""
+        if low > high:
+            return 0
+        return self._lowest(bisect_right(self._calories, high)) & ~self._lowest(bisect_left(self._calories, low))
+
+    def match(self, flavors, allergens=(), calorie_min=0, calorie_max=1000, with_proteins=(), without_proteins=()):
+        """
+        Finds the items matching a set of preferences.
+
+        Args:
+            flavors: Flavors to accept (an item must have one of them)
+            allergens: Allergen IDs to avoid
+            calorie_min: Fewest calories, inclusive
+            calorie_max: Most calories, inclusive
+            with_proteins: Protein tags every item must mention
+            without_proteins: Protein tags no item may mention
+
+        Returns:
+            int: Bitset of matching items
+        """
+        mask = 0
+        for flavor in flavors:
+            mask |= self.flavors.get(flavor, 0)
+        for allergen_id in allergens:
+            mask &= ~self.allergens.get(allergen_id, 0)
+        for tag in with_proteins:
+            mask &= self.proteins.get(tag, 0)
+        for tag in without_proteins:
+            mask &= ~self.proteins.get(tag, 0)
+        return mask & self.calorie_range(calorie_min, calorie_max)
+
+    def entries_of(self, mask, after=None, limit=None):
+        """
+        Lists the entries of a bitset in menu_item_id order.
+
+        Args:
+            mask: Bitset from match()
+            after: Only entries with a greater menu_item_id
+            limit: Most entries to return (None for all)
+
+        Returns:
+            list: MenuItemEntry objects
+        """
+        if after is not None:
+            mask &= ~((1 << bisect_right(self.ids, after)) - 1)
+        found = []
+        while mask and (limit is None or len(found) < limit):
+            low = mask & -mask
+            found.append(self.entries[low.bit_length() - 1])
+            mask ^= low
+        return found
+
+
+_lock = threading.Lock()
+_index = None
+
+
+def preference_index(snapshot):
+    """
+    Returns the index for a catalog snapshot, building it once per snapshot.
+
+    Args:
+        snapshot: CatalogSnapshot from get_catalog()
+
+    Returns:
+        PreferenceIndex: Index over the snapshot's active menu items
+    """
+    global _index
+
+    index = _index
+    if index is not None and index.version == snapshot.version:
+        return index
+    with _lock:
+        index = _index
+        if index is None or index.version != snapshot.version:
+            index = PreferenceIndex(snapshot.version, [entry for entry in snapshot.by_id.values() if entry.active is True])
+            if _index is None or _index.version < snapshot.version:
+                _index = index
+    return index
@@ -0,0 +1,226 @@
+"""
+Recommendations Module
+
+This module keeps the data behind GET /api/menuitems/recommendations
+precomputed, so a recommendation costs the same however long the customer's
+order history is:
+
+    - customer_item_counts: units of each menu item each customer has bought,
+      indexed so a customer's top items are the first rows of one index
+    - menu_item_pairs: for every two menu items, how many orders contained
+      both ("bought together"); the row pairing an item with itself counts
+      the orders containing it at all, i.e. its popularity
+
+refresh_recommendations() folds new orders into both tables. It works
+through transactions.transaction_id after a watermark stored in
+job_watermarks, in short batches, and is meant to run every few minutes
+(`flask refresh-recommendations`, e.g. from cron). Orders younger than
+RECOMMENDATIONS_LAG seconds are left for the next run, and so is everything
+after them, so an order whose transaction commits late is not skipped.
+
+recommend() ranks, in this order:
+
+    1. items the customer bought, most units first
+    2. items often bought together with the customer's top
+       RECOMMENDATION_SEEDS items that they never bought, most shared orders first
+    3. every other item, most orders first
+
+so a new customer gets the most popular items and a regular gets their usual
+order followed by what tends to go with it.
+
+Optional Settings:
+    - RECOMMENDATIONS_LAG: Seconds an order must be old before it is folded in (defaults to 60)
+    - RECOMMENDATION_SEEDS: Customer's top items whose companions are suggested (defaults to 5)
+"""
+
+import os
+import time
+
+RECOMMENDATIONS_LAG = int(os.getenv("RECOMMENDATIONS_LAG", "60"))
+RECOMMENDATION_SEEDS = int(os.getenv("RECOMMENDATION_SEEDS", "5"))
+
+RECOMMENDATIONS_MARK = "recommendations_since"
+
+# whether this worker has seen the tables populated; never goes back to False
+_ready = False
+
+
+def _fold_batch(cur, after, before, cutoff, batch_size):
+    """Adds the next batch of orders to both tables and returns (last transaction ID, orders)."""
+    cur.execute(
+        """
+        WITH batch AS (
+            SELECT transaction_id, customer_id
+            FROM transactions
+            WHERE transaction_id > %(after)s
+              AND (%(before)s::bigint IS NULL OR transaction_id < %(before)s)
+              AND order_timestamp < %(cutoff)s
+            ORDER BY transaction_id
+            LIMIT %(batch_size)s
+        ), lines AS (
+            SELECT b.transaction_id, b.customer_id, td.menu_item_id, SUM(td.item_quantity_sold) AS quantity
+            FROM batch b
+            JOIN transaction_details td ON td.transaction_id = b.transaction_id
+            GROUP BY b.transaction_id, b.customer_id, td.menu_item_id
+        ), customers AS (
+            INSERT INTO customer_item_counts (customer_id, menu_item_id, quantity)
+            SELECT customer_id, menu_item_id, SUM(quantity)
+            FROM lines
+            WHERE customer_id IS NOT NULL
+            GROUP BY customer_id, menu_item_id
+            ORDER BY customer_id, menu_item_id
+            ON CONFLICT (customer_id, menu_item_id)
+            DO UPDATE SET quantity = customer_item_counts.quantity + EXCLUDED.quantity
+        ), pairs AS (
+            INSERT INTO menu_item_pairs (menu_item_id, other_item_id, orders)
+            SELECT a.menu_item_id, b.menu_item_id, COUNT(*)
+            FROM lines a
+            JOIN lines b ON a.transaction_id = b.transaction_id
+            GROUP BY a.menu_item_id, b.menu_item_id
+            ORDER BY a.menu_item_id, b.menu_item_id
+            ON CONFLICT (menu_item_id, other_item_id)
+            DO UPDATE SET orders = menu_item_pairs.orders + EXCLUDED.orders
+        )
+        SELECT MAX(transaction_id), COUNT(*) FROM batch
+    """,
+        {"after": after, "before": before, "cutoff": cutoff, "batch_size": batch_size},
+    )
+    return cur.fetchone()
+
+
+def refresh_recommendations(conn, batch_size=2000, pause=0.0, rebuild=False):
+    """
+    Folds orders placed since the last run into the recommendation tables.
+
+    Each batch runs in its own short transaction that also advances the
+    watermark, so an interrupted run resumes where it stopped and two runs
+    never fold the same orders.
+
+    Args:
+        conn: Database connection not currently in a transaction
+        batch_size: Orders folded in per batch
+        pause: Seconds to sleep between batches to limit the load
+        rebuild: Empty both tables and fold in every order again
+
+    Returns:
+        dict: Orders folded in, batches run and the new watermark
+    """
+    if rebuild:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE customer_item_counts, menu_item_pairs")
+            cur.execute("DELETE FROM job_watermarks WHERE name = %s", (RECOMMENDATIONS_MARK,))
+        conn.commit()
+
+    with conn.cursor() as cur:
+        # orders older than the cutoff and below the first younger one have had time to commit
+        cur.execute(
+            """
+            WITH cutoff AS (SELECT LOCALTIMESTAMP - %s * INTERVAL '1 second' AS at)
+            SELECT cutoff.at, (SELECT MIN(transaction_id) FROM transactions WHERE order_timestamp >= cutoff.at)
+            FROM cutoff
+        """,
+            (RECOMMENDATIONS_LAG,),
+        )
+        cutoff, before = cur.fetchone()
+    conn.commit()
+
+    folded = batches = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO job_watermarks (name, position) VALUES (%s, 0)
+                ON CONFLICT (name) DO UPDATE SET position = job_watermarks.position
+                RETURNING position
+            """,
+                (RECOMMENDATIONS_MARK,),
+            )
+            watermark = cur.fetchone()[0]
+            last, orders = _fold_batch(cur, watermark, before, cutoff, batch_size)
+            if orders:
+                cur.execute(
+                    "UPDATE job_watermarks SET position = %s WHERE name = %s",
+                    (last, RECOMMENDATIONS_MARK),
+                )
+                watermark = last
+        conn.commit()
+        if not orders:
+            break
+        folded += orders
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return {"orders": folded, "batches": batches, "watermark": watermark}
+
+
+def recommendations_ready(cur):
+    """
+    Returns whether refresh_recommendations() has run at least once.
+
+    Args:
+        cur: Database cursor
+    """
+    global _ready
+
+    if not _ready:
+        cur.execute("SELECT 1 FROM job_watermarks WHERE name = %s", (RECOMMENDATIONS_MARK,))
+        _ready = cur.fetchone() is not None
+    return _ready
+
+
+def recommend(cur, customer_id, page):
+    """
+    Ranks active menu items for a customer from the precomputed tables.
+
+    Reads only the customer's own rows of customer_item_counts, the pair rows
+    of their top items and one popularity row per menu item, so the cost is
+    bounded by the menu size rather than by the customer's history.
+
+    Args:
+        cur: RealDictCursor
+        customer_id: Customer to recommend for
+        page: Page keyed by ("tier", "score", "menu_item_id"), with tier and score hidden
+
+    Returns:
+        list: Menu item rows with tier and score, at most page.fetch of them
+    """
+    after, after_params = page.after_sql(("r.tier", "r.score", "m.menu_item_id"), descending=True, named=True)
+    cur.execute(
+        f"""
+        WITH personal AS (
+            SELECT menu_item_id, quantity
+            FROM customer_item_counts
+            WHERE customer_id = %(customer_id)s
+        ), seeds AS (
+            SELECT menu_item_id FROM personal
+            ORDER BY quantity DESC, menu_item_id DESC
+            LIMIT %(seeds)s
+        ), related AS (
+            SELECT p.other_item_id AS menu_item_id, SUM(p.orders)::bigint AS score
+            FROM menu_item_pairs p
+            WHERE p.menu_item_id IN (SELECT menu_item_id FROM seeds)
+              AND p.other_item_id NOT IN (SELECT menu_item_id FROM personal)
+            GROUP BY p.other_item_id
+        ), popular AS (
+            SELECT p.menu_item_id, p.orders AS score
+            FROM menu_item_pairs p
+            WHERE p.menu_item_id = p.other_item_id
+              AND p.menu_item_id NOT IN (SELECT menu_item_id FROM personal)
+              AND p.menu_item_id NOT IN (SELECT menu_item_id FROM related)
+        ), ranked AS (
+            SELECT menu_item_id, 2 AS tier, quantity AS score FROM personal
+            UNION ALL
+            SELECT menu_item_id, 1, score FROM related
+            UNION ALL
+            SELECT menu_item_id, 0, score FROM popular
+        )
+        SELECT {page.select("m")}, r.tier, r.score
+        FROM ranked r
+        JOIN menu_items m ON m.menu_item_id = r.menu_item_id
+        WHERE m.active = 't' AND {after}
+        ORDER BY r.tier DESC, r.score DESC, m.menu_item_id DESC
+        LIMIT %(limit)s;
+    """,
+        dict(after_params, customer_id=customer_id, seeds=RECOMMENDATION_SEEDS, limit=page.fetch),
+    )
+    return cur.fetchall()
@@ -0,0 +1,315 @@
+"""
+Report Cache Module
+
+This module caches serialized report responses per worker process, keyed by
+endpoint and normalized query parameters, in an LRU bounded by the total size
+of the cached response bodies.
+
+Entries never expire by age. Every lookup instead runs one small probe query
+that asks whether an order has landed inside the entry's time range since it
+was computed, and whether the menu version has moved (ingredient usage, and
+sales recorded before line totals were stored, follow the current menu, see
+catalog.bump_menu_version). A closed historical range is therefore served
+from cache until a back-dated order lands in it, and a range that reaches
+today is recomputed only once an order lands inside it. The probe sees orders
+committed by every worker, so no cross-process invalidation is needed.
+
+An order lands by committing, so the probe only looks at what changes at
+commit (see rollups.py): every order sits in sales_rollup_queue from the
+commit that placed it until a fold moves it into the rollups, and every fold
+stamps the hours it touched with the next rollup version. An entry records the
+rollup version it was computed at and is only stored if no order was queued
+in its range at that point. It stays current while its range has no queued
+order and no hour stamped with a newer version, however late an order's
+transaction commits relative to the ID it drew.
+
+Optional Settings:
+    - REPORT_CACHE: Set to "false" to disable the cache (defaults to true)
+    - REPORT_CACHE_MAX_BYTES: Total size of cached response bodies per worker
+      (defaults to 33554432, i.e. 32 MiB)
+"""
+
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from .catalog import MENU_VERSION_MARK
+from .rollups import ROLLUP_VERSION_MARK, parse_bound
+
+REPORT_CACHE = os.getenv("REPORT_CACHE", "true").lower() == "true"
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# orders in a report range that are committed but not folded into the rollups yet
+_QUEUED = """EXISTS (
+    SELECT 1 FROM sales_rollup_queue q
+    JOIN transactions t ON t.transaction_id = q.transaction_id
+    WHERE t.order_timestamp >= %(start)s AND t.order_timestamp {end_operator} %(end)s
+)"""
+
+ReportRange = namedtuple(
+    "ReportRange",
+    [
+        "start",  # first timestamp the report reads
+        "end",  # last timestamp the report reads
+        "end_inclusive",  # whether rows stamped exactly at `end` are read
+        "live",  # `end` is the current time, so rows it catches up with count too
+        "day",  # database date the range was derived from, or None for fixed ranges
+    ],
+)
+
+
+def fixed_range(start, end):
+    """
+    Describes a report over an explicit [start, end] range.
+
+    Args:
+        start: Range start as parsed by rollups.parse_bound(), or the raw value
+        end: Range end as parsed by rollups.parse_bound(), or the raw value
+
+    Returns:
+        callable: Range callback for ReportCache.probe(), or None if either
+            bound could not be parsed and the report should not be cached
+    """
+    if not isinstance(start, datetime) or not isinstance(end, datetime):
+        return None
+    return lambda today, tomorrow, now: ReportRange(start, end, True, False, None)
+
+
+class _Entry:
+    """One cached response body and what it was computed from."""
+
+    __slots__ = ("endpoint", "body", "headers", "range", "menu_version", "rollup_version")
+
+    def __init__(self, endpoint, body, headers, report_range, menu_version, rollup_version):
+        self.endpoint = endpoint
+        self.body = body
+        self.headers = headers
+        self.range = report_range
+        self.menu_version = menu_version
+        self.rollup_version = rollup_version
+
+
+class Ticket:
+    """
+    Result of a cache probe; pass it back to ReportCache.store() after a miss.
+
+    Attributes:
+        body: Cached response body, or None on a miss
+        headers: Extra response headers stored with the body
+        cacheable: Whether a body computed after this probe may be stored
+    """
+
+    __slots__ = ("key", "endpoint", "range", "menu_version", "rollup_version", "body", "headers", "cacheable")
+
+    def __init__(self, key, endpoint, report_range, menu_version, rollup_version, body):
+        self.key = key
+        self.endpoint = endpoint
+        self.range = report_range
+        self.menu_version = menu_version
+        self.rollup_version = rollup_version
+        self.body = body
+        self.headers = {}
+        self.cacheable = False
+
+
+class ReportCache:
+    """
+    Size-bounded LRU of serialized report responses for one worker process.
+
+    Args:
+        max_bytes: Upper bound on the total size of cached bodies
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._counters = {}
+
+    @staticmethod
+    def make_key(endpoint, args):
+        """
+        Builds a cache key from the endpoint and its query parameters.
+
+        Date parameters are normalized, so "2024-11-01" and
+        "2024-11-01T00:00:00" share an entry; `verify` is ignored.
+
+        Args:
+            endpoint: Flask endpoint name
+            args: Request query parameters (MultiDict)
+
+        Returns:
+            tuple: Hashable key
+        """
+        params = []
+        for name, value in sorted(args.items(multi=True)):
+            if name == "verify":
+                continue
+            if name.endswith("_date"):
+                parsed = parse_bound(value)
+                value = parsed.isoformat() if parsed is not None else value
+            params.append((name, value))
+        return endpoint, tuple(params)
+
+    def probe(self, cur, endpoint, args, range_of):
+        """
+        Looks up a report and checks in one query whether its entry is still current.
+
+        On a miss a second small query checks whether the range has orders
+        waiting to be folded; if so the computed body is not stored, since
+        folding them would invalidate it straight away.
+
+        Args:
+            cur: Dictionary cursor on the request's connection
+            endpoint: Flask endpoint name
+            args: Request query parameters
+            range_of: Callable (today, tomorrow, now) returning the ReportRange
+                the report reads, evaluated against the database clock
+
+        Returns:
+            Ticket: With `body` set on a hit
+        """
+        key = self.make_key(endpoint, args)
+        with self._lock:
+            entry = self._entries.get(key)
+            rollup_version = entry.rollup_version if entry is not None else None
+            cached_range = entry.range if entry is not None else None
+
+        end_operator = "<=" if cached_range is None or cached_range.end_inclusive else "<"
+        cur.execute(
+            f"""
+            SELECT CURRENT_DATE::timestamp AS today,
+                   CURRENT_DATE::timestamp + INTERVAL '1 day' AS tomorrow,
+                   LOCALTIMESTAMP AS now,
+                   (SELECT position FROM job_watermarks WHERE name = %(menu_mark)s) AS menu_version,
+                   (SELECT position FROM job_watermarks WHERE name = %(rollup_mark)s) AS rollup_version,
+                   %(cached)s AND (
+                       {_QUEUED.format(end_operator=end_operator)}
+                       OR EXISTS (
+                           SELECT 1 FROM sales_rollup_changes
+                           WHERE version > %(rollup_version)s
+                             AND hour >= DATE_TRUNC('hour', %(start)s::timestamp)
+                             AND hour <= %(end)s
+                       )
+                   ) AS landed,
+                   %(live)s AND EXISTS (
+                       SELECT 1 FROM transactions
+                       WHERE order_timestamp > %(end)s AND order_timestamp <= LOCALTIMESTAMP
+                   ) AS caught_up
+        """,
+            {
+                "menu_mark": MENU_VERSION_MARK,
+                "rollup_mark": ROLLUP_VERSION_MARK,
+                "cached": entry is not None,
+                "rollup_version": rollup_version,
+                "start": cached_range.start if cached_range else None,
+                "end": cached_range.end if cached_range else None,
+                "live": bool(cached_range and cached_range.live),
+            },
+        )
+        row = cur.fetchone()
+        menu_version = row["menu_version"] or 0
+        report_range = range_of(row["today"], row["tomorrow"], row["now"])
+        ticket = Ticket(key, endpoint, report_range, menu_version, row["rollup_version"] or 0, None)
+
+        with self._lock:
+            counters = self._counter(endpoint)
+            hit = (
+                entry is not None
+                and self._entries.get(key) is entry
+                and not row["landed"]
+                and not row["caught_up"]
+                and entry.menu_version == menu_version
+                and entry.range.day == report_range.day
+            )
+            if hit:
+                self._entries.move_to_end(key)
+                counters["hits"] += 1
+                ticket.body = entry.body
+                ticket.headers = entry.headers
+                return ticket
+            if entry is not None and self._entries.get(key) is entry:
+                self._remove(key)
+                counters["invalidations"] += 1
+            counters["misses"] += 1
+
+        end_operator = "<=" if report_range.end_inclusive else "<"
+        cur.execute(
+            f"SELECT {_QUEUED.format(end_operator=end_operator)} AS queued",
+            {"start": report_range.start, "end": report_range.end},
+        )
+        ticket.cacheable = not cur.fetchone()["queued"]
+        return ticket
+
+    def store(self, ticket, body, headers=None):
+        """
+        Caches a freshly computed response body.
+
+        Args:
+            ticket: Ticket returned by the probe that missed
+            body: Serialized response body (bytes)
+            headers: Extra response headers to replay on hits
+        """
+        size = len(body)
+        if not ticket.cacheable or size > self.max_bytes:
+            return
+        entry = _Entry(
+            ticket.endpoint,
+            body,
+            dict(headers or {}),
+            ticket.range,
+            ticket.menu_version,
+            ticket.rollup_version,
+        )
+        with self._lock:
+            if ticket.key in self._entries:
+                self._remove(ticket.key)
+            self._entries[ticket.key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                self._counter(evicted.endpoint)["evictions"] += 1
+
+    def clear(self):
+        """Drops every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Reports cache size and per-endpoint counters for monitoring.
+
+        Returns:
+            dict: Settings, entry count, cached bytes and per-endpoint hits,
+                misses, invalidations and evictions
+        """
+        with self._lock:
+            return {
+                "enabled": REPORT_CACHE,
+                "max_bytes": self.max_bytes,
+                "bytes": self._bytes,
+                "entries": len(self._entries),
+                "endpoints": {endpoint: dict(counters) for endpoint, counters in self._counters.items()},
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+
+    def _counter(self, endpoint):
+        counters = self._counters.get(endpoint)
+        if counters is None:
+            counters = self._counters[endpoint] = {
+                "hits": 0,
+                "misses": 0,
+                "invalidations": 0,
+                "evictions": 0,
+            }
+        return counters
+
+
+report_cache = ReportCache(REPORT_CACHE_MAX_BYTES)
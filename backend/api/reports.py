@@ -6,19 +6,282 @@ It handles product usage tracking, sales analysis, and performance metrics.
 
 Endpoints:
     - GET /api/reports/productUsage : Get ingredient usage statistics
+    - GET /api/reports/productUsageSeries : Get ingredient usage per hour, day, week or month
     - GET /api/reports/salesByHour : Get hourly sales breakdown
     - GET /api/reports/salesByEmployee : Get employee sales performance
     - GET /api/reports/salesReport : Get detailed sales report
     - GET /api/reports/popularityAnalysis : Get menu item popularity metrics
+    - GET /api/reports/dashboard : Get the manager dashboard reports in one call
+    - GET /api/reports/live : Stream today's sales by hour and employee as Server-Sent Events
+    - GET /api/reports/export/productUsage : Stream ingredient usage as CSV or NDJSON
+    - GET /api/reports/export/salesReport : Stream the sales report as CSV or NDJSON
+    - GET /api/reports/export/transactions : Stream line-level transaction detail as CSV or NDJSON
+
+Whole hours inside a requested range are read from the hourly rollup tables
+(see rollups.py) and only the partial hours at the edges from raw
+transactions. Every endpoint accepts `verify=true`, which also runs the
+raw-join query and returns {"rollup": ..., "raw": ..., "match": bool}.
+
+Revenue is summed from the line totals recorded when each order was placed
+(see rollups.py), so menu price changes do not re-price past sales.
+
+Ingredient usage is computed by the NumPy usage engine when it is available
+(see usage_engine.py) and by the SQL join otherwise.
+
+Responses are cached per worker by endpoint and range (see report_cache.py)
+and recomputed only once an order lands in the range or the menu changes.
+Verified requests always bypass the cache.
+
+Report requests are admitted through a bounded per-worker limiter and run
+under the reports statement_timeout budget; a query whose client disconnects
+is cancelled on the server (see admission.py). The live stream is exempt from
+the limiter, and a dashboard takes as many slots as it has threads.
+
+Optional Settings:
+    - DASHBOARD_WORKERS: Threads per worker process computing dashboard
+      sub-reports concurrently, each on its own pooled connection (defaults to 4)
 """
 
-from flask import Flask, request, jsonify, Blueprint
+import contextvars
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from flask import Flask, request, jsonify, Blueprint, Response, current_app
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from .admission import cancel_on_disconnect, install_report_admission
 from .database import get_db_connection
+from .export import FORMATS, export_response
+from .live_sales import LIVE_SALES_HEARTBEAT, LiveSalesHub, format_event
+from .pagination import PageError, page_request
+from .report_cache import REPORT_CACHE, ReportRange, fixed_range, report_cache
+from .rollups import parse_bound, rollup_coverage, sales_facts
+from .usage_engine import (
+    BUCKETS,
+    USAGE_SERIES_MAX_BUCKETS,
+    bucket_starts,
+    product_usage,
+    usage_engine_enabled,
+    usage_series,
+)
 
 reports_bp = Blueprint("reports", __name__, url_prefix="/api/reports")
 
+DASHBOARD_WORKERS = int(os.getenv("DASHBOARD_WORKERS", "4"))
+
+# columns `fields` may select from salesReport
+SALES_REPORT_COLUMNS = ("menu_item_name", "quantity_sold", "total_sales")
+
+# comparison periods the dashboard can return next to the requested day
+COMPARISONS = {
+    "yesterday": timedelta(days=1),
+    "last_week": timedelta(days=7),
+    "last_month": timedelta(days=28),
+    "last_year": timedelta(days=364),
+}
+
+# threads start lazily on first use, i.e. after gunicorn has forked
+_dashboard_pool = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix="dashboard")
+
+install_report_admission(
+    reports_bp,
+    exempt={"reports.stream_live_sales"},
+    weights={"reports.get_dashboard": DASHBOARD_WORKERS},
+)
+
+
+def _run_report(compute, range_of=None, headers=None):
+    """
+    Runs a report from the cache or the rollups, optionally checking it against the raw query.
+
+    Args:
+        compute: Callable (cur, coverage, use_rollups) returning the report data
+        range_of: Callable (today, tomorrow, now) returning the ReportRange the
+            report reads, or None if the response must not be cached
+        headers: Dictionary `compute` may fill with extra response headers,
+            which are cached along with the body
+
+    Returns:
+        tuple: JSON response and HTTP 200
+    """
+    verify = request.args.get("verify") == "true"
+    ticket = None
+
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            if verify:
+                # both paths must see the same rows and the same "now"
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            elif REPORT_CACHE and range_of is not None:
+                ticket = report_cache.probe(cur, request.endpoint, request.args, range_of)
+                if ticket.body is not None:
+                    return (
+                        current_app.response_class(ticket.body, mimetype="application/json", headers=ticket.headers),
+                        200,
+                    )
+            with cancel_on_disconnect(conn):
+                coverage = rollup_coverage(cur)
+                result = compute(cur, coverage, True)
+                if verify:
+                    raw = compute(cur, coverage, False)
+
+    if verify:
+        return jsonify({"rollup": result, "raw": raw, "match": result == raw}), 200
+    response = jsonify(result)
+    response.headers.update(headers or {})
+    if ticket is not None:
+        report_cache.store(ticket, response.get_data(), headers)
+    return response, 200
+
+
+def _today(cur):
+    """Returns the database's start of today, start of tomorrow and current time."""
+    cur.execute(
+        "SELECT CURRENT_DATE::timestamp AS today, CURRENT_DATE::timestamp + INTERVAL '1 day' AS tomorrow, LOCALTIMESTAMP AS now"
+    )
+    row = cur.fetchone()
+    return row["today"], row["tomorrow"], row["now"]
+
+
+def _product_usage_sql(facts):
+    """Returns the ingredient usage query over a sales_facts() subquery."""
+    return f"""
+        SELECT 
+            i.ingredient_name, 
+            SUM(mi.ingredient_amount::numeric * f.quantity)::float8 AS total_inventory_used
+        FROM 
+            ({facts}) AS f
+        JOIN 
+            menu_items m ON f.menu_item_id = m.menu_item_id
+        JOIN 
+            menu_items_ingredients mi ON m.menu_item_id = mi.menu_item_id
+        JOIN 
+            ingredients i ON mi.ingredient_id = i.ingredient_id
+        GROUP BY 
+            i.ingredient_name
+        ORDER BY 
+            total_inventory_used DESC
+    """
+
+
+def _usage_series_sql(cur, coverage, use_rollups, start, end, bucket):
+    """Returns ingredient usage per bucket in the usage_series() format, using the SQL join."""
+    buckets = bucket_starts(cur, start, end, bucket)
+    bucket_index = {value: index for index, value in enumerate(buckets)}
+    facts, params = sales_facts(start, end, coverage, use_rollups)
+    query = f"""
+        SELECT 
+            DATE_TRUNC(%(bucket)s, f.hour) AS bucket,
+            i.ingredient_name, 
+            SUM(mi.ingredient_amount::numeric * f.quantity)::float8 AS total_inventory_used
+        FROM 
+            ({facts}) AS f
+        JOIN 
+            menu_items m ON f.menu_item_id = m.menu_item_id
+        JOIN 
+            menu_items_ingredients mi ON m.menu_item_id = mi.menu_item_id
+        JOIN 
+            ingredients i ON mi.ingredient_id = i.ingredient_id
+        GROUP BY 
+            1, i.ingredient_name;
+    """
+    cur.execute(query, dict(params, bucket=bucket))
+    usage = {}
+    for row in cur.fetchall():
+        if row["bucket"] not in bucket_index:
+            continue
+        series = usage.setdefault(row["ingredient_name"], [0.0] * len(buckets))
+        series[bucket_index[row["bucket"]]] = row["total_inventory_used"]
+    return {
+        "bucket": bucket,
+        "buckets": [value.isoformat() for value in buckets],
+        "usage": usage,
+    }
+
+
+def _sales_report_sql(facts):
+    """Returns the per-item sales report query over a sales_facts() subquery."""
+    return f"""
+        SELECT 
+            mi.menu_item_name, 
+            SUM(f.quantity)::bigint AS quantity_sold,
+            SUM(f.revenue)::float8 AS total_sales
+        FROM 
+            (SELECT menu_item_id, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+             FROM ({facts}) AS facts
+             GROUP BY menu_item_id) AS f
+        JOIN 
+            menu_items mi ON f.menu_item_id = mi.menu_item_id
+        GROUP BY 
+            mi.menu_item_name
+        ORDER BY 
+            mi.menu_item_name
+    """
+
+
+def _sales_by_hour(cur, coverage, use_rollups, start, end, end_inclusive=True):
+    """Returns sales totals per hour in a range, keyed by the hour in ISO format."""
+    facts, params = sales_facts(start, end, coverage, use_rollups, end_inclusive=end_inclusive)
+    query = f"""
+        SELECT 
+            f.hour, 
+            SUM(f.revenue)::float8 AS total_sales
+        FROM 
+            ({facts}) AS f
+        GROUP BY 
+            f.hour
+        ORDER BY 
+            f.hour;
+    """
+    cur.execute(query, params)
+    return {row["hour"].isoformat(): row["total_sales"] for row in cur.fetchall()}
+
+
+def _sales_by_employee(cur, coverage, use_rollups, start, end, end_inclusive=True):
+    """Returns sales totals per employee name in a range."""
+    facts, params = sales_facts(
+        start, end, coverage, use_rollups, end_inclusive=end_inclusive, by_employee=True
+    )
+    query = f"""
+        SELECT 
+            e.employee_name, 
+            SUM(f.revenue)::float8 AS total_sales
+        FROM 
+            (SELECT employee_id, SUM(revenue) AS revenue
+             FROM ({facts}) AS facts
+             GROUP BY employee_id) AS f
+        JOIN 
+            employees e ON f.employee_id = e.employee_id
+        GROUP BY 
+            e.employee_name
+        ORDER BY 
+            total_sales DESC;
+    """
+    cur.execute(query, params)
+    return {row["employee_name"]: row["total_sales"] for row in cur.fetchall()}
+
+
+def _popularity(cur, coverage, use_rollups, start, end, limit, end_inclusive=True):
+    """Returns the names of the best-selling menu items in a range, best first."""
+    facts, params = sales_facts(start, end, coverage, use_rollups, end_inclusive=end_inclusive)
+    query = f"""
+        SELECT 
+            mi.menu_item_name AS menu_item 
+        FROM 
+            ({facts}) AS f
+        JOIN 
+            menu_items mi ON f.menu_item_id = mi.menu_item_id
+        GROUP BY 
+            mi.menu_item_name
+        ORDER BY 
+            SUM(f.quantity) DESC, mi.menu_item_name
+        LIMIT %(limit)s;
+    """
+    cur.execute(query, dict(params, limit=limit))
+    return [row["menu_item"] for row in cur.fetchall()]
+
 
 @reports_bp.route("/productUsage", methods=["GET"])
 def get_product_usage():
@@ -44,46 +307,67 @@ def get_product_usage():
     """
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
-    print(f"Received request: start_date={start_date}, end_date={end_date}")
+    start = parse_bound(start_date) or start_date
+    end = parse_bound(end_date) or end_date
+
+    def compute(cur, coverage, use_rollups):
+        if usage_engine_enabled():
+            return product_usage(cur, start, end, coverage, use_rollups)
+        facts, params = sales_facts(start, end, coverage, use_rollups)
+        cur.execute(_product_usage_sql(facts), params)
+        return {
+            row["ingredient_name"]: row["total_inventory_used"]
+            for row in cur.fetchall()
+        }
+
+    try:
+        return _run_report(compute, fixed_range(start, end))
+    except psycopg2.Error as e:
+        return jsonify({"error": str(e)}), 500
 
-    product_usage_data = {}
+
+@reports_bp.route("/productUsageSeries", methods=["GET"])
+def get_product_usage_series():
+    """
+    Fetches ingredient usage per time bucket within a time range, e.g. per day
+    over the last 90 days for inventory planning.
+
+    Query Parameters:
+        start_date (str): Start of the date range (ISO format)
+        end_date (str): End of the date range (ISO format)
+        bucket (str): "hour", "day" (default), "week" or "month"
+
+    Returns:
+        tuple: JSON response with:
+            - bucket starts and, per ingredient, its usage in each bucket
+            - HTTP 200 on success
+            - HTTP 400 on invalid parameters
+            - HTTP 500 on database errors
+
+    Example Response:
+        {
+            "bucket": "day",
+            "buckets": ["2024-11-01T00:00:00", "2024-11-02T00:00:00"],
+            "usage": {"Rice": [150.5, 98.0], "Chicken": [75.2, 0.0]}
+        }
+    """
+    start = parse_bound(request.args.get("start_date"))
+    end = parse_bound(request.args.get("end_date"))
+    bucket = request.args.get("bucket", "day")
+    if start is None or end is None:
+        return jsonify({"error": "start_date and end_date are required (ISO format)"}), 400
+    if bucket not in BUCKETS:
+        return jsonify({"error": f"bucket must be one of: {', '.join(BUCKETS)}"}), 400
+    if (end - start).total_seconds() / BUCKETS[bucket] > USAGE_SERIES_MAX_BUCKETS:
+        return jsonify({"error": f"range spans more than {USAGE_SERIES_MAX_BUCKETS} {bucket} buckets"}), 400
+
+    def compute(cur, coverage, use_rollups):
+        if usage_engine_enabled():
+            return usage_series(cur, start, end, coverage, use_rollups, bucket)
+        return _usage_series_sql(cur, coverage, use_rollups, start, end, bucket)
 
     try:
-        print("Start of try")
-        with get_db_connection() as conn:
-            print("Passed Connection")
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                query = """
-                    SELECT 
-                        i.ingredient_name, 
-                        SUM(mi.ingredient_amount * td.item_quantity_sold) AS total_inventory_used
-                    FROM 
-                        transaction_details td
-                    JOIN 
-                        menu_items m ON td.menu_item_id = m.menu_item_id
-                    JOIN 
-                        menu_items_ingredients mi ON m.menu_item_id = mi.menu_item_id
-                    JOIN 
-                        ingredients i ON mi.ingredient_id = i.ingredient_id
-                    JOIN 
-                        transactions t ON td.transaction_id = t.transaction_id
-                    WHERE 
-                        t.order_timestamp BETWEEN %s AND %s
-                    GROUP BY 
-                        i.ingredient_name
-                    ORDER BY 
-                        total_inventory_used DESC;
-                """
-                cur.execute(query, (start_date, end_date))
-                results = cur.fetchall()
-
-                product_usage_data = {
-                    row["ingredient_name"]: row["total_inventory_used"]
-                    for row in results
-                }
-            print("Emd queery")
-
-        return jsonify(product_usage_data), 200
+        return _run_report(compute, fixed_range(start, end))
     except psycopg2.Error as e:
         return jsonify({"error": str(e)}), 500
 
@@ -106,37 +390,16 @@ def get_current_sales_by_hour():
             ...
         }
     """
-    sales_by_hour_data = {}
+
+    def compute(cur, coverage, use_rollups):
+        today, _, now = _today(cur)
+        return _sales_by_hour(cur, coverage, use_rollups, today, now)
+
+    def range_of(today, tomorrow, now):
+        return ReportRange(today, now, True, True, today)
 
     try:
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                query = """
-                    SELECT 
-                        DATE_TRUNC('hour', t.order_timestamp) AS hour, 
-                        SUM(td.item_quantity_sold * mi.price) AS total_sales
-                    FROM 
-                        transactions t
-                    JOIN 
-                        transaction_details td ON t.transaction_id = td.transaction_id
-                    JOIN 
-                        menu_items mi ON td.menu_item_id = mi.menu_item_id
-                    WHERE 
-                        t.order_timestamp::DATE = CURRENT_DATE 
-                        AND t.order_timestamp <= NOW()
-                    GROUP BY 
-                        hour
-                    ORDER BY 
-                        hour;
-                """
-                cur.execute(query)
-                results = cur.fetchall()
-
-                sales_by_hour_data = {
-                    row["hour"]: row["total_sales"] for row in results
-                }
-
-        return jsonify(sales_by_hour_data), 200
+        return _run_report(compute, range_of)
     except psycopg2.Error as e:
         return jsonify({"error": str(e)}), 500
 
@@ -159,38 +422,16 @@ def get_total_sales_by_employee():
             ...
         }
     """
-    total_sales_by_employee = {}
+
+    def compute(cur, coverage, use_rollups):
+        today, tomorrow, _ = _today(cur)
+        return _sales_by_employee(cur, coverage, use_rollups, today, tomorrow, end_inclusive=False)
+
+    def range_of(today, tomorrow, now):
+        return ReportRange(today, tomorrow, False, False, today)
 
     try:
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                query = """
-                    SELECT 
-                        e.employee_name, 
-                        SUM(td.item_quantity_sold * mi.price) AS total_sales
-                    FROM 
-                        transactions t
-                    JOIN 
-                        transaction_details td ON t.transaction_id = td.transaction_id
-                    JOIN 
-                        menu_items mi ON td.menu_item_id = mi.menu_item_id
-                    JOIN 
-                        employees e ON t.employee_id = e.employee_id
-                    WHERE 
-                        t.order_timestamp::DATE = CURRENT_DATE
-                    GROUP BY 
-                        e.employee_name
-                    ORDER BY 
-                        total_sales DESC;
-                """
-                cur.execute(query)
-                results = cur.fetchall()
-
-                total_sales_by_employee = {
-                    row["employee_name"]: row["total_sales"] for row in results
-                }
-
-        return jsonify(total_sales_by_employee), 200
+        return _run_report(compute, range_of)
     except psycopg2.Error as e:
         return jsonify({"error": str(e)}), 500
 
@@ -198,16 +439,20 @@ def get_total_sales_by_employee():
 @reports_bp.route("/salesReport", methods=["GET"])
 def get_sales_report():
     """
-    Generates a comprehensive sales report for a date range.
+    Generates a comprehensive sales report for a date range, ordered by menu item name.
 
     Query Parameters:
         start_date (str): Start of the date range (ISO format)
         end_date (str): End of the date range (ISO format)
+        limit (int): Menu items per page (all of them if neither limit nor cursor is given)
+        cursor (str): X-Next-Cursor header of the previous page
+        fields (str): Comma-separated columns to return (see SALES_REPORT_COLUMNS)
 
     Returns:
         tuple: JSON response with:
             - list of sales records with menu item details
-            - HTTP 200 on success
+            - HTTP 200 on success, with X-Next-Cursor while more pages follow
+            - HTTP 400 on an invalid limit, cursor or fields parameter
             - HTTP 500 on database errors
 
     Example Response:
@@ -222,43 +467,29 @@ def get_sales_report():
     """
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
-
-    sales_data = []
+    start = parse_bound(start_date) or start_date
+    end = parse_bound(end_date) or end_date
+    try:
+        page = page_request("reports.salesReport", ("menu_item_name",), SALES_REPORT_COLUMNS)
+    except PageError as e:
+        return jsonify({"error": str(e)}), 400
+    headers = {}
+
+    def compute(cur, coverage, use_rollups):
+        facts, params = sales_facts(start, end, coverage, use_rollups)
+        after, after_params = page.after_sql(("s.menu_item_name",), named=True)
+        cur.execute(
+            f"SELECT s.* FROM ({_sales_report_sql(facts)}) AS s WHERE {after} "
+            "ORDER BY s.menu_item_name LIMIT %(page_limit)s",
+            dict(params, page_limit=page.fetch, **after_params),
+        )
+        rows, page_headers = page.finish(cur.fetchall())
+        headers.update(page_headers)
+        fields = page.fields or SALES_REPORT_COLUMNS
+        return [{name: row[name] for name in fields} for row in rows]
 
     try:
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                query = """
-                    SELECT 
-                        mi.menu_item_name, 
-                        SUM(td.item_quantity_sold) AS quantity,
-                        SUM(mi.price * td.item_quantity_sold) AS total_sales
-                    FROM 
-                        transactions t
-                    JOIN 
-                        transaction_details td ON t.transaction_id = td.transaction_id
-                    JOIN 
-                        menu_items mi ON td.menu_item_id = mi.menu_item_id
-                    WHERE 
-                        t.order_timestamp BETWEEN %s AND %s
-                    GROUP BY 
-                        mi.menu_item_name
-                    ORDER BY 
-                        mi.menu_item_name;
-                """
-                cur.execute(query, (start_date, end_date))
-                results = cur.fetchall()
-
-                sales_data = [
-                    {
-                        "menu_item_name": row["menu_item_name"],
-                        "quantity_sold": row["quantity"],
-                        "total_sales": row["total_sales"],
-                    }
-                    for row in results
-                ]
-
-        return jsonify(sales_data), 200
+        return _run_report(compute, fixed_range(start, end), headers)
     except psycopg2.Error as e:
         return jsonify({"error": str(e)}), 500
 
@@ -268,6 +499,9 @@ def get_popularity_analysis():
     """
     Analyzes menu item popularity based on sales volume.
 
+    Whole hours are ranked from the sales_hourly_items rollup and the partial
+    hours at the edges from raw rows, so the ranking is exact.
+
     Query Parameters:
         start_date (str): Start of the date range (ISO format)
         end_date (str): End of the date range (ISO format)
@@ -290,34 +524,322 @@ def get_popularity_analysis():
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
     limit = request.args.get("limit", type=int)
+    start = parse_bound(start_date) or start_date
+    end = parse_bound(end_date) or end_date
+
+    def compute(cur, coverage, use_rollups):
+        return _popularity(cur, coverage, use_rollups, start, end, limit)
+
+    try:
+        return _run_report(compute, fixed_range(start, end))
+    except psycopg2.Error as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _dashboard_submit(fn, *args, **kwargs):
+    """Submits `fn` to the dashboard pool, carrying over the request's statement budget and client."""
+    return _dashboard_pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _dashboard_part(report, *args, **kwargs):
+    """Runs one dashboard sub-report on its own pooled connection."""
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            with cancel_on_disconnect(conn):
+                coverage = rollup_coverage(cur)
+                return report(cur, coverage, True, *args, **kwargs)
+
+
+def _dashboard_ingredients():
+    """Fetches current ingredient stock for the dashboard."""
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT * FROM ingredients;")
+            return cur.fetchall()
+
+
+@reports_bp.route("/dashboard", methods=["GET"])
+def get_dashboard():
+    """
+    Computes every report on the manager dashboard in one request.
+
+    The sub-reports run concurrently on a bounded thread pool, each on its own
+    pooled connection, so the response takes about as long as the slowest one.
+    For today the window runs from midnight to now; comparison periods cover
+    the same window shifted back, so partial days are compared like for like.
 
-    top_selling_menu_items = []
+    Query Parameters:
+        date (str): Day to report on (ISO format, defaults to today)
+        limit (int): Number of items in popularityAnalysis (defaults to 5)
+        compare (str): Comma-separated comparison periods, any of
+            yesterday, last_week, last_month, last_year
+
+    Returns:
+        tuple: JSON response with:
+            - window, salesByHour, salesByEmployee and popularityAnalysis for the day
+            - ingredients with current stock
+            - comparisons: the same reports per requested comparison period
+            - HTTP 200 on success
+            - HTTP 400 on an invalid date or comparison period
+            - HTTP 500 on database errors
+
+    Example Response:
+        {
+            "window": {"start": "2024-11-15T00:00:00", "end": "2024-11-15T13:05:00"},
+            "salesByHour": {"2024-11-15T11:00:00": 523.5, ...},
+            "salesByEmployee": {"Jane Doe": 812.25, ...},
+            "popularityAnalysis": ["Orange Chicken", ...],
+            "ingredients": [{"ingredient_id": 1, "ingredient_name": "Rice", "stock": 300}, ...],
+            "comparisons": {"last_week": {"window": {...}, "salesByHour": {...}, ...}}
+        }
+    """
+    date = request.args.get("date")
+    limit = request.args.get("limit", default=5, type=int)
+    compare = [name for name in request.args.get("compare", "").split(",") if name]
+
+    unknown = [name for name in compare if name not in COMPARISONS]
+    if unknown:
+        return jsonify({"error": f"Unknown comparison periods: {', '.join(unknown)}"}), 400
+    day = parse_bound(date) if date else None
+    if date and day is None:
+        return jsonify({"error": "date must be an ISO date"}), 400
 
     try:
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                query = """
-                    SELECT 
-                        mi.menu_item_name AS menu_item 
-                    FROM 
-                        transactions t
-                    JOIN 
-                        transaction_details td ON t.transaction_id = td.transaction_id
-                    JOIN 
-                        menu_items mi ON td.menu_item_id = mi.menu_item_id
-                    WHERE 
-                        t.order_timestamp BETWEEN %s AND %s
-                    GROUP BY 
-                        mi.menu_item_name
-                    ORDER BY 
-                        SUM(td.item_quantity_sold) DESC
-                    LIMIT %s;
-                """
-                cur.execute(query, (start_date, end_date, limit))
-                results = cur.fetchall()
-
-                top_selling_menu_items = [row["menu_item"] for row in results]
-
-        return jsonify(top_selling_menu_items), 200
+                today, tomorrow, now = _today(cur)
+
+        if day is None or day.date() == today.date():
+            start, end, end_inclusive = today, now, True
+        else:
+            start = day.replace(hour=0, minute=0, second=0, microsecond=0)
+            end, end_inclusive = start + timedelta(days=1), False
+
+        periods = {None: timedelta(0)}
+        periods.update((name, COMPARISONS[name]) for name in compare)
+
+        futures = {}
+        for period, shift in periods.items():
+            lo, hi = start - shift, end - shift
+            futures[period] = (
+                {"start": lo.isoformat(), "end": hi.isoformat()},
+                _dashboard_submit(_dashboard_part, _sales_by_hour, lo, hi, end_inclusive=end_inclusive),
+                _dashboard_submit(_dashboard_part, _sales_by_employee, lo, hi, end_inclusive=end_inclusive),
+                _dashboard_submit(_dashboard_part, _popularity, lo, hi, limit, end_inclusive=end_inclusive),
+            )
+        ingredients = _dashboard_submit(_dashboard_ingredients)
+
+        reports = {}
+        for period, (window, by_hour, by_employee, popularity) in futures.items():
+            reports[period] = {
+                "window": window,
+                "salesByHour": by_hour.result(),
+                "salesByEmployee": by_employee.result(),
+                "popularityAnalysis": popularity.result(),
+            }
+
+        dashboard = reports.pop(None)
+        dashboard["ingredients"] = ingredients.result()
+        dashboard["comparisons"] = reports
+        return jsonify(dashboard), 200
+    except psycopg2.Error as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _live_snapshot(cur):
+    """Loads today's sales by hour and by employee for the live sales hub."""
+    today, tomorrow, _ = _today(cur)
+    coverage = rollup_coverage(cur)
+    return (
+        today,
+        _sales_by_hour(cur, coverage, True, today, tomorrow, end_inclusive=False),
+        _sales_by_employee(cur, coverage, True, today, tomorrow, end_inclusive=False),
+    )
+
+
+live_sales_hub = LiveSalesHub(_live_snapshot)
+
+
+@reports_bp.route("/live", methods=["GET"])
+def stream_live_sales():
+    """
+    Streams today's sales to a dashboard as Server-Sent Events.
+
+    The first event is a snapshot of today's totals; after that every committed
+    order (from any worker) arrives as one delta event per hour and employee.
+    A new snapshot is sent when the day rolls over, after the listener
+    reconnects, or if the client falls too far behind. Idle streams receive a
+    keep-alive comment every LIVE_SALES_HEARTBEAT seconds.
+
+    Events:
+        snapshot: {"day": "2024-11-15", "salesByHour": {...}, "salesByEmployee": {...}}
+        delta: {"hour": "2024-11-15T13:00:00", "employee": "Jane Doe", "amount": 12.5}
+            (employee is null for orders not taken by an employee, e.g. kiosk orders)
+
+    Returns:
+        Response: text/event-stream, or HTTP 503 if the live sales listener
+            is not connected to the database
+
+    Note:
+        Each open stream occupies a worker thread, so run gunicorn with a
+        threaded or asynchronous worker class (e.g. --worker-class gthread).
+    """
+    events = live_sales_hub.subscribe()
+    if events is None:
+        return jsonify({"error": "Live sales are unavailable"}), 503
+
+    def stream():
+        try:
+            while True:
+                try:
+                    event, data = events.get(timeout=LIVE_SALES_HEARTBEAT)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(event, data)
+        finally:
+            live_sales_hub.unsubscribe(events)
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _export_args():
+    """
+    Reads and checks the query parameters shared by the export endpoints.
+
+    Returns:
+        tuple: (start, end, fmt, error) where error is a JSON response and HTTP
+            400 if the parameters are invalid, otherwise None
+    """
+    start = parse_bound(request.args.get("start_date"))
+    end = parse_bound(request.args.get("end_date"))
+    fmt = request.args.get("format", "csv")
+    if start is None or end is None:
+        return None, None, None, (jsonify({"error": "start_date and end_date are required (ISO format)"}), 400)
+    if fmt not in FORMATS:
+        return None, None, None, (jsonify({"error": f"format must be one of: {', '.join(FORMATS)}"}), 400)
+    return start, end, fmt, None
+
+
+@reports_bp.route("/export/productUsage", methods=["GET"])
+def export_product_usage():
+    """
+    Streams total ingredient usage within a time range.
+
+    Query Parameters:
+        start_date (str): Start of the date range (ISO format)
+        end_date (str): End of the date range (ISO format)
+        format (str): "csv" (default) or "ndjson"
+
+    Returns:
+        Streaming CSV or NDJSON response with columns ingredient_name and
+        total_inventory_used, HTTP 400 on invalid parameters or HTTP 500 on
+        database errors
+    """
+    start, end, fmt, error = _export_args()
+    if error:
+        return error
+
+    def prepare(cur):
+        facts, params = sales_facts(start, end, rollup_coverage(cur))
+        return _product_usage_sql(facts), params
+
+    try:
+        return export_response(prepare, fmt, "product_usage")
+    except psycopg2.Error as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@reports_bp.route("/export/salesReport", methods=["GET"])
+def export_sales_report():
+    """
+    Streams the per-item sales report for a time range.
+
+    Query Parameters:
+        start_date (str): Start of the date range (ISO format)
+        end_date (str): End of the date range (ISO format)
+        format (str): "csv" (default) or "ndjson"
+
+    Returns:
+        Streaming CSV or NDJSON response with columns menu_item_name,
+        quantity_sold and total_sales, HTTP 400 on invalid parameters or
+        HTTP 500 on database errors
+    """
+    start, end, fmt, error = _export_args()
+    if error:
+        return error
+
+    def prepare(cur):
+        facts, params = sales_facts(start, end, rollup_coverage(cur))
+        return _sales_report_sql(facts), params
+
+    try:
+        return export_response(prepare, fmt, "sales_report")
+    except psycopg2.Error as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@reports_bp.route("/export/transactions", methods=["GET"])
+def export_transactions():
+    """
+    Streams every order line within a time range, for audits.
+
+    Query Parameters:
+        start_date (str): Start of the date range (ISO format)
+        end_date (str): End of the date range (ISO format)
+        format (str): "csv" (default) or "ndjson"
+
+    Returns:
+        Streaming CSV or NDJSON response with one row per order line:
+        transaction_id, order_timestamp, employee_name, customer, customer_id,
+        order_total, menu_item_id, menu_item_name, quantity, unit_price and
+        line_total, ordered by transaction. HTTP 400 on invalid parameters or
+        HTTP 500 on database errors.
+
+    Note:
+        unit_price and line_total are what the line was sold at; lines placed
+        before those were recorded show the menu item's current price.
+    """
+    start, end, fmt, error = _export_args()
+    if error:
+        return error
+
+    def prepare(cur):
+        query = """
+            SELECT 
+                t.transaction_id,
+                t.order_timestamp,
+                e.employee_name,
+                t.customer,
+                t.customer_id,
+                t.price AS order_total,
+                td.menu_item_id,
+                mi.menu_item_name,
+                td.item_quantity_sold AS quantity,
+                COALESCE(td.unit_price, mi.price::numeric)::float8 AS unit_price,
+                COALESCE(td.line_total, mi.price::numeric * td.item_quantity_sold)::float8 AS line_total
+            FROM 
+                transactions t
+            JOIN 
+                transaction_details td
+                ON t.transaction_id = td.transaction_id
+            LEFT JOIN 
+                menu_items mi ON td.menu_item_id = mi.menu_item_id
+            LEFT JOIN 
+                employees e ON t.employee_id = e.employee_id
+            WHERE 
+                t.order_timestamp BETWEEN %(start)s AND %(end)s
+                AND (td.order_timestamp BETWEEN %(start)s AND %(end)s OR td.order_timestamp IS NULL)
+            ORDER BY 
+                t.transaction_id, td.menu_item_id
+        """
+        return query, {"start": start, "end": end}
+
+    try:
+        return export_response(prepare, fmt, "transactions")
     except psycopg2.Error as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,505 @@
+"""
+Sales Rollups Module
+
+This module maintains hourly rollup tables of units sold and revenue so the
+report endpoints do not have to join every raw transaction in a long date
+range:
+
+    - sales_hourly_items: units sold and revenue per (hour, menu item)
+    - sales_hourly_employees: units sold and revenue per (hour, employee, menu item)
+
+Order placement does not touch either table. It only appends its transaction
+IDs to sales_rollup_queue (queue_order_rollups), which is insert-only, so
+concurrent orders never wait on each other's rollup rows. fold_rollups() runs
+every minute or so (`flask fold-rollups`). It takes the committed queue entries
+in batches and adds their line items to both tables in the same transaction
+that deletes them from the queue. It takes whatever has committed, not
+everything below an ID, so an order that commits late is folded by the next
+run instead of being skipped. sales_facts() reads the orders still in the
+queue from raw rows, so reports are exact however far folding has fallen behind.
+
+rebuild_rollups() recomputes the tables from raw rows for existing history,
+leaving out orders still in the queue, and records the first hour they cover
+in job_watermarks; reports only use rollups from that hour on. Folding and
+rebuilding take the same advisory lock, so they never interleave. Neither
+locks a table that orders write to.
+
+Every fold batch and rebuilt chunk increments the ROLLUP_VERSION_MARK counter
+in job_watermarks and stamps the hours it changed with the new value in
+sales_rollup_changes, in the same transaction. Since both run under the
+advisory lock, the counter follows commit order. Together with the queue this
+tells cached reports (see report_cache.py) whether an order has landed in
+their range since they were computed.
+
+Revenue is the sum of the line totals order placement records on each
+transaction_details row at the price it was sold for, so a later price change
+does not re-price history. Rows written before line totals were recorded (see
+backfill_line_totals) and rollup hours built from them fall back to the
+current menu price; LINE_TOTAL and ROLLUP_REVENUE only look the price up for
+such rows. Ingredient usage is still derived at query time from units sold
+and the current menu_items_ingredients recipe.
+
+sales_facts() returns a subquery that reads rollup rows for the whole hours in
+a requested range and raw rows only for the partial hours at its edges.
+"""
+
+import math
+import time
+from datetime import datetime, timedelta
+
+COVERAGE_MARK = "sales_rollups_since"
+ROLLUP_VERSION_MARK = "sales_rollups_version"
+
+# arbitrary application-wide key for pg_advisory_xact_lock, held while the rollup rows change
+ROLLUP_LOCK_KEY = 720_331_002
+
+# revenue of a transaction_details row `td`, priced at today's menu price if it predates line totals
+LINE_TOTAL = """COALESCE(
+    td.line_total,
+    td.item_quantity_sold * (SELECT mi.price::numeric FROM menu_items mi WHERE mi.menu_item_id = td.menu_item_id)
+)"""
+
+# revenue of a rollup row, likewise for hours rolled up before line totals were recorded
+ROLLUP_REVENUE = """COALESCE(
+    revenue,
+    quantity * (SELECT mi.price::numeric FROM menu_items mi WHERE mi.menu_item_id = r.menu_item_id)
+)"""
+
+
+def queue_order_rollups(cur, transaction_ids):
+    """
+    Queues the given transactions to be added to the hourly rollups by fold_rollups().
+
+    Must run in the same database transaction that inserted the rows, so an
+    order and its queue entry become visible together.
+
+    Args:
+        cur: Cursor inside the transaction that placed the orders
+        transaction_ids: IDs of the transactions just inserted
+    """
+    if not transaction_ids:
+        return
+    cur.execute(
+        "INSERT INTO sales_rollup_queue (transaction_id) SELECT unnest(%s::int[])",
+        (list(transaction_ids),),
+    )
+
+
+def _fold_batch(cur, batch_size):
+    """Moves the oldest queued transactions into both rollup tables and returns how many there were."""
+    cur.execute(
+        f"""
+        WITH taken AS (
+            DELETE FROM sales_rollup_queue
+            WHERE transaction_id IN (
+                SELECT transaction_id FROM sales_rollup_queue ORDER BY transaction_id LIMIT %(batch_size)s
+            )
+            RETURNING transaction_id
+        ),
+        lines AS (
+            SELECT DATE_TRUNC('hour', t.order_timestamp) AS hour,
+                   t.employee_id,
+                   td.menu_item_id,
+                   td.item_quantity_sold AS quantity,
+                   {LINE_TOTAL} AS revenue
+            FROM taken q
+            JOIN transactions t ON t.transaction_id = q.transaction_id
+            JOIN transaction_details td ON td.transaction_id = t.transaction_id
+            WHERE td.menu_item_id IS NOT NULL
+              AND t.order_timestamp IS NOT NULL
+        ),
+        employees AS (
+            INSERT INTO sales_hourly_employees (hour, employee_id, menu_item_id, quantity, revenue)
+            SELECT hour, employee_id, menu_item_id, SUM(quantity), SUM(revenue)
+            FROM lines
+            WHERE employee_id IS NOT NULL
+            GROUP BY hour, employee_id, menu_item_id
+            ON CONFLICT (hour, employee_id, menu_item_id)
+            DO UPDATE SET quantity = sales_hourly_employees.quantity + EXCLUDED.quantity,
+                          revenue = sales_hourly_employees.revenue + EXCLUDED.revenue
+        ),
+        items AS (
+            INSERT INTO sales_hourly_items (hour, menu_item_id, quantity, revenue)
+            SELECT hour, menu_item_id, SUM(quantity), SUM(revenue)
+            FROM lines
+            GROUP BY hour, menu_item_id
+            ON CONFLICT (hour, menu_item_id)
+            DO UPDATE SET quantity = sales_hourly_items.quantity + EXCLUDED.quantity,
+                          revenue = sales_hourly_items.revenue + EXCLUDED.revenue
+        ),
+        version AS (
+            INSERT INTO job_watermarks (name, position)
+            SELECT %(version_mark)s, 1 WHERE EXISTS (SELECT 1 FROM taken)
+            ON CONFLICT (name) DO UPDATE SET position = job_watermarks.position + 1
+            RETURNING position
+        ),
+        changes AS (
+            INSERT INTO sales_rollup_changes (hour, version)
+            SELECT DISTINCT DATE_TRUNC('hour', t.order_timestamp), version.position
+            FROM taken q
+            JOIN transactions t ON t.transaction_id = q.transaction_id
+            CROSS JOIN version
+            WHERE t.order_timestamp IS NOT NULL
+            ON CONFLICT (hour) DO UPDATE SET version = EXCLUDED.version
+        )
+        SELECT COUNT(*) FROM taken
+    """,
+        {"batch_size": batch_size, "version_mark": ROLLUP_VERSION_MARK},
+    )
+    return cur.fetchone()[0]
+
+
+def _record_rebuilt(cur, lo, hi):
+    """Stamps every hour in [lo, hi) as changed with a new rollup version."""
+    cur.execute(
+        """
+        WITH version AS (
+            INSERT INTO job_watermarks (name, position) VALUES (%(version_mark)s, 1)
+            ON CONFLICT (name) DO UPDATE SET position = job_watermarks.position + 1
+            RETURNING position
+        )
+        INSERT INTO sales_rollup_changes (hour, version)
+        SELECT hour, version.position
+        FROM version, generate_series(%(lo)s::timestamp, %(hi)s::timestamp - INTERVAL '1 hour', INTERVAL '1 hour') AS hour
+        ON CONFLICT (hour) DO UPDATE SET version = EXCLUDED.version
+    """,
+        {"version_mark": ROLLUP_VERSION_MARK, "lo": lo, "hi": hi},
+    )
+
+
+def fold_rollups(conn, batch_size=5000, pause=0.0):
+    """
+    Adds the queued orders to the hourly rollups.
+
+    Each batch runs in its own short transaction under the rollup advisory
+    lock, deleting its queue entries and upserting the rollup rows together,
+    so an interrupted run loses nothing and two runs never fold the same order.
+    Orders still in flight are not visible yet and are left for the next run.
+
+    Args:
+        conn: Database connection not currently in a transaction
+        batch_size: Queued transactions folded in per batch
+        pause: Seconds to sleep between batches to limit the load
+
+    Returns:
+        dict: Orders folded in and batches run
+    """
+    folded = batches = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (ROLLUP_LOCK_KEY,))
+            orders = _fold_batch(cur, batch_size)
+        conn.commit()
+        if not orders:
+            break
+        folded += orders
+        batches += 1
+        if orders < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return {"orders": folded, "batches": batches}
+
+
+def rebuild_rollups(conn, start, chunk=timedelta(days=1)):
+    """
+    Recomputes the rollups from raw rows for every hour from `start` onwards.
+
+    Works one chunk at a time, each in its own short transaction holding the
+    rollup advisory lock, so no fold runs between a chunk's DELETE and INSERT.
+    Orders still in sales_rollup_queue are left out; fold_rollups() adds
+    them later, whether they had committed before the chunk or commit while it
+    runs. Order placement only inserts into the queue, so it is never blocked.
+    Once every chunk is done, `start` is recorded as the first hour reports
+    may read from the rollups.
+
+    Args:
+        conn: Database connection not currently in a transaction
+        start: First hour to rebuild (truncated to the hour)
+        chunk: Width of the time range rebuilt per transaction
+
+    Returns:
+        int: Number of chunks rebuilt
+    """
+    start = floor_hour(start)
+    with conn.cursor() as cur:
+        cur.execute("SELECT DATE_TRUNC('hour', MAX(order_timestamp)) FROM transactions")
+        last = cur.fetchone()[0]
+    conn.commit()
+
+    chunks = 0
+    lo = start
+    while last is not None and lo <= last:
+        hi = lo + chunk
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (ROLLUP_LOCK_KEY,))
+            for table in ("sales_hourly_items", "sales_hourly_employees"):
+                cur.execute(
+                    f"DELETE FROM {table} WHERE hour >= %s AND hour < %s",
+                    (lo, hi),
+                )
+            cur.execute(
+                f"""
+                INSERT INTO sales_hourly_items (hour, menu_item_id, quantity, revenue)
+                SELECT DATE_TRUNC('hour', t.order_timestamp), td.menu_item_id, SUM(td.item_quantity_sold),
+                       SUM({LINE_TOTAL})
+                FROM transactions t
+                JOIN transaction_details td ON td.transaction_id = t.transaction_id
+                WHERE t.order_timestamp >= %(lo)s AND t.order_timestamp < %(hi)s
+                  AND ((td.order_timestamp >= %(lo)s AND td.order_timestamp < %(hi)s) OR td.order_timestamp IS NULL)
+                  AND td.menu_item_id IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM sales_rollup_queue q WHERE q.transaction_id = t.transaction_id)
+                GROUP BY 1, 2
+                ORDER BY 1, 2
+            """,
+                {"lo": lo, "hi": hi},
+            )
+            cur.execute(
+                f"""
+                INSERT INTO sales_hourly_employees (hour, employee_id, menu_item_id, quantity, revenue)
+                SELECT DATE_TRUNC('hour', t.order_timestamp), t.employee_id, td.menu_item_id,
+                       SUM(td.item_quantity_sold), SUM({LINE_TOTAL})
+                FROM transactions t
+                JOIN transaction_details td ON td.transaction_id = t.transaction_id
+                WHERE t.order_timestamp >= %(lo)s AND t.order_timestamp < %(hi)s
+                  AND ((td.order_timestamp >= %(lo)s AND td.order_timestamp < %(hi)s) OR td.order_timestamp IS NULL)
+                  AND td.menu_item_id IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM sales_rollup_queue q WHERE q.transaction_id = t.transaction_id)
+                  AND t.employee_id IS NOT NULL
+                GROUP BY 1, 2, 3
+                ORDER BY 1, 2, 3
+            """,
+                {"lo": lo, "hi": hi},
+            )
+            _record_rebuilt(cur, lo, hi)
+        conn.commit()
+        chunks += 1
+        lo = hi
+
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO job_watermarks (name, position) VALUES (%s, %s)
+            ON CONFLICT (name) DO UPDATE SET position = EXCLUDED.position
+        """,
+            (COVERAGE_MARK, _to_epoch(start)),
+        )
+    conn.commit()
+    return chunks
+
+
+def backfill_line_totals(conn, batch_size=2000, pause=0.0):
+    """
+    Records unit price and line total on transaction_details rows that predate them.
+
+    Rows are priced at the current menu price, which is what the reports
+    charged them at until now. Works through transaction IDs `batch_size` at a
+    time, each batch in its own short transaction, so only a batch's rows are
+    locked at once and orders keep flowing. Rerun rebuild_rollups() afterwards
+    so the rollups store the revenue too.
+
+    Args:
+        conn: Database connection not currently in a transaction
+        batch_size: Transaction IDs covered per batch
+        pause: Seconds to sleep between batches to limit the load
+
+    Returns:
+        int: Number of transaction_details rows updated
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT MIN(transaction_id), MAX(transaction_id) FROM transaction_details WHERE line_total IS NULL")
+        lo, last = cur.fetchone()
+    conn.commit()
+
+    updated = 0
+    while lo is not None and lo <= last:
+        hi = lo + batch_size
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE transaction_details td
+                SET unit_price = mi.price,
+                    line_total = mi.price::numeric * td.item_quantity_sold
+                FROM menu_items mi
+                WHERE mi.menu_item_id = td.menu_item_id
+                  AND td.transaction_id >= %(lo)s AND td.transaction_id < %(hi)s
+                  AND td.line_total IS NULL
+            """,
+                {"lo": lo, "hi": hi},
+            )
+            updated += cur.rowcount
+        conn.commit()
+        lo = hi
+        if pause:
+            time.sleep(pause)
+    return updated
+
+
+def rollup_coverage(cur, mark=COVERAGE_MARK):
+    """
+    Returns the first hour from which the rollups are complete.
+
+    Args:
+        cur: Database cursor
+        mark: Coverage mark to read
+
+    Returns:
+        datetime: First covered hour, or None if the rollups were never built
+    """
+    cur.execute("SELECT position FROM job_watermarks WHERE name = %s", (mark,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    position = row["position"] if isinstance(row, dict) else row[0]
+    return datetime(1970, 1, 1) + timedelta(seconds=position)
+
+
+def floor_hour(value):
+    """Truncates a datetime to the start of its hour."""
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(value):
+    """Rounds a datetime up to the next hour boundary (unchanged if already on one)."""
+    floored = floor_hour(value)
+    return floored if floored == value else floored + timedelta(hours=1)
+
+
+def _to_epoch(value):
+    return math.floor((value - datetime(1970, 1, 1)).total_seconds())
+
+
+def parse_bound(value):
+    """
+    Parses a report range bound such as "2024-11-01" or "2024-11-01T13:30:00".
+
+    Args:
+        value: Query string value
+
+    Returns:
+        datetime: Naive datetime, or None if the value cannot be split on hour
+            boundaries in Python (missing, unparseable or carrying a UTC offset)
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo is None else None
+
+
+def split_hours(start, end, coverage, use_rollups=True):
+    """
+    Splits [start, end] into whole covered hours and raw edges.
+
+    Args:
+        start: Range start, as a datetime or the raw query string value
+        end: Range end, as a datetime or the raw query string value
+        coverage: First hour a precomputed table covers, or None
+        use_rollups: Whether precomputed hours may be used at all
+
+    Returns:
+        tuple: (h1, h2) such that [h1, h2) holds only whole covered hours
+            and [start, h1) and [h2, end] must be read raw; h1 == h2 == start
+            when nothing can be read precomputed
+    """
+    if (
+        use_rollups
+        and coverage is not None
+        and isinstance(start, datetime)
+        and isinstance(end, datetime)
+    ):
+        lo = max(ceil_hour(start), coverage)
+        hi = floor_hour(end)
+        if lo < hi:
+            return lo, hi
+    return start, start
+
+
+def raw_facts(start, end, h1, h2, end_inclusive=True, by_employee=False):
+    """
+    Builds a subquery of units sold and revenue on the raw edges [start, h1) and [h2, end].
+
+    Args:
+        start: Range start, as a datetime or the raw query string value
+        end: Range end, as a datetime or the raw query string value
+        h1: End of the leading edge, from split_hours()
+        h2: Start of the trailing edge, from split_hours()
+        end_inclusive: Whether rows stamped exactly at `end` are included
+        by_employee: Include employee_id
+
+    Returns:
+        tuple: (sql, params) yielding (hour, [employee_id,] menu_item_id, quantity, revenue)
+    """
+    end_operator = "<=" if end_inclusive else "<"
+    sql = f"""
+        SELECT DATE_TRUNC('hour', t.order_timestamp) AS hour,
+               {"t.employee_id, " if by_employee else ""}td.menu_item_id,
+               td.item_quantity_sold AS quantity,
+               {LINE_TOTAL} AS revenue
+        FROM transactions t
+        JOIN transaction_details td ON t.transaction_id = td.transaction_id
+        WHERE ((t.order_timestamp >= %(start)s AND t.order_timestamp < %(h1)s)
+            OR (t.order_timestamp >= %(h2)s AND t.order_timestamp {end_operator} %(end)s))
+          AND ((td.order_timestamp >= %(start)s AND td.order_timestamp < %(h1)s)
+            OR (td.order_timestamp >= %(h2)s AND td.order_timestamp {end_operator} %(end)s)
+            OR td.order_timestamp IS NULL)
+    """
+    return sql, {"start": start, "end": end, "h1": h1, "h2": h2}
+
+
+def sales_facts(start, end, coverage, use_rollups=True, end_inclusive=True, by_employee=False):
+    """
+    Builds a subquery of units sold and revenue in [start, end] from rollups plus raw edges.
+
+    The subquery yields columns (hour, menu_item_id, quantity, revenue), plus
+    employee_id when `by_employee` is set. Whole hours inside the range that
+    are covered by the rollups are read from the rollup table, plus the raw
+    rows of orders in those hours that are still in sales_rollup_queue; the
+    partial hours at either edge, and anything before the coverage start, are
+    read from transactions and transaction_details. Being a single statement,
+    it sees every order as either folded or queued, never both. With
+    `use_rollups` off, or bounds that cannot be parsed, the whole range is read
+    raw, which is exactly the original report query.
+
+    The range is repeated on transaction_details.order_timestamp so that,
+    once both tables are partitioned by month (see partitioning.py), the
+    planner only reads the partitions inside the range. Order lines are
+    joined on transaction_id alone, and lines whose order time was never
+    copied (order_timestamp NULL, see backfill_order_timestamps) pass the
+    range check too, so they are counted rather than dropped.
+
+    Args:
+        start: Range start, as a datetime or the raw query string value
+        end: Range end, as a datetime or the raw query string value
+        coverage: First hour the rollups cover, from rollup_coverage()
+        use_rollups: Read covered whole hours from the rollup tables
+        end_inclusive: Whether rows stamped exactly at `end` are included
+        by_employee: Read the per-employee rollup and include employee_id
+
+    Returns:
+        tuple: (sql, params) for use as `FROM (<sql>) AS facts`
+    """
+    h1, h2 = split_hours(start, end, coverage, use_rollups)
+    raw, params = raw_facts(start, end, h1, h2, end_inclusive, by_employee)
+    employee_column = "employee_id, " if by_employee else ""
+    rollup_table = "sales_hourly_employees" if by_employee else "sales_hourly_items"
+
+    sql = f"""
+        SELECT hour, {employee_column}menu_item_id, quantity, {ROLLUP_REVENUE} AS revenue
+        FROM {rollup_table} r
+        WHERE hour >= %(h1)s AND hour < %(h2)s
+        UNION ALL
+        SELECT DATE_TRUNC('hour', t.order_timestamp) AS hour,
+               {"t.employee_id, " if by_employee else ""}td.menu_item_id,
+               td.item_quantity_sold AS quantity,
+               {LINE_TOTAL} AS revenue
+        FROM sales_rollup_queue q
+        JOIN transactions t ON t.transaction_id = q.transaction_id
+        JOIN transaction_details td ON td.transaction_id = t.transaction_id
+        WHERE t.order_timestamp >= %(h1)s AND t.order_timestamp < %(h2)s
+        UNION ALL
+        {raw.strip()}
+    """
+    return sql, params
@@ -1,12 +1,210 @@
 from flask import request, jsonify, Blueprint
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from datetime import datetime
-from .database import get_db_connection
-import math
+from .database import get_db_connection, run_transaction
+from .catalog import get_catalog
+from .group_commit import (
+    GROUP_COMMIT,
+    GROUP_COMMIT_MAX_BATCH,
+    GROUP_COMMIT_WINDOW_MS,
+    GroupCommitter,
+)
+from .rollups import queue_order_rollups
+from .live_sales import notify_sales
+from .points import (
+    apply_points,
+    apply_points_batch,
+    balance_cache,
+    lock_balances,
+    points_earned,
+)
+from .idempotency import (
+    MAX_KEY_LENGTH,
+    KeyReuseError,
+    claim_key,
+    record_response,
+    request_fingerprint,
+)
+import os
 
 transactions_bp = Blueprint("transactions", __name__, url_prefix="/api/transactions")
 
+BULK_MAX_ORDERS = int(os.getenv("BULK_MAX_ORDERS", "1000"))
+
+ORDER_FIELDS = ("items", "customer", "customer_id", "employee", "total_price", "discount_points")
+
+
+def _required_stock(catalog, items):
+    """
+    Expands an order's recipes into the total amount needed per ingredient.
+
+    Args:
+        catalog: CatalogSnapshot used to resolve the menu items
+        items: Dictionary of menu item name to quantity ordered
+
+    Returns:
+        dict: Ingredient ID to total amount required
+
+    Raises:
+        psycopg2.DatabaseError: If a menu item is not in the catalog
+    """
+    missing = [name for name in items if catalog.get(name) is None]
+    if missing:
+        raise psycopg2.DatabaseError(f"Unknown menu items: {', '.join(missing)}")
+
+    required = {}
+    for name, quantity in items.items():
+        for ingredient_id, ingredient_amount in catalog.get(name).recipe:
+            required[ingredient_id] = required.get(ingredient_id, 0) + ingredient_amount * quantity
+    return required
+
+
+def _deduct_stock(cur, required):
+    """
+    Deducts stock for every ingredient in one conditional statement.
+
+    The affected rows are locked in ascending ingredient_id order before any
+    of them is updated, so overlapping orders always queue for the same rows
+    in the same order instead of deadlocking. The sufficiency check is part
+    of the UPDATE itself and is re-evaluated against the latest committed
+    stock once the lock is granted. Rows that would go negative are left
+    untouched and reported back, so the caller can reject the order and roll
+    back. Ingredients without a row in the ingredients table are ignored.
+
+    Args:
+        cur: Cursor inside an open transaction
+        required: Dictionary of ingredient ID to amount to deduct
+
+    Returns:
+        list: IDs of the ingredients with insufficient stock, empty on success
+    """
+    if not required:
+        return []
+
+    ingredient_ids = sorted(required)
+    amounts = [required[ingredient_id] for ingredient_id in ingredient_ids]
+    cur.execute(
+        """
+        WITH required AS (
+            SELECT * FROM unnest(%s::int[], %s::numeric[]) AS r(ingredient_id, amount)
+        ),
+        locked AS (
+            SELECT i.ingredient_id
+            FROM ingredients i
+            JOIN required r ON r.ingredient_id = i.ingredient_id
+            ORDER BY i.ingredient_id
+            FOR UPDATE OF i
+        ),
+        updated AS (
+            UPDATE ingredients i SET stock = i.stock - r.amount
+            FROM required r
+            JOIN locked l ON l.ingredient_id = r.ingredient_id
+            WHERE i.ingredient_id = r.ingredient_id AND i.stock >= r.amount
+            RETURNING i.ingredient_id
+        )
+        SELECT l.ingredient_id
+        FROM locked l
+        WHERE l.ingredient_id NOT IN (SELECT ingredient_id FROM updated)
+        ORDER BY l.ingredient_id
+    """,
+        (ingredient_ids, amounts),
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def _line_total(price, quantity):
+    """Returns a line's total at a menu price, or None if the item has no price."""
+    return None if price is None else price * quantity
+
+
+def _order_amount(catalog, items):
+    """Returns an order's sales value at current menu prices, as the reports count it."""
+    return sum(float(catalog.get(name).price or 0) * quantity for name, quantity in items.items())
+
+
+def _place_order(cur, order, catalog):
+    """
+    Writes one order using a fixed number of statements, regardless of basket size.
+
+    Menu items, prices and recipes come from the catalog snapshot, every
+    ingredient is deducted in a single conditional UPDATE, all
+    transaction_details rows are inserted together with the unit price and
+    line total they were sold at, the loyalty points change is applied and
+    recorded in the points ledger with one statement, and the order is queued
+    for the hourly sales rollups and announced to live dashboards.
+    Any failure raises, so the caller's transaction rolls back as a unit.
+
+    Args:
+        cur: Cursor inside an open transaction
+        order: Dictionary with the same keys as the /create request body
+        catalog: CatalogSnapshot used to resolve menu items and recipes
+
+    Returns:
+        tuple: (transaction_id, balance) where balance is the customer's new
+            (current_points, total_points, ledger_id), or None for guest orders
+
+    Raises:
+        psycopg2.DatabaseError: If a menu item is unknown, stock is insufficient
+            or the customer cannot cover the redeemed points
+    """
+    items = order["items"]
+    total_price = order["total_price"]
+    customer_id = order["customer_id"]
+
+    required = _required_stock(catalog, items)
+
+    cur.execute(
+        "SELECT employee_id FROM employees WHERE employee_name = %s",
+        (order["employee"],),
+    )
+    employee_id = cur.fetchone()
+    if employee_id:
+        employee_id = employee_id[0]
+
+    short = _deduct_stock(cur, required)
+    if short:
+        raise psycopg2.DatabaseError(
+            f"Insufficient stock for ingredient IDs: {', '.join(map(str, short))}"
+        )
+
+    order_timestamp = datetime.now()
+    cur.execute(
+        """
+        INSERT INTO transactions (customer, price, order_timestamp, employee_id, customer_id) 
+        VALUES (%s, %s, %s, %s, %s) RETURNING transaction_id
+    """,
+        (order["customer"], total_price, order_timestamp, employee_id, customer_id),
+    )
+    transaction_id = cur.fetchone()[0]
+
+    balance = apply_points(
+        cur, customer_id, transaction_id, points_earned(total_price), order["discount_points"]
+    )
+
+    cur.execute(
+        """
+        INSERT INTO transaction_details
+            (transaction_id, menu_item_id, item_quantity_sold, order_timestamp, unit_price, line_total)
+        SELECT %s, o.menu_item_id, o.quantity, %s, o.unit_price, o.unit_price * o.quantity
+        FROM unnest(%s::int[], %s::int[], %s::numeric[]) AS o(menu_item_id, quantity, unit_price)
+    """,
+        (
+            transaction_id,
+            order_timestamp,
+            [catalog.get(name).menu_item_id for name in items],
+            list(items.values()),
+            [catalog.get(name).price for name in items],
+        ),
+    )
+    queue_order_rollups(cur, [transaction_id])
+    notify_sales(
+        cur,
+        [(order_timestamp, order["employee"] if employee_id else None, _order_amount(catalog, items))],
+    )
+
+    return transaction_id, balance
+
 
 @transactions_bp.route("/create", methods=["POST"])
 def create_transaction():
@@ -21,146 +219,374 @@ def create_transaction():
     - total_price: Total price of the transaction
     - discount_points: Points to be discounted from the customer's account
 
+    When GROUP_COMMIT is enabled, requests without an Idempotency-Key are
+    committed together with other orders arriving in the same short window;
+    each still gets its own transaction ID or error.
+
+    Headers:
+    - Idempotency-Key (optional): Client-chosen unique key for this order. A
+      retry with the same key returns the original response without placing
+      the order again; concurrent requests with the same key wait for each other.
+
     Returns:
     - JSON response with a message and transaction ID if successful
-    - None if the transaction fails
+    - JSON response with an error message and HTTP 400 if the Idempotency-Key is invalid
+    - JSON response with an error message and HTTP 400 if a group-committed order is malformed
+      or names an unknown menu item
+    - JSON response with an error message and HTTP 422 if the Idempotency-Key was used for a different order
+    - JSON response with an error message and HTTP 500 if the transaction fails
     """
 
     data = request.json
-    items = data["items"]
-    customer = data["customer"]
-    employee = data["employee"]
-    customer_id = data["customer_id"]
-    total_price = data["total_price"]
-    discount_points = data["discount_points"]
+    idempotency_key = request.headers.get("Idempotency-Key")
 
-    try:
-        with get_db_connection() as conn:
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+        return jsonify({"error": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"}), 400
 
-            with conn.cursor() as cur:
+    def place(conn):
+        with conn.cursor() as cur:
+            if idempotency_key is not None:
+                replay = claim_key(cur, idempotency_key, fingerprint)
+                if replay is not None:
+                    return replay + (True, None)
 
-                # get employee ID
-                cur.execute(
-                    "SELECT employee_id FROM employees WHERE employee_name = %s",
-                    (employee,),
-                )
-                employee_id = cur.fetchone()
-                if employee_id:
-                    employee_id = employee_id[0]
-                print(f"Retrieved employeeId: {employee_id}")
-
-                # calculate total price with given menu item input
-                # for menu_item, quantity in items.items():
-                #     cur.execute("SELECT price FROM menu_items WHERE menu_item_name = %s", (menu_item,))
-                #     price_result = cur.fetchone()
-                #     if price_result:
-                #         total_price += price_result[0] * quantity
-
-                points = math.floor(total_price) * 10
-                cur.execute(
-                    "UPDATE users SET total_points = total_points + %s WHERE id = %s",
-                    (
-                        points,
-                        customer_id,
-                    ),
-                )
-                cur.execute(
-                    "UPDATE users SET current_points = current_points + %s WHERE id = %s",
-                    (
-                        points,
-                        customer_id,
-                    ),
-                )
-                cur.execute(
-                    "UPDATE users SET current_points = current_points - %s WHERE id = %s", 
-                    (
-                        discount_points,
-                        customer_id,
-                    )
-                )
+            transaction_id, balance = _place_order(cur, data, catalog)
+            body = {"message": "Transaction created", "transaction_id": transaction_id}
 
-                # insert the transaction
-                cur.execute(
-                    """
-                    INSERT INTO transactions (customer, price, order_timestamp, employee_id, customer_id) 
-                    VALUES (%s, %s, %s, %s, %s) RETURNING transaction_id
-                """,
-                    (customer, total_price, datetime.now(), employee_id, customer_id),
-                )
-                transaction_id = cur.fetchone()[0]
-                # print(f"Retrieved TransactionID: {transaction_id}")
-
-                # process each menu item
-                for menu_item, quantity in items.items():
-                    # get menu item ID
-                    cur.execute(
-                        "SELECT menu_item_id FROM menu_items WHERE menu_item_name = %s",
-                        (menu_item,),
-                    )
-                    menu_item_id = cur.fetchone()
-                    if menu_item_id:
-                        menu_item_id = menu_item_id[0]
-                    print(f"Retrieved the Menu Item ID for {menu_item}: {menu_item_id}")
-
-                    # get ingredients for menu item
-                    cur.execute(
-                        """
-                        SELECT ingredient_id, ingredient_amount FROM menu_items_ingredients 
-                        WHERE menu_item_id = %s
-                    """,
-                        (menu_item_id,),
-                    )
-                    ingredient_results = cur.fetchall()
-
-                    for ingredient_id, ingredient_amount in ingredient_results:
-                        # check stock level
-                        cur.execute(
-                            "SELECT stock FROM ingredients WHERE ingredient_id = %s",
-                            (ingredient_id,),
-                        )
-                        stock_result = cur.fetchone()
-                        if stock_result:
-                            current_stock = stock_result[0]
-                            required_stock = quantity * ingredient_amount
-
-                            # update inventory if stock is sufficient
-                            if current_stock >= required_stock:
-                                cur.execute(
-                                    """
-                                    UPDATE ingredients SET stock = stock - %s 
-                                    WHERE ingredient_id = %s
-                                """,
-                                    (required_stock, ingredient_id),
-                                )
-                                print(
-                                    f"Updated inventory for ingredient ID: {ingredient_id}"
-                                )
-
-                            else:
-                                raise psycopg2.DatabaseError(
-                                    f"Insufficient stock for ingredient ID: {ingredient_id}"
-                                )
-
-                    # insert transaction details
-                    cur.execute(
-                        """
-                        INSERT INTO transaction_details (transaction_id, menu_item_id, item_quantity_sold) 
-                        VALUES (%s, %s, %s)
-                    """,
-                        (transaction_id, menu_item_id, quantity),
-                    )
-                    print(
-                        f"Inserted into transaction_details for menu item: {menu_item}"
-                    )
+            if idempotency_key is not None:
+                record_response(cur, idempotency_key, transaction_id, 201, body)
+            return 201, body, False, balance
 
+    try:
+        if GROUP_COMMIT and idempotency_key is None:
+            result = _group_committer.submit(data)
+            if "error" in result:
+                print(f"Transaction failed: {result['error']}")
+                return jsonify(result), 400 if result.get("invalid") else 500
+            body = {"message": "Transaction created", "transaction_id": result["transaction_id"]}
+            return jsonify(body), 201
+
+        catalog = get_catalog()
+        fingerprint = request_fingerprint(data) if idempotency_key is not None else None
+        status_code, body, replayed, balance = run_transaction(place)
+        if balance is not None:
+            balance_cache.put(data["customer_id"], *balance)
+
+    except KeyReuseError as e:
+        return jsonify({"error": str(e)}), 422
     except psycopg2.Error as e:
-        conn.rollback()
         print(f"Transaction failed: {e}")
-        return None
+        return jsonify({"error": str(e)}), 500
 
+    response = jsonify(body)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return response, status_code
+
+
+def _validate_order(order, catalog):
+    """
+    Checks that an order is well formed and only references known menu items.
+
+    Args:
+        order: Dictionary with the same keys as the /create request body
+        catalog: CatalogSnapshot used to resolve menu items
+
+    Returns:
+        str: Description of the first problem found, or None if the order is valid
+    """
+    if not isinstance(order, dict):
+        return "Order must be a JSON object"
+    missing = [field for field in ORDER_FIELDS if field not in order]
+    if missing:
+        return f"Missing fields: {', '.join(missing)}"
+    if not isinstance(order["total_price"], (int, float)) or isinstance(order["total_price"], bool):
+        return "total_price must be a number"
+    if not isinstance(order["discount_points"], int) or isinstance(order["discount_points"], bool):
+        return "discount_points must be an integer"
+    items = order["items"]
+    if not isinstance(items, dict) or not items:
+        return "items must be a non-empty object of menu item name to quantity"
+    for name, quantity in items.items():
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+            return f"Invalid quantity for {name}"
+        if catalog.get(name) is None:
+            return f"Unknown menu item: {name}"
+    if order.get("order_timestamp") is not None:
+        try:
+            datetime.fromisoformat(order["order_timestamp"])
+        except (TypeError, ValueError):
+            return "order_timestamp must be an ISO 8601 string"
+    return None
+
+
+def _place_orders(cur, orders, catalog):
+    """
+    Writes a batch of validated orders with a fixed number of statements.
+
+    The ingredient and customer rows the batch needs are locked once, stock
+    and points are allocated to the orders in submission order, and orders
+    that would overdraw an ingredient or a points balance are rejected
+    individually. The accepted orders are then written with one aggregated
+    stock UPDATE, one multi-row insert each into transactions,
+    transaction_details, points_ledger and the rollup queue, and one balance
+    UPDATE, and announced with one live sales notification.
+
+    Args:
+        cur: Cursor inside an open transaction
+        orders: List of (index, order) pairs that passed _validate_order()
+        catalog: CatalogSnapshot used to resolve menu items and recipes
+
+    Returns:
+        tuple: (results, balances) where results maps order index to either
+            {"transaction_id": int} or {"error": str}, and balances maps user
+            ID to the new (current_points, total_points, ledger_id)
+    """
+    results = {}
+    if not orders:
+        return results, {}
+
+    needs = [(index, order, _required_stock(catalog, order["items"])) for index, order in orders]
+    ingredient_ids = sorted({ingredient_id for _, _, required in needs for ingredient_id in required})
+
+    stock = {}
+    if ingredient_ids:
+        cur.execute(
+            """
+            SELECT ingredient_id, stock FROM ingredients
+            WHERE ingredient_id = ANY(%s)
+            ORDER BY ingredient_id
+            FOR UPDATE
+        """,
+            (ingredient_ids,),
+        )
+        stock = dict(cur.fetchall())
+
+    balances = lock_balances(cur, [order["customer_id"] for _, order in orders])
+
+    accepted = []
+    deductions = {}
+    for index, order, required in needs:
+        short = sorted(
+            ingredient_id
+            for ingredient_id, amount in required.items()
+            if ingredient_id in stock and stock[ingredient_id] < amount
+        )
+        if short:
+            results[index] = {
+                "error": f"Insufficient stock for ingredient IDs: {', '.join(map(str, short))}"
+            }
+            continue
+        customer_id = order["customer_id"]
+        if customer_id in balances:
+            remaining = balances[customer_id] + points_earned(order["total_price"]) - order["discount_points"]
+            if remaining < 0:
+                results[index] = {"error": f"Insufficient points for user ID: {customer_id}"}
+                continue
+            balances[customer_id] = remaining
+        for ingredient_id, amount in required.items():
+            if ingredient_id in stock:
+                stock[ingredient_id] -= amount
+                deductions[ingredient_id] = deductions.get(ingredient_id, 0) + amount
+        accepted.append((index, order))
+
+    if not accepted:
+        return results, {}
+
+    # the rows are locked and allocation was checked above, so this cannot come up short
+    _deduct_stock(cur, deductions)
+
+    employee_names = list({order["employee"] for _, order in accepted})
+    cur.execute(
+        "SELECT employee_name, employee_id FROM employees WHERE employee_name = ANY(%s)",
+        (employee_names,),
+    )
+    employee_ids = dict(cur.fetchall())
+
+    # reserve the IDs up front so each order is matched to its own row
+    cur.execute(
+        """
+        SELECT nextval(pg_get_serial_sequence('transactions', 'transaction_id'))
+        FROM generate_series(1, %s)
+    """,
+        (len(accepted),),
+    )
+    transaction_ids = [row[0] for row in cur.fetchall()]
+
+    now = datetime.now()
+    execute_values(
+        cur,
+        """
+        INSERT INTO transactions (transaction_id, customer, price, order_timestamp, employee_id, customer_id)
+        VALUES %s
+    """,
+        [
+            (
+                transaction_id,
+                order["customer"],
+                order["total_price"],
+                order.get("order_timestamp") or now,
+                employee_ids.get(order["employee"]),
+                order["customer_id"],
+            )
+            for transaction_id, (_, order) in zip(transaction_ids, accepted)
+        ],
+        page_size=1000,
+    )
+    execute_values(
+        cur,
+        """
+        INSERT INTO transaction_details
+            (transaction_id, menu_item_id, item_quantity_sold, order_timestamp, unit_price, line_total)
+        VALUES %s
+    """,
+        [
+            (
+                transaction_id,
+                catalog.get(name).menu_item_id,
+                quantity,
+                order.get("order_timestamp") or now,
+                catalog.get(name).price,
+                _line_total(catalog.get(name).price, quantity),
+            )
+            for transaction_id, (_, order) in zip(transaction_ids, accepted)
+            for name, quantity in order["items"].items()
+        ],
+        page_size=1000,
+    )
+    queue_order_rollups(cur, transaction_ids)
+    notify_sales(
+        cur,
+        [
+            (
+                order.get("order_timestamp") or now,
+                order["employee"] if order["employee"] in employee_ids else None,
+                _order_amount(catalog, order["items"]),
+            )
+            for _, order in accepted
+        ],
+    )
+
+    new_balances = apply_points_batch(
+        cur,
+        [
+            (
+                order["customer_id"],
+                transaction_id,
+                points_earned(order["total_price"]),
+                order["discount_points"],
+            )
+            for transaction_id, (_, order) in zip(transaction_ids, accepted)
+            if order["customer_id"] in balances
+        ],
+    )
+
+    for transaction_id, (index, _) in zip(transaction_ids, accepted):
+        results[index] = {"transaction_id": transaction_id}
+    return results, new_balances
+
+
+def _commit_batch(orders):
+    """
+    Validates and writes a list of orders in one database transaction.
+
+    Shared by the bulk endpoint and group commit. Invalid orders and orders
+    that would overdraw stock fail individually; the rest are committed together.
+
+    Args:
+        orders: List of orders with the same fields as the /create request body
+
+    Returns:
+        list: One result per order, in the same order, holding either
+            {"transaction_id": int} or {"error": str}; orders rejected by
+            _validate_order() also carry "invalid": True
+
+    Raises:
+        psycopg2.Error: If the batch as a whole could not be written
+    """
+    catalog = get_catalog()
+    results = {}
+    valid = []
+    for index, order in enumerate(orders):
+        error = _validate_order(order, catalog)
+        if error:
+            results[index] = {"error": error, "invalid": True}
+        else:
+            valid.append((index, order))
+
+    def place(conn):
+        with conn.cursor() as cur:
+            return _place_orders(cur, valid, catalog)
+
+    placed, balances = run_transaction(place)
+    balance_cache.update(balances)
+    results.update(placed)
+    return [results[index] for index in range(len(orders))]
+
+
+_group_committer = GroupCommitter(
+    _commit_batch, GROUP_COMMIT_WINDOW_MS / 1000, GROUP_COMMIT_MAX_BATCH
+)
+
+
+def group_commit_stats():
+    """
+    Returns batching statistics for the group commit path.
+
+    Returns:
+        dict: See GroupCommitter.stats()
+    """
+    return _group_committer.stats()
+
+
+@transactions_bp.route("/bulk", methods=["POST"])
+def create_transactions_bulk():
+    """
+    Creates many transactions at once, e.g. when a kiosk replays orders queued while offline.
+
+    Orders are validated against the menu catalog and written in a single
+    database transaction using multi-row inserts and one stock deduction per
+    ingredient. An order that is invalid or would overdraw stock is reported
+    as failed without affecting the rest of the batch.
+
+    Input JSON:
+    - orders: List of orders, each with the same fields as /create plus an
+      optional order_timestamp (ISO 8601) recording when it was taken
+
+    Returns:
+    - JSON response with created/failed counts and one result per order, in
+      submission order, holding either a transaction_id or an error (with
+      "invalid": true when the order itself is malformed)
+    - HTTP 400 if the batch is malformed or larger than BULK_MAX_ORDERS
+    - HTTP 500 if the batch could not be written
+    """
+
+    data = request.json or {}
+    orders = data.get("orders") if isinstance(data, dict) else None
+
+    if not isinstance(orders, list):
+        return jsonify({"error": "orders must be a list"}), 400
+    if len(orders) > BULK_MAX_ORDERS:
+        return jsonify({"error": f"At most {BULK_MAX_ORDERS} orders per batch"}), 400
+
+    try:
+        results = _commit_batch(orders)
+    except psycopg2.Error as e:
+        print(f"Bulk transaction failed: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    ordered = [dict(result, index=index) for index, result in enumerate(results)]
+    created = sum(1 for result in ordered if "transaction_id" in result)
     return (
-        jsonify({"message": "Transaction created", "transaction_id": transaction_id}),
-        201,
+        jsonify(
+            {
+                "message": "Bulk transactions processed",
+                "created": created,
+                "failed": len(ordered) - created,
+                "results": ordered,
+            }
+        ),
+        200,
     )
 
 
@@ -182,20 +608,13 @@ def get_price():
     price = 0
 
     try:
-
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                for menu_item, quantity in items.items():
-                    cur.execute(
-                        "SELECT price FROM menu_items WHERE menu_item_name = %s",
-                        (menu_item,),
-                    )
-                    price_result = cur.fetchone()
-                    if price_result:
-                        price += price_result[0] * quantity
+        catalog = get_catalog()
+        for menu_item, quantity in items.items():
+            entry = catalog.get(menu_item)
+            if entry:
+                price += entry.price * quantity
 
     except psycopg2.Error as e:
-        conn.rollback()
         print(f"Unable to get price with error: {e}")
 
     return jsonify({"message": "Price calculated", "price": price}), 200
@@ -206,6 +625,10 @@ def get_points():
     """
     Retrieves the current and total points for a user.
 
+    Served from the per-worker balance cache when possible; order placement
+    keeps the cache up to date after each commit, and orders placed through
+    other workers show up within POINTS_CACHE_TTL seconds.
+
     Query Parameters:
     - user_id: ID of the user
 
@@ -213,16 +636,29 @@ def get_points():
     - JSON response with the current and total points of the user
     """
 
-    user_id = request.args.get("user_id")
+    user_id = request.args.get("user_id", type=int)
+
+    cached = balance_cache.get(user_id)
+    if cached is not None:
+        return jsonify([{"current_points": cached[0], "total_points": cached[1]}]), 200
 
     try:
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute(
-                    "SELECT current_points, total_points FROM users WHERE id = %s", (user_id,)
+                    """
+                    SELECT current_points, total_points,
+                           (SELECT MAX(id) FROM points_ledger WHERE user_id = %(user_id)s) AS ledger_id
+                    FROM users
+                    WHERE id = %(user_id)s
+                """,
+                    {"user_id": user_id},
                 )
-                points = cur.fetchall()
-        return jsonify(points), 200
+                row = cur.fetchone()
+        if row is None:
+            return jsonify([]), 200
+        balance_cache.put(user_id, row["current_points"], row["total_points"], row["ledger_id"])
+        return jsonify([{"current_points": row["current_points"], "total_points": row["total_points"]}]), 200
     except psycopg2.Error as e:
         print(f"Error getting points: {e}")
         return jsonify({"error": "Error getting the list of allergens"}), 500
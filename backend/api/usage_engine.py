@@ -0,0 +1,271 @@
+"""
+Ingredient Usage Engine Module
+
+This module computes ingredient usage with NumPy instead of joining every sold
+line against the recipes in SQL. Each worker process keeps a dense
+menu item x ingredient recipe matrix; a report reads only the units sold per
+menu item for its range (one grouped query over sales_facts(), so mostly
+rollup rows) and multiplies that vector by the matrix.
+
+usage_series() handles many ranges at once: it reads units sold per
+(bucket, menu item) for the whole span in one query and turns the resulting
+bucket x menu item matrix into bucket x ingredient usage with a single matrix
+multiply, e.g. daily usage over 90 days for inventory planning charts.
+
+The matrix is tagged with the shared menu version counter
+(catalog.bump_menu_version) and rebuilt once that counter moves, so recipe
+edits made through any worker are picked up by the next report.
+
+Ingredients sharing a name share a column, matching the SQL report, which
+groups by ingredient name. Usage is summed in float64 rather than numeric, so
+totals can differ from the SQL join in the last few digits.
+
+NumPy is optional: without it usage_engine_enabled() is False and the reports
+blueprint keeps using the SQL join.
+
+Optional Settings:
+    - USAGE_ENGINE: Set to "sql" to always use the SQL join (defaults to "numpy")
+    - USAGE_SERIES_MAX_BUCKETS: Most buckets one series request may span (defaults to 5000)
+"""
+
+import os
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .catalog import MENU_VERSION_MARK
+from .rollups import sales_facts
+
+USAGE_ENGINE = os.getenv("USAGE_ENGINE", "numpy").lower()
+USAGE_SERIES_MAX_BUCKETS = int(os.getenv("USAGE_SERIES_MAX_BUCKETS", "5000"))
+
+# DATE_TRUNC fields usage_series() can bucket by, with their (shortest) length in seconds
+BUCKETS = {"hour": 3600, "day": 86400, "week": 7 * 86400, "month": 28 * 86400}
+
+
+def usage_engine_enabled():
+    """Returns whether usage reports should be computed with NumPy."""
+    return np is not None and USAGE_ENGINE == "numpy"
+
+
+class RecipeMatrix:
+    """
+    Dense recipe matrix for one menu version.
+
+    Attributes:
+        version: Menu version counter value the matrix was read at
+        item_index: Dictionary of menu item ID to row
+        ingredient_names: Ingredient name of each column
+        amounts: float64 array (items x ingredients) of amount per unit sold
+        listed: bool array (items x ingredients), True where the recipe lists
+            the ingredient, even with a zero or missing amount
+    """
+
+    __slots__ = ("version", "item_index", "ingredient_names", "amounts", "listed")
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.item_index = {}
+        columns = {}
+        for menu_item_id, ingredient_name, _ in rows:
+            self.item_index.setdefault(menu_item_id, len(self.item_index))
+            columns.setdefault(ingredient_name, len(columns))
+        self.ingredient_names = list(columns)
+
+        self.amounts = np.zeros((len(self.item_index), len(columns)))
+        self.listed = np.zeros(self.amounts.shape, dtype=bool)
+        for menu_item_id, ingredient_name, amount in rows:
+            cell = (self.item_index[menu_item_id], columns[ingredient_name])
+            self.amounts[cell] += amount or 0.0
+            self.listed[cell] = True
+
+
+_lock = threading.Lock()
+_matrix = None
+
+
+def _menu_version(cur):
+    cur.execute(
+        "SELECT COALESCE((SELECT position FROM job_watermarks WHERE name = %s), 0) AS version",
+        (MENU_VERSION_MARK,),
+    )
+    return cur.fetchone()["version"]
+
+
+def load_recipe_matrix(cur, version=None):
+    """
+    Reads every recipe into a new RecipeMatrix.
+
+    Args:
+        cur: RealDictCursor
+        version: Menu version to tag the matrix with, read if not given
+
+    Returns:
+        RecipeMatrix: Matrix of the recipes visible to `cur`
+    """
+    if version is None:
+        version = _menu_version(cur)
+    cur.execute(
+        """
+        SELECT mii.menu_item_id, i.ingredient_name, mii.ingredient_amount::float8 AS amount
+        FROM menu_items_ingredients mii
+        JOIN menu_items m ON mii.menu_item_id = m.menu_item_id
+        JOIN ingredients i ON mii.ingredient_id = i.ingredient_id
+        ORDER BY mii.menu_item_id, i.ingredient_name;
+    """
+    )
+    rows = [(row["menu_item_id"], row["ingredient_name"], row["amount"]) for row in cur.fetchall()]
+    return RecipeMatrix(version, rows)
+
+
+def recipe_matrix(cur):
+    """
+    Returns this worker's recipe matrix, rebuilding it if the menu version moved.
+
+    The version is read before the recipes, so a menu edit committing in
+    between only causes one extra rebuild later, never a stale matrix.
+
+    Args:
+        cur: RealDictCursor
+
+    Returns:
+        RecipeMatrix: Matrix for the current menu version
+    """
+    global _matrix
+
+    version = _menu_version(cur)
+    matrix = _matrix
+    if matrix is not None and matrix.version == version:
+        return matrix
+    with _lock:
+        matrix = _matrix
+        if matrix is None or matrix.version != version:
+            matrix = load_recipe_matrix(cur, version)
+            # a reader on an older transaction snapshot must not replace a newer matrix
+            if _matrix is None or _matrix.version <= version:
+                _matrix = matrix
+    return matrix
+
+
+def _usage_columns(matrix, sold_items):
+    """Returns the columns the SQL join would report: ingredients listed by any sold item."""
+    present = np.zeros(len(matrix.item_index), dtype=bool)
+    present[sold_items] = True
+    return np.flatnonzero(matrix.listed[present].any(axis=0))
+
+
+def product_usage(cur, start, end, coverage, use_rollups=True):
+    """
+    Computes total ingredient usage in [start, end].
+
+    Args:
+        cur: RealDictCursor
+        start: Range start, as a datetime or the raw query string value
+        end: Range end, as a datetime or the raw query string value
+        coverage: First hour the rollups cover, from rollup_coverage()
+        use_rollups: Read covered whole hours from the rollup tables
+
+    Returns:
+        dict: Ingredient name to total usage, largest first
+    """
+    matrix = recipe_matrix(cur)
+    facts, params = sales_facts(start, end, coverage, use_rollups)
+    cur.execute(
+        f"""
+        SELECT f.menu_item_id, SUM(f.quantity)::float8 AS quantity
+        FROM ({facts}) AS f
+        GROUP BY f.menu_item_id;
+    """,
+        params,
+    )
+    rows = [
+        (matrix.item_index[row["menu_item_id"]], row["quantity"] or 0.0)
+        for row in cur.fetchall()
+        if row["menu_item_id"] in matrix.item_index
+    ]
+
+    sold = np.zeros(len(matrix.item_index))
+    items = [item for item, _ in rows]
+    sold[items] = [quantity for _, quantity in rows]
+    totals = sold @ matrix.amounts
+
+    columns = _usage_columns(matrix, items)
+    columns = columns[np.argsort(-totals[columns], kind="stable")]
+    return {matrix.ingredient_names[j]: float(totals[j]) for j in columns}
+
+
+def bucket_starts(cur, start, end, bucket):
+    """
+    Lists the start of every `bucket` overlapping [start, end].
+
+    Args:
+        cur: RealDictCursor
+        start: Range start (datetime)
+        end: Range end (datetime)
+        bucket: One of BUCKETS
+
+    Returns:
+        list: Bucket starts as datetimes, in order
+    """
+    cur.execute(
+        """
+        SELECT generate_series(
+            DATE_TRUNC(%(bucket)s, %(start)s::timestamp), %(end)s::timestamp, ('1 ' || %(bucket)s)::interval
+        ) AS bucket;
+    """,
+        {"bucket": bucket, "start": start, "end": end},
+    )
+    return [row["bucket"] for row in cur.fetchall()]
+
+
+def usage_series(cur, start, end, coverage, use_rollups=True, bucket="day"):
+    """
+    Computes ingredient usage per time bucket across [start, end].
+
+    Args:
+        cur: RealDictCursor
+        start: Range start (datetime)
+        end: Range end (datetime)
+        coverage: First hour the rollups cover, from rollup_coverage()
+        use_rollups: Read covered whole hours from the rollup tables
+        bucket: One of BUCKETS
+
+    Returns:
+        dict: {"bucket": bucket, "buckets": [ISO start of each bucket],
+            "usage": {ingredient name: [usage per bucket]}}, with every
+            bucket in the range present, including empty ones
+    """
+    matrix = recipe_matrix(cur)
+    buckets = bucket_starts(cur, start, end, bucket)
+    bucket_index = {value: index for index, value in enumerate(buckets)}
+
+    facts, params = sales_facts(start, end, coverage, use_rollups)
+    cur.execute(
+        f"""
+        SELECT DATE_TRUNC(%(bucket)s, f.hour) AS bucket, f.menu_item_id, SUM(f.quantity)::float8 AS quantity
+        FROM ({facts}) AS f
+        GROUP BY 1, 2;
+    """,
+        dict(params, bucket=bucket),
+    )
+    rows = [
+        (bucket_index[row["bucket"]], matrix.item_index[row["menu_item_id"]], row["quantity"] or 0.0)
+        for row in cur.fetchall()
+        if row["menu_item_id"] in matrix.item_index and row["bucket"] in bucket_index
+    ]
+
+    sold = np.zeros((len(buckets), len(matrix.item_index)))
+    if rows:
+        b, i, q = zip(*rows)
+        sold[list(b), list(i)] = q
+    usage = sold @ matrix.amounts
+
+    columns = _usage_columns(matrix, sorted({item for _, item, _ in rows}))
+    return {
+        "bucket": bucket,
+        "buckets": [value.isoformat() for value in buckets],
+        "usage": {matrix.ingredient_names[j]: usage[:, j].tolist() for j in columns},
+    }
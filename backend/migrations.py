@@ -0,0 +1,266 @@
+"""
+Schema Migrations Module
+
+This module applies versioned schema changes that db.create_all() cannot
+express for tables the backend does not model, such as indexes on the
+original transactions and menu tables.
+
+Each migration has a version number and a list of SQL statements. Applied
+versions are recorded in schema_migrations, and pending migrations run in
+version order, each in its own transaction. A transaction-level advisory lock
+serializes runners, so several workers starting at once apply each migration
+exactly once. Statements are written to be idempotent (IF NOT EXISTS), so
+databases where an index was already created by hand migrate cleanly.
+
+Index builds on the order tables are concurrent migrations: they use CREATE
+INDEX CONCURRENTLY / DROP INDEX CONCURRENTLY, which cannot run inside a
+transaction block, so each statement runs on its own in autocommit mode under
+a session-level advisory lock. They never block order placement, but take
+longer, so they are only applied by `flask migrate`, never when the app
+starts. An index left invalid by an interrupted build is dropped and built
+again on the next run. Transactional migrations must not depend on a
+concurrent one.
+
+New migrations are appended to MIGRATIONS with the next version number;
+applied migrations are never edited.
+
+Optional Settings:
+    - DB_AUTO_MIGRATE: Set to "false" to skip migrating when the app starts;
+      run `flask migrate` instead (defaults to true). Concurrent migrations
+      always need `flask migrate`
+"""
+
+import os
+import re
+from collections import namedtuple
+
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() == "true"
+
+# arbitrary application-wide key for pg_advisory_xact_lock
+MIGRATION_LOCK_KEY = 720_331_001
+
+Migration = namedtuple("Migration", ["version", "description", "statements", "concurrent"], defaults=(False,))
+
+_CREATE_INDEX = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+_DROP_INDEX = re.compile(r"DROP\s+INDEX\s+CONCURRENTLY\s+IF\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+MIGRATIONS = [
+    Migration(
+        1,
+        "Index transactions by order time, customer and employee",
+        [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_order_timestamp ON transactions (order_timestamp)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_customer_id ON transactions (customer_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_employee_id ON transactions (employee_id)",
+        ],
+        concurrent=True,
+    ),
+    Migration(
+        2,
+        "Index transaction details by transaction and menu item",
+        [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transaction_details_transaction_id ON transaction_details (transaction_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transaction_details_menu_item_id ON transaction_details (menu_item_id)",
+        ],
+        concurrent=True,
+    ),
+    Migration(
+        3,
+        "Index menu items and employees by name",
+        [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_menu_items_menu_item_name ON menu_items (menu_item_name)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_employees_employee_name ON employees (employee_name)",
+        ],
+        concurrent=True,
+    ),
+    Migration(
+        4,
+        "Copy the order time onto transaction details so both tables can be partitioned by it",
+        [
+            # nullable and without a default, so only a catalog change; existing rows
+            # are filled in by `flask backfill-order-timestamps`
+            """
+            DO $$
+            BEGIN
+                EXECUTE format(
+                    'ALTER TABLE transaction_details ADD COLUMN IF NOT EXISTS order_timestamp %s',
+                    (SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+                     WHERE attrelid = 'transactions'::regclass AND attname = 'order_timestamp')
+                );
+            END
+            $$
+            """,
+        ],
+    ),
+    Migration(
+        5,
+        "Store the sold unit price and line total on transaction details and revenue on the rollups",
+        [
+            # nullable and without defaults, so only catalog changes
+            """
+            ALTER TABLE transaction_details
+                ADD COLUMN IF NOT EXISTS unit_price NUMERIC,
+                ADD COLUMN IF NOT EXISTS line_total NUMERIC
+            """,
+            "ALTER TABLE sales_hourly_items ADD COLUMN IF NOT EXISTS revenue NUMERIC",
+            "ALTER TABLE sales_hourly_employees ADD COLUMN IF NOT EXISTS revenue NUMERIC",
+        ],
+    ),
+    Migration(
+        6,
+        "Cover the raw report edge range scans with indexes on order time",
+        [
+            # let range scans for the raw report edges read only the indexes
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_order_timestamp_covering
+            ON transactions (order_timestamp, transaction_id) INCLUDE (employee_id)
+            """,
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transaction_details_order_timestamp_covering
+            ON transaction_details (order_timestamp, transaction_id)
+            INCLUDE (menu_item_id, item_quantity_sold, line_total)
+            """,
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_transactions_order_timestamp",
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_transaction_details_order_timestamp",
+        ],
+        concurrent=True,
+    ),
+    Migration(
+        7,
+        "Drop the hourly popularity sketches; the popularity report reads the hourly rollup",
+        [
+            "DROP TABLE IF EXISTS sales_hourly_topk",
+            "DELETE FROM job_watermarks WHERE name IN ('popularity_sketches_since', 'popularity_sketches_until')",
+        ],
+    ),
+]
+
+
+def _ensure_table(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """
+        )
+    conn.commit()
+
+
+def applied_versions(conn):
+    """
+    Returns the versions already applied.
+
+    Args:
+        conn: Database connection not currently in a transaction
+
+    Returns:
+        set: Applied version numbers
+    """
+    _ensure_table(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT version FROM schema_migrations")
+        versions = {row[0] for row in cur.fetchall()}
+    conn.commit()
+    return versions
+
+
+def _run_concurrent_statement(cur, statement):
+    """Runs one statement of a concurrent migration, skipping index work that is already done."""
+    created = _CREATE_INDEX.search(statement)
+    dropped = _DROP_INDEX.search(statement)
+    if created:
+        cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (created.group(1),))
+        row = cur.fetchone()
+        if row and row[0]:
+            # also covers indexes recreated on partitioned tables, which cannot be built concurrently
+            return
+        if row:
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {created.group(1)}")
+    elif dropped:
+        cur.execute("SELECT to_regclass(%s) IS NULL", (dropped.group(1),))
+        if cur.fetchone()[0]:
+            return
+    cur.execute(statement)
+
+
+def _apply_concurrently(conn, migration):
+    """
+    Applies a concurrent migration one autocommitted statement at a time.
+
+    Returns:
+        bool: False if another runner had already applied it
+    """
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+            try:
+                cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (migration.version,))
+                if cur.fetchone():
+                    return False
+                for statement in migration.statements:
+                    _run_concurrent_statement(cur, statement)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                    (migration.version, migration.description),
+                )
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+    finally:
+        conn.autocommit = False
+    return True
+
+
+def migrate(conn, migrations=MIGRATIONS, concurrent=True):
+    """
+    Applies every pending migration in version order.
+
+    Args:
+        conn: Database connection not currently in a transaction
+        migrations: Migrations to consider, defaults to MIGRATIONS
+        concurrent: Also apply concurrent migrations; app startup passes False
+            and leaves them to `flask migrate`
+
+    Returns:
+        list: Versions applied by this call
+
+    Raises:
+        psycopg2.Error: If a migration fails; it is rolled back (a concurrent
+            one stops after its last completed statement) and later
+            migrations are not attempted
+    """
+    done = applied_versions(conn)
+    applied = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.concurrent:
+            if not concurrent:
+                if migration.version not in done:
+                    print(f"Migration {migration.version} builds indexes concurrently; run `flask migrate` to apply it")
+                continue
+            if not _apply_concurrently(conn, migration):
+                continue
+        else:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+                    cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (migration.version,))
+                    if cur.fetchone():
+                        conn.commit()
+                        continue
+                    for statement in migration.statements:
+                        cur.execute(statement)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                        (migration.version, migration.description),
+                    )
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        print(f"Applied migration {migration.version}: {migration.description}")
+        applied.append(migration.version)
+    return applied
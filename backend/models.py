@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import JSONB
 
 db = SQLAlchemy()
 
@@ -38,3 +39,181 @@ class User(db.Model):
         self.account = account
         self.current_points = current_points
         self.total_points = total_points
+
+
+class IdempotencyKey(db.Model):
+    """
+    Idempotency key model remembering the outcome of POST /api/transactions/create.
+
+    Attributes:
+    - key: Client-supplied Idempotency-Key header value, primary key
+    - request_hash: SHA-256 of the request body, used to reject a key reused for a different order
+    - transaction_id: ID of the transaction the key created
+    - status_code: HTTP status of the original response
+    - response: JSON body of the original response
+    - created_at: When the key was first used
+    - expires_at: When the key may be forgotten and reused
+    """
+    __tablename__ = 'idempotency_keys'
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    transaction_id = db.Column(db.Integer)
+    status_code = db.Column(db.Integer)
+    response = db.Column(JSONB)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+
+class PointsLedger(db.Model):
+    """
+    Points ledger model recording every change to a customer's loyalty balance.
+
+    Attributes:
+    - id: Primary key, increasing in insertion order
+    - user_id: ID of the customer (users.id)
+    - transaction_id: ID of the order that earned or redeemed the points
+    - points_earned: Points added to both current and total points
+    - points_redeemed: Points subtracted from current points as a discount
+    - created_at: When the entry was written
+    """
+    __tablename__ = 'points_ledger'
+    id = db.Column(db.BigInteger, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    transaction_id = db.Column(db.Integer)
+    points_earned = db.Column(db.Integer, nullable=False, default=0)
+    points_redeemed = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+
+
+class PointsCheckpoint(db.Model):
+    """
+    Ledger-derived balance per customer, advanced by the incremental reconciliation job.
+
+    Attributes:
+    - user_id: Primary key, ID of the customer (users.id)
+    - current_points: Expected current balance up to the reconciliation watermark
+    - total_points: Expected lifetime total up to the reconciliation watermark
+    """
+    __tablename__ = 'points_checkpoints'
+    user_id = db.Column(db.Integer, primary_key=True)
+    current_points = db.Column(db.BigInteger, nullable=False)
+    total_points = db.Column(db.BigInteger, nullable=False)
+
+
+class JobWatermark(db.Model):
+    """
+    Progress marker for incremental background jobs, or a named counter.
+
+    Attributes:
+    - name: Primary key, name of the job or counter
+    - position: Last source row ID the job has consumed, or the counter value
+    """
+    __tablename__ = 'job_watermarks'
+    name = db.Column(db.String(64), primary_key=True)
+    position = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class SalesRollupQueue(db.Model):
+    """
+    Orders placed but not yet added to the hourly rollups by `flask fold-rollups`.
+
+    Attributes:
+    - transaction_id: Primary key, ID of the queued transaction
+    """
+    __tablename__ = 'sales_rollup_queue'
+    transaction_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+
+class SalesRollupChange(db.Model):
+    """
+    Last rollup version that changed each hour, written by `flask fold-rollups` and `flask rebuild-rollups`.
+
+    Attributes:
+    - hour: Primary key, start of the hour
+    - version: Value of the sales_rollups_version counter when the hour last changed
+    """
+    __tablename__ = 'sales_rollup_changes'
+    hour = db.Column(db.DateTime, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, index=True)
+
+
+class SalesHourlyItem(db.Model):
+    """
+    Hourly rollup of units sold per menu item, maintained by `flask fold-rollups`.
+
+    Attributes:
+    - hour: Start of the hour (order_timestamp truncated to the hour)
+    - menu_item_id: ID of the menu item sold
+    - quantity: Units sold in that hour
+    - revenue: Sum of the sold line totals, or NULL for hours rolled up before
+      line totals were recorded
+    """
+    __tablename__ = 'sales_hourly_items'
+    hour = db.Column(db.DateTime, primary_key=True)
+    menu_item_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    revenue = db.Column(db.Numeric)
+
+
+class SalesHourlyEmployee(db.Model):
+    """
+    Hourly rollup of units sold per employee and menu item, maintained by `flask fold-rollups`.
+
+    Attributes:
+    - hour: Start of the hour (order_timestamp truncated to the hour)
+    - employee_id: ID of the employee who placed the orders
+    - menu_item_id: ID of the menu item sold
+    - quantity: Units sold in that hour
+    - revenue: Sum of the sold line totals, or NULL for hours rolled up before
+      line totals were recorded
+    """
+    __tablename__ = 'sales_hourly_employees'
+    hour = db.Column(db.DateTime, primary_key=True)
+    employee_id = db.Column(db.Integer, primary_key=True)
+    menu_item_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    revenue = db.Column(db.Numeric)
+
+
+class CustomerItemCount(db.Model):
+    """
+    Units of each menu item a customer has bought, maintained by `flask refresh-recommendations`.
+
+    Attributes:
+    - customer_id: ID of the customer (transactions.customer_id)
+    - menu_item_id: ID of the menu item bought
+    - quantity: Units bought across all of the customer's orders
+    """
+    __tablename__ = 'customer_item_counts'
+    customer_id = db.Column(db.Integer, primary_key=True)
+    menu_item_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    __table_args__ = (
+        # a customer's top items are the first rows of this index
+        db.Index('ix_customer_item_counts_rank', 'customer_id', quantity.desc(), menu_item_id.desc()),
+    )
+
+
+class MenuItemPair(db.Model):
+    """
+    Orders containing both of two menu items, maintained by `flask refresh-recommendations`.
+
+    Attributes:
+    - menu_item_id: ID of one menu item
+    - other_item_id: ID of the other menu item; equal to menu_item_id, the
+      row counts the orders containing that item at all
+    - orders: Number of orders containing both items
+    """
+    __tablename__ = 'menu_item_pairs'
+    menu_item_id = db.Column(db.Integer, primary_key=True)
+    other_item_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.BigInteger, nullable=False, default=0)
+    __table_args__ = (
+        # popularity rows, read for customers with little history
+        db.Index(
+            'ix_menu_item_pairs_popularity',
+            orders.desc(),
+            menu_item_id,
+            postgresql_where=(menu_item_id == other_item_id),
+        ),
+    )
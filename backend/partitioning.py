@@ -0,0 +1,363 @@
+"""
+Transaction Partitioning Module
+
+This module converts transactions and transaction_details into tables
+partitioned by month on order_timestamp, then maintains them. Report queries
+bound both tables by order_timestamp (see rollups.sales_facts), so the planner
+reads only the months inside the requested range.
+
+    - convert_to_partitions(): one-off conversion, run in a maintenance window.
+      It locks both tables, copies them into partitioned tables with the same
+      columns, defaults, sequences, foreign keys to other tables and indexes,
+      checks the row counts and drops the originals, all in one transaction.
+    - ensure_partitions(): creates the partitions for the coming months. Rows
+      that landed in the default partition for such a month are moved into
+      the new partition.
+    - archive_partitions(): detaches the partitions of months before a cutoff
+      and moves them to an archive schema. Their rows leave the live tables
+      but are kept, and the hourly rollups still cover those months.
+
+backfill_order_timestamps() copies the order time onto order lines that
+predate the column (or were written by older code) in short batches; run it
+after migration 4, and again after a rolling deploy, before converting.
+
+Partitions are named <table>_pYYYYMM. A <table>_default partition catches rows
+outside every monthly range, including rows without an order_timestamp.
+
+Partitioned tables cannot have a primary key that leaves out the partition
+key, so transaction_id is backed by a plain index, with its sequence still
+guaranteeing uniqueness. Foreign keys from transaction_details to transactions
+are dropped for the same reason.
+"""
+
+import time
+from datetime import datetime
+
+PARTITIONED_TABLES = ("transactions", "transaction_details")
+
+# indexes recreated on the partitioned parents (cascading to every partition)
+PARTITION_INDEXES = {
+    "transactions": {
+        "ix_transactions_order_timestamp_covering": "(order_timestamp, transaction_id) INCLUDE (employee_id)",
+        "ix_transactions_transaction_id": "(transaction_id)",
+        "ix_transactions_customer_id": "(customer_id)",
+        "ix_transactions_employee_id": "(employee_id)",
+    },
+    "transaction_details": {
+        "ix_transaction_details_order_timestamp_covering": (
+            "(order_timestamp, transaction_id) INCLUDE (menu_item_id, item_quantity_sold, line_total)"
+        ),
+        "ix_transaction_details_transaction_id": "(transaction_id)",
+        "ix_transaction_details_menu_item_id": "(menu_item_id)",
+    },
+}
+
+
+def month_start(value):
+    """Truncates a datetime to the first instant of its month."""
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    """Returns the first day of the month `months` after the month of `value`."""
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    """Returns the name of a table's partition for the month starting at `month`."""
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(cur, table="transactions"):
+    """
+    Returns whether a table is already partitioned.
+
+    Args:
+        cur: Database cursor
+        table: Table name
+
+    Returns:
+        bool: True if the table is a partitioned table
+    """
+    cur.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+        (table,),
+    )
+    row = cur.fetchone()
+    return row[0]
+
+
+def backfill_order_timestamps(conn, batch_size=2000, pause=0.0):
+    """
+    Copies each order's time onto its transaction_details rows that lack it.
+
+    Migration 4 only adds the column, so existing order lines, and lines
+    written by workers still running older code during a deploy, start out
+    without it. Works through transaction IDs `batch_size` at a time, each
+    batch in its own short transaction, so only a batch's rows are locked at
+    once and orders keep flowing. Safe to rerun at any time.
+
+    Args:
+        conn: Database connection not currently in a transaction
+        batch_size: Transaction IDs covered per batch
+        pause: Seconds to sleep between batches to limit the load
+
+    Returns:
+        int: Number of transaction_details rows updated
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT MIN(transaction_id), MAX(transaction_id) FROM transaction_details WHERE order_timestamp IS NULL"
+        )
+        lo, last = cur.fetchone()
+    conn.commit()
+
+    updated = 0
+    while lo is not None and lo <= last:
+        hi = lo + batch_size
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE transaction_details td
+                SET order_timestamp = t.order_timestamp
+                FROM transactions t
+                WHERE td.transaction_id = t.transaction_id
+                  AND td.transaction_id >= %(lo)s AND td.transaction_id < %(hi)s
+                  AND td.order_timestamp IS NULL
+                  AND t.order_timestamp IS NOT NULL
+            """,
+                {"lo": lo, "hi": hi},
+            )
+            updated += cur.rowcount
+        conn.commit()
+        lo = hi
+        if pause:
+            time.sleep(pause)
+    return updated
+
+
+def _create_partition(cur, table, month):
+    """
+    Creates one monthly partition, moving any rows for that month out of the default partition.
+
+    Returns:
+        bool: True if the partition was created, False if it already existed
+    """
+    name = partition_name(table, month)
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+    if cur.fetchone()[0]:
+        return False
+    lo, hi = month, add_months(month, 1)
+    cur.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+    cur.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {table}_default
+            WHERE order_timestamp >= %(lo)s AND order_timestamp < %(hi)s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """,
+        {"lo": lo, "hi": hi},
+    )
+    cur.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+        (lo, hi),
+    )
+    return True
+
+
+def _move_sequences(cur, old, new):
+    """Hands the sequences behind `old`'s serial or identity columns over to `new`."""
+    cur.execute(
+        """
+        SELECT column_name, pg_get_serial_sequence(%(old)s, column_name)
+        FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %(old)s
+    """,
+        {"old": old},
+    )
+    for column, sequence in cur.fetchall():
+        if sequence is None:
+            continue
+        cur.execute("SELECT pg_get_serial_sequence(%s, %s)", (new, column))
+        new_sequence = cur.fetchone()[0]
+        if new_sequence is None:
+            # serial column: the copied default still calls the old sequence
+            cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY {new}.{column}")
+        else:
+            # identity column: LIKE created a fresh sequence, continue after the old one
+            cur.execute(
+                f"SELECT setval(%s, (SELECT COALESCE(MAX({column}), 0) + 1 FROM {old}), false)",
+                (new_sequence,),
+            )
+
+
+def convert_to_partitions(conn, months_ahead=3):
+    """
+    Converts transactions and transaction_details to monthly partitions.
+
+    Runs in a single transaction holding exclusive locks on both tables, so
+    orders cannot be placed while it runs; any failure rolls everything back.
+
+    Args:
+        conn: Database connection not currently in a transaction
+        months_ahead: Future months to create partitions for
+
+    Returns:
+        dict: Rows copied per table and the number of monthly partitions each
+
+    Raises:
+        ValueError: If the tables are already partitioned or a row count differs
+    """
+    try:
+        with conn.cursor() as cur:
+            if is_partitioned(cur):
+                raise ValueError("transactions is already partitioned")
+            cur.execute("LOCK TABLE transactions, transaction_details IN ACCESS EXCLUSIVE MODE")
+
+            # order lines must carry their order's time to be routed to the right month
+            cur.execute(
+                """
+                UPDATE transaction_details td
+                SET order_timestamp = t.order_timestamp
+                FROM transactions t
+                WHERE td.transaction_id = t.transaction_id
+                  AND td.order_timestamp IS DISTINCT FROM t.order_timestamp
+            """
+            )
+
+            cur.execute("SELECT MIN(order_timestamp) FROM transactions")
+            first = cur.fetchone()[0] or datetime.now()
+            months = []
+            month = month_start(first)
+            last = add_months(month_start(datetime.now()), months_ahead)
+            while month <= last:
+                months.append(month)
+                month = add_months(month, 1)
+
+            copied = {}
+            for table in PARTITIONED_TABLES:
+                old = f"{table}_unpartitioned"
+                cur.execute(f"ALTER TABLE {table} RENAME TO {old}")
+                cur.execute(
+                    f"""
+                    CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY)
+                    PARTITION BY RANGE (order_timestamp)
+                """
+                )
+                cur.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+                for month in months:
+                    _create_partition(cur, table, month)
+                _move_sequences(cur, old, table)
+
+                # keep foreign keys to other tables, e.g. transaction_details -> menu_items
+                cur.execute(
+                    """
+                    SELECT conname, pg_get_constraintdef(oid)
+                    FROM pg_constraint
+                    WHERE contype = 'f'
+                      AND conrelid = %s::regclass
+                      AND confrelid NOT IN ('transactions_unpartitioned'::regclass, %s::regclass)
+                """,
+                    (old, old),
+                )
+                foreign_keys = cur.fetchall()
+
+                cur.execute(f"INSERT INTO {table} OVERRIDING SYSTEM VALUE SELECT * FROM {old}")
+                cur.execute(f"SELECT (SELECT COUNT(*) FROM {table}), (SELECT COUNT(*) FROM {old})")
+                new_count, old_count = cur.fetchone()
+                if new_count != old_count:
+                    raise ValueError(f"{table}: copied {new_count} of {old_count} rows")
+                copied[table] = new_count
+
+                for name, definition in foreign_keys:
+                    cur.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+
+            # drop the originals, which frees their index names for the parents
+            cur.execute("DROP TABLE transaction_details_unpartitioned, transactions_unpartitioned CASCADE")
+            for table, indexes in PARTITION_INDEXES.items():
+                for name, columns in indexes.items():
+                    cur.execute(f"CREATE INDEX {name} ON {table} {columns}")
+                cur.execute(f"ANALYZE {table}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    return {"rows": copied, "partitions": len(months)}
+
+
+def ensure_partitions(conn, months_ahead=3):
+    """
+    Creates any missing monthly partitions from this month to `months_ahead` months out.
+
+    Args:
+        conn: Database connection not currently in a transaction
+        months_ahead: Future months to create partitions for
+
+    Returns:
+        list: Names of the partitions created
+    """
+    created = []
+    try:
+        with conn.cursor() as cur:
+            if not is_partitioned(cur):
+                conn.commit()
+                return created
+            this_month = month_start(datetime.now())
+            for offset in range(months_ahead + 1):
+                month = add_months(this_month, offset)
+                for table in PARTITIONED_TABLES:
+                    if _create_partition(cur, table, month):
+                        created.append(partition_name(table, month))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return created
+
+
+def archive_partitions(conn, before, schema="archive"):
+    """
+    Detaches the monthly partitions that end on or before `before` into another schema.
+
+    Args:
+        conn: Database connection not currently in a transaction
+        before: Cutoff; only months entirely before it are archived
+        schema: Schema the detached partitions are moved to
+
+    Returns:
+        list: Names of the partitions archived
+    """
+    archived = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+            for table in PARTITIONED_TABLES:
+                cur.execute(
+                    """
+                    SELECT c.relname
+                    FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = to_regclass(%s)
+                    ORDER BY c.relname
+                """,
+                    (table,),
+                )
+                for (name,) in cur.fetchall():
+                    suffix = name[len(table) + 2:]
+                    if not name.startswith(f"{table}_p") or len(suffix) != 6 or not suffix.isdigit():
+                        continue
+                    month = datetime(int(suffix[:4]), int(suffix[4:]), 1)
+                    if add_months(month, 1) > before:
+                        continue
+                    cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                    cur.execute(f"ALTER TABLE {name} SET SCHEMA {schema}")
+                    archived.append(name)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return archived
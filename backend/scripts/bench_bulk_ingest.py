@@ -0,0 +1,76 @@
+"""
+Bulk Ingest Benchmark
+
+Replays the same batch of orders against a running backend twice: once as
+individual POST /api/transactions/create calls and once as a single
+POST /api/transactions/bulk call, and prints orders/second for each path.
+
+Both runs write real transactions and deduct real stock, so point it at a
+development database.
+
+Usage:
+    python scripts/bench_bulk_ingest.py --url http://localhost:5000 \
+        --orders 500 --item "Orange Chicken" --employee "Jane Doe" --customer-id 1
+"""
+
+import argparse
+import json
+import time
+import urllib.request
+
+
+def post(url, payload):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def make_orders(args):
+    return [
+        {
+            "items": {item: 1 for item in args.item},
+            "customer": "bench",
+            "customer_id": args.customer_id,
+            "employee": args.employee,
+            "total_price": 10.0,
+            "discount_points": 0,
+        }
+        for _ in range(args.orders)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--item", action="append", required=True, help="menu item name (repeatable)")
+    parser.add_argument("--employee", required=True)
+    parser.add_argument("--customer-id", type=int, default=None)
+    args = parser.parse_args()
+
+    orders = make_orders(args)
+
+    started = time.perf_counter()
+    for order in orders:
+        post(f"{args.url}/api/transactions/create", order)
+    single = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = post(f"{args.url}/api/transactions/bulk", {"orders": orders})
+    bulk = time.perf_counter() - started
+
+    print(f"single creates: {len(orders)} orders in {single:.3f}s = {len(orders) / single:.1f} orders/s")
+    print(
+        f"bulk ingest:    {len(orders)} orders in {bulk:.3f}s = {len(orders) / bulk:.1f} orders/s "
+        f"({result['created']} created, {result['failed']} failed)"
+    )
+    print(f"speedup: {single / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
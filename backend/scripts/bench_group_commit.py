@@ -0,0 +1,89 @@
+"""
+Group Commit Benchmark
+
+Places the same number of orders from many concurrent threads twice, directly
+against the database configured in .env: once with one transaction per order
+(the default /create path) and once through the group committer. Prints
+orders/second and commits/second for each.
+
+Both runs write real transactions and deduct real stock, so point it at a
+development database.
+
+Usage (from the repository root):
+    python backend/scripts/bench_group_commit.py --item "Orange Chicken" \
+        --employee "Jane Doe" --orders 1000 --threads 32 --window-ms 5 --max-batch 50
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from backend.api.catalog import get_catalog  # noqa: E402
+from backend.api.database import run_transaction  # noqa: E402
+from backend.api.group_commit import GroupCommitter  # noqa: E402
+from backend.api.transactions import _commit_batch, _place_order  # noqa: E402
+
+
+def run(label, orders, threads, place, commits):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(place, orders))
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label}: {len(orders)} orders in {elapsed:.3f}s = {len(orders) / elapsed:.1f} orders/s, "
+        f"{commits()} commits = {commits() / elapsed:.1f} commits/s"
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--item", action="append", required=True, help="menu item name (repeatable)")
+    parser.add_argument("--employee", required=True)
+    parser.add_argument("--customer-id", type=int, default=None)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=50)
+    args = parser.parse_args()
+
+    orders = [
+        {
+            "items": {item: 1 for item in args.item},
+            "customer": "bench",
+            "customer_id": args.customer_id,
+            "employee": args.employee,
+            "total_price": 10.0,
+            "discount_points": 0,
+        }
+        for _ in range(args.orders)
+    ]
+    catalog = get_catalog()
+
+    def place_single(order):
+        def work(conn):
+            with conn.cursor() as cur:
+                return _place_order(cur, order, catalog)[0]
+
+        return run_transaction(work)
+
+    single = run("one commit per order", orders, args.threads, place_single, lambda: len(orders))
+
+    committer = GroupCommitter(_commit_batch, args.window_ms / 1000, args.max_batch)
+    grouped = run(
+        "group commit        ",
+        orders,
+        args.threads,
+        committer.submit,
+        lambda: committer.stats()["batches"],
+    )
+
+    print(f"average batch: {committer.stats()['average_batch']}, speedup: {single / grouped:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Partitioning Benchmark
+
+Builds a multi-year synthetic order history twice, in a scratch schema of the
+database configured in .env: once in plain tables and once in tables
+partitioned by month the way partitioning.py lays them out. It then times the
+raw-join sales report query (the path reports take for hours the rollups do
+not cover) over ranges of a day, a month and a quarter on both.
+
+For each range it prints the median latency and how many partitions the
+planner kept. The scratch schema is dropped at the end unless --keep is given,
+and the application's own tables are never touched.
+
+Usage (from the repository root):
+    python backend/scripts/bench_partitioning.py --years 3 --orders-per-day 2000 --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from backend.api.database import get_db_connection  # noqa: E402
+from backend.partitioning import add_months, month_start  # noqa: E402
+
+SCHEMA = "bench_partitioning"
+
+REPORT = """
+    SELECT mi.menu_item_id,
+           SUM(td.item_quantity_sold) AS quantity_sold,
+           SUM(mi.price::numeric * td.item_quantity_sold)::float8 AS total_sales
+    FROM {transactions} t
+    JOIN {details} td
+      ON t.transaction_id = td.transaction_id AND td.order_timestamp = t.order_timestamp
+    JOIN menu_items mi ON td.menu_item_id = mi.menu_item_id
+    WHERE t.order_timestamp >= %(start)s AND t.order_timestamp <= %(end)s
+      AND td.order_timestamp >= %(start)s AND td.order_timestamp <= %(end)s
+    GROUP BY mi.menu_item_id
+"""
+
+
+def build(cur, years, orders_per_day, items):
+    end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=365 * years)
+    orders = years * 365 * orders_per_day
+
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    cur.execute(f"SET search_path TO {SCHEMA}")
+    cur.execute(
+        """
+        CREATE TABLE menu_items AS
+        SELECT g AS menu_item_id, (5 + g %% 10)::float8 AS price
+        FROM generate_series(1, %s) AS g
+    """,
+        (items,),
+    )
+
+    cur.execute(
+        """
+        CREATE TABLE plain_transactions (
+            transaction_id BIGINT, order_timestamp TIMESTAMP, employee_id INT, customer_id INT, price FLOAT8
+        )
+    """
+    )
+    cur.execute(
+        """
+        CREATE TABLE plain_details (
+            transaction_id BIGINT, menu_item_id INT, item_quantity_sold INT, order_timestamp TIMESTAMP
+        )
+    """
+    )
+    cur.execute(
+        """
+        INSERT INTO plain_transactions
+        SELECT g, %(start)s + (g * (%(end)s - %(start)s) / %(orders)s), 1 + g %% 40, NULL, 10
+        FROM generate_series(1, %(orders)s) AS g
+    """,
+        {"start": start, "end": end, "orders": orders},
+    )
+    cur.execute(
+        """
+        INSERT INTO plain_details
+        SELECT t.transaction_id, 1 + (t.transaction_id * 7 + k) %% %(items)s, 1 + k, t.order_timestamp
+        FROM plain_transactions t, generate_series(0, 2) AS k
+    """,
+        {"items": items},
+    )
+
+    for table, columns in (
+        ("transactions", "transaction_id BIGINT, order_timestamp TIMESTAMP, employee_id INT, customer_id INT, price FLOAT8"),
+        ("details", "transaction_id BIGINT, menu_item_id INT, item_quantity_sold INT, order_timestamp TIMESTAMP"),
+    ):
+        cur.execute(f"CREATE TABLE part_{table} ({columns}) PARTITION BY RANGE (order_timestamp)")
+        month = month_start(start)
+        while month <= end:
+            cur.execute(
+                f"CREATE TABLE part_{table}_p{month:%Y%m} PARTITION OF part_{table} "
+                "FOR VALUES FROM (%s) TO (%s)",
+                (month, add_months(month, 1)),
+            )
+            month = add_months(month, 1)
+        cur.execute(f"INSERT INTO part_{table} SELECT * FROM plain_{table}")
+
+    for prefix in ("plain", "part"):
+        cur.execute(f"CREATE INDEX ON {prefix}_transactions (order_timestamp)")
+        cur.execute(f"CREATE INDEX ON {prefix}_transactions (transaction_id)")
+        cur.execute(f"CREATE INDEX ON {prefix}_details (transaction_id)")
+        cur.execute(f"CREATE INDEX ON {prefix}_details (order_timestamp)")
+        cur.execute(f"ANALYZE {prefix}_transactions")
+        cur.execute(f"ANALYZE {prefix}_details")
+    cur.execute("ANALYZE menu_items")
+    return end, orders
+
+
+def scanned_relations(node, found):
+    if "Relation Name" in node:
+        found.add(node["Relation Name"])
+    for child in node.get("Plans", []):
+        scanned_relations(child, found)
+    return found
+
+
+def time_query(cur, prefix, start, end, repeat):
+    query = REPORT.format(transactions=f"{prefix}_transactions", details=f"{prefix}_details")
+    params = {"start": start, "end": end}
+    cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+    relations = scanned_relations(cur.fetchone()[0][0]["Plan"], set())
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cur.execute(query, params)
+        cur.fetchall()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(relations - {"menu_items"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--orders-per-day", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    args = parser.parse_args()
+
+    with get_db_connection() as conn:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                started = time.perf_counter()
+                end, orders = build(cur, args.years, args.orders_per_day, args.items)
+                print(f"built {orders} orders over {args.years} years in {time.perf_counter() - started:.1f}s")
+
+                for label, width in (("1 day", timedelta(days=1)), ("1 month", timedelta(days=30)), ("1 quarter", timedelta(days=91))):
+                    # a range in the middle of the history, away from either end
+                    start = end - timedelta(days=365 * args.years // 2)
+                    plain, plain_tables = time_query(cur, "plain", start, start + width, args.repeat)
+                    part, part_tables = time_query(cur, "part", start, start + width, args.repeat)
+                    print(
+                        f"{label:<10} plain {plain * 1000:8.1f} ms ({plain_tables} tables)   "
+                        f"partitioned {part * 1000:8.1f} ms ({part_tables} partitions)   "
+                        f"speedup {plain / part:.1f}x"
+                    )
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("RESET search_path")
+                if not args.keep:
+                    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            conn.autocommit = False
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Preference Index Benchmark
+
+Builds a synthetic menu of --items menu items in a scratch schema of the
+database configured in .env, then answers the same random preference quiz
+answers twice: with the SQL filter GET /api/menuitems/preference used to run
+(PREFERENCE_SQL) and with the in-process bitset index (see
+api/preference_index.py).
+
+It prints the index build time and the median latency of both paths, and
+checks that both return the same menu items for every query. The scratch
+schema is dropped at the end unless --keep is given, and the application's
+own tables are never touched.
+
+Usage (from the repository root):
+    python backend/scripts/bench_preference_index.py --items 5000 --queries 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from backend.api.catalog import MenuItemEntry  # noqa: E402
+from backend.api.database import get_db_connection  # noqa: E402
+from backend.api.menuitems import PREFERENCE_SQL  # noqa: E402
+from backend.api.preference_index import PreferenceIndex  # noqa: E402
+
+SCHEMA = "bench_preference_index"
+
+FLAVORS = ["sweet", "savory", "spicy", "sour", "umami", "mild"]
+PROTEINS = ["Chicken", "Beef", "Shrimp", "Tofu", "Pork", "Veggie"]
+ALLERGENS = 8
+
+
+def build(cur, items, seed):
+    rng = random.Random(seed)
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    cur.execute(f"SET search_path TO {SCHEMA}")
+    cur.execute(
+        """
+        CREATE TABLE menu_items (
+            menu_item_id INT PRIMARY KEY, menu_item_name TEXT, category TEXT, price FLOAT8,
+            calories INT, seasonal BOOLEAN, active BOOLEAN, flavor TEXT
+        )
+    """
+    )
+    cur.execute("CREATE TABLE menu_item_allergens (menu_item_id INT, allergen_id INT)")
+
+    rows, links = [], []
+    for menu_item_id in range(1, items + 1):
+        name = f"{rng.choice(PROTEINS)} Dish {menu_item_id}"
+        rows.append(
+            (
+                menu_item_id,
+                name,
+                rng.choice(["entree", "side", "drink"]),
+                round(rng.uniform(2, 15), 2),
+                rng.randint(50, 1500),
+                rng.random() < 0.1,
+                rng.random() < 0.95,
+                rng.choice(FLAVORS),
+            )
+        )
+        for allergen_id in rng.sample(range(1, ALLERGENS + 1), rng.randint(0, 3)):
+            links.append((menu_item_id, allergen_id))
+    cur.executemany("INSERT INTO menu_items VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", rows)
+    cur.executemany("INSERT INTO menu_item_allergens VALUES (%s, %s)", links)
+    cur.execute("CREATE INDEX ON menu_item_allergens (allergen_id)")
+    cur.execute("ANALYZE menu_items")
+    cur.execute("ANALYZE menu_item_allergens")
+
+    allergens = {}
+    for menu_item_id, allergen_id in links:
+        allergens.setdefault(menu_item_id, []).append((allergen_id, f"allergen {allergen_id}"))
+    return [
+        MenuItemEntry(*row[:5], row[7], row[5], row[6], tuple(allergens.get(row[0], ())), ())
+        for row in rows
+        if row[6]
+    ]
+
+
+def random_queries(count, seed):
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(count):
+        low = rng.randint(0, 800)
+        queries.append(
+            {
+                "chicken": rng.choice(["true", "false", "either"]),
+                "flavors": rng.sample(FLAVORS, rng.randint(1, 3)),
+                "allergens": rng.sample(range(1, ALLERGENS + 1), rng.randint(0, 3)),
+                "calorie_min": low,
+                "calorie_max": low + rng.randint(100, 700),
+            }
+        )
+    return queries
+
+
+def run_sql(cur, query):
+    cur.execute(
+        PREFERENCE_SQL.format(columns="menu_item_id", after="TRUE"),
+        [
+            query["chicken"],
+            query["chicken"],
+            tuple(query["flavors"]),
+            query["allergens"],
+            query["calorie_min"],
+            query["calorie_max"],
+            None,
+        ],
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def run_index(index, query):
+    mask = index.match(
+        query["flavors"],
+        query["allergens"],
+        query["calorie_min"],
+        query["calorie_max"],
+        with_proteins=("chicken",) if query["chicken"] == "true" else (),
+        without_proteins=("chicken",) if query["chicken"] == "false" else (),
+    )
+    return [entry.menu_item_id for entry in index.entries_of(mask)]
+
+
+def timed(repeat, run):
+    """Returns the median seconds of `repeat` runs and the last run's result."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    args = parser.parse_args()
+
+    mismatches = 0
+    with get_db_connection() as conn:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                entries = build(cur, args.items, args.seed)
+                build_time, index = timed(args.repeat, lambda: PreferenceIndex(1, entries))
+                print(f"index over {len(entries)} active items built in {build_time * 1000:.1f} ms")
+
+                sql_times, index_times = [], []
+                for query in random_queries(args.queries, args.seed):
+                    sql_time, expected = timed(args.repeat, lambda: run_sql(cur, query))
+                    index_time, actual = timed(args.repeat, lambda: run_index(index, query))
+                    sql_times.append(sql_time)
+                    index_times.append(index_time)
+                    if expected != actual:
+                        mismatches += 1
+
+                sql_median = statistics.median(sql_times)
+                index_median = statistics.median(index_times)
+                print(
+                    f"{args.queries} queries   sql {sql_median * 1000:8.3f} ms   "
+                    f"index {index_median * 1000:8.3f} ms   speedup {sql_median / index_median:.1f}x"
+                )
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("RESET search_path")
+                if not args.keep:
+                    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            conn.autocommit = False
+
+    if mismatches:
+        sys.exit(f"{mismatches} queries returned different menu items")
+    print("OK: index matches the SQL filter")
+
+
+if __name__ == "__main__":
+    main()
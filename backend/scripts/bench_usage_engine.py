@@ -0,0 +1,144 @@
+"""
+Usage Engine Benchmark
+
+Times ingredient usage reports against the database configured in .env, once
+with the SQL join the reports used to run and once with the NumPy usage
+engine (see api/usage_engine.py):
+
+    - one range: the productUsage report over the last --days days
+    - a series: daily usage for each of those days, as one SQL query per day,
+      as one SQL query grouped by day, and as one engine matrix multiply
+
+Every result is checked against the SQL join within --tolerance. Nothing is
+written to the database. Reports read the rollups as they stand, so run
+`flask rebuild-rollups` first for representative numbers.
+
+Usage (from the repository root):
+    python backend/scripts/bench_usage_engine.py --days 90 --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from psycopg2.extras import RealDictCursor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from backend.api.database import get_db_connection  # noqa: E402
+from backend.api.reports import _product_usage_sql, _usage_series_sql  # noqa: E402
+from backend.api.rollups import rollup_coverage, sales_facts  # noqa: E402
+from backend.api.usage_engine import (  # noqa: E402
+    load_recipe_matrix,
+    np,
+    product_usage,
+    usage_series,
+)
+
+
+def timed(repeat, run):
+    """Returns the median seconds of `repeat` runs and the last run's result."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def sql_usage(cur, coverage, start, end):
+    facts, params = sales_facts(start, end, coverage)
+    cur.execute(_product_usage_sql(facts), params)
+    return {row["ingredient_name"]: row["total_inventory_used"] for row in cur.fetchall()}
+
+
+def sql_daily_loop(cur, coverage, start, days):
+    usage = {}
+    for day in range(days):
+        lo = start + timedelta(days=day)
+        for name, amount in sql_usage(cur, coverage, lo, lo + timedelta(days=1) - timedelta(microseconds=1)).items():
+            usage.setdefault(name, [0.0] * days)[day] = amount
+    return usage
+
+
+def max_difference(expected, actual):
+    """Largest relative difference between two {name: value or [values]} maps."""
+    if expected.keys() != actual.keys():
+        return float("inf")
+    worst = 0.0
+    for name, values in expected.items():
+        pairs = zip(values, actual[name]) if isinstance(values, list) else [(values, actual[name])]
+        for a, b in pairs:
+            a, b = a or 0.0, b or 0.0
+            worst = max(worst, abs(a - b) / max(abs(a), 1.0))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=1e-9)
+    args = parser.parse_args()
+
+    if np is None:
+        sys.exit("NumPy is not installed; pip install numpy")
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = today - timedelta(days=args.days - 1)
+    end = today + timedelta(days=1) - timedelta(microseconds=1)
+    failures = []
+
+    with get_db_connection() as conn:
+        # every run must see the same rows
+        conn.set_session(readonly=True, isolation_level="REPEATABLE READ")
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                coverage = rollup_coverage(cur)
+                build, matrix = timed(args.repeat, lambda: load_recipe_matrix(cur))
+                print(
+                    f"recipe matrix {len(matrix.item_index)} items x {len(matrix.ingredient_names)} ingredients "
+                    f"built in {build * 1000:.1f} ms"
+                )
+
+                sql_time, expected = timed(args.repeat, lambda: sql_usage(cur, coverage, start, end))
+                engine_time, actual = timed(args.repeat, lambda: product_usage(cur, start, end, coverage))
+                difference = max_difference(expected, actual)
+                print(
+                    f"{args.days}-day total   sql join {sql_time * 1000:8.1f} ms   "
+                    f"engine {engine_time * 1000:8.1f} ms   speedup {sql_time / engine_time:.1f}x   "
+                    f"max rel diff {difference:.2e}"
+                )
+                if difference > args.tolerance:
+                    failures.append(f"total usage differs by {difference:.2e}")
+
+                loop_time, expected = timed(args.repeat, lambda: sql_daily_loop(cur, coverage, start, args.days))
+                grouped_time, grouped = timed(
+                    args.repeat, lambda: _usage_series_sql(cur, coverage, True, start, end, "day")
+                )
+                engine_time, series = timed(args.repeat, lambda: usage_series(cur, start, end, coverage))
+                print(
+                    f"{args.days} daily ranges  sql loop {loop_time * 1000:8.1f} ms   "
+                    f"sql grouped {grouped_time * 1000:8.1f} ms   engine {engine_time * 1000:8.1f} ms   "
+                    f"speedup {loop_time / engine_time:.1f}x / {grouped_time / engine_time:.1f}x"
+                )
+                for label, result in (("sql grouped", grouped["usage"]), ("engine", series["usage"])):
+                    difference = max_difference(expected, result)
+                    if difference > args.tolerance:
+                        failures.append(f"{label} daily usage differs from the sql loop by {difference:.2e}")
+        finally:
+            conn.rollback()
+            conn.set_session(readonly=False, isolation_level="DEFAULT")
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+    print("OK: engine matches the SQL join")
+
+
+if __name__ == "__main__":
+    main()
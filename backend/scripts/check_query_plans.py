@@ -0,0 +1,218 @@
+"""
+Query Plan Check
+
+Seeds a realistic volume of employees, menu items, transactions and order
+lines into the database configured in .env, runs EXPLAIN on the hot lookups
+and fails unless each one is answered with an index on its table instead of
+a sequential scan. Everything runs in one transaction that is rolled back at
+the end (planner statistics included), so no seeded rows are left behind.
+
+With --snapshot, the index chosen for each query is compared against a JSON
+snapshot file, which is written on the first run; pass --update to rewrite it
+after an intentional schema change.
+
+Apply the migrations first (`flask migrate`). Exits non-zero on any failure.
+The same checks run as part of the test suite (backend/tests/test_query_plans.py).
+
+Usage (from the repository root):
+    python backend/scripts/check_query_plans.py --orders 200000 \
+        --snapshot backend/scripts/query_plans.json
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from backend.api.database import get_db_connection  # noqa: E402
+
+# name: (table that must be read through an index, query, params)
+QUERIES = {
+    "sales_today": (
+        "transactions",
+        """
+        SELECT td.menu_item_id, SUM(td.item_quantity_sold)
+        FROM transactions t
+        JOIN transaction_details td ON t.transaction_id = td.transaction_id
+        WHERE t.order_timestamp >= CURRENT_DATE::timestamp
+          AND t.order_timestamp < CURRENT_DATE::timestamp + INTERVAL '1 day'
+        GROUP BY td.menu_item_id
+    """,
+        None,
+    ),
+    "orders_by_customer": (
+        "transactions",
+        "SELECT transaction_id, price FROM transactions WHERE customer_id = %s",
+        (-1,),
+    ),
+    "orders_by_employee": (
+        "transactions",
+        "SELECT transaction_id, price FROM transactions WHERE employee_id = %s",
+        (-1,),
+    ),
+    "lines_of_transaction": (
+        "transaction_details",
+        "SELECT menu_item_id, item_quantity_sold FROM transaction_details WHERE transaction_id = %s",
+        (-1,),
+    ),
+    "lines_of_menu_item": (
+        "transaction_details",
+        "SELECT transaction_id FROM transaction_details WHERE menu_item_id = %s",
+        (-1,),
+    ),
+    "menu_item_by_name": (
+        "menu_items",
+        "SELECT menu_item_id FROM menu_items WHERE menu_item_name = %s",
+        ("plan-check-item-1",),
+    ),
+    "employee_by_name": (
+        "employees",
+        "SELECT employee_id FROM employees WHERE employee_name = %s",
+        ("plan-check-employee-1",),
+    ),
+}
+
+
+def seed(cur, orders, employees, items):
+    cur.execute(
+        """
+        INSERT INTO employees (employee_name, position, hire_date, active)
+        SELECT 'plan-check-employee-' || g, 'Cashier', NOW(), true
+        FROM generate_series(1, %s) AS g
+    """,
+        (employees,),
+    )
+    cur.execute(
+        """
+        INSERT INTO menu_items (menu_item_name, category, price, calories, flavor)
+        SELECT 'plan-check-item-' || g, 'Entree', 8.5, 500, 'Savory'
+        FROM generate_series(1, %s) AS g
+    """,
+        (items,),
+    )
+    # one order every few minutes going back about a year
+    cur.execute(
+        """
+        WITH e AS (
+            SELECT array_agg(employee_id) AS ids FROM employees
+            WHERE employee_name LIKE 'plan-check-employee-%%'
+        ),
+        m AS (
+            SELECT array_agg(menu_item_id) AS ids FROM menu_items
+            WHERE menu_item_name LIKE 'plan-check-item-%%'
+        ),
+        t AS (
+            INSERT INTO transactions (customer, price, order_timestamp, employee_id, customer_id)
+            SELECT 'plan-check', 8.5,
+                   LOCALTIMESTAMP - g * (INTERVAL '1 year' / %(orders)s),
+                   e.ids[1 + g %% array_length(e.ids, 1)],
+                   NULL
+            FROM generate_series(1, %(orders)s) AS g, e
+            RETURNING transaction_id, order_timestamp
+        )
+        INSERT INTO transaction_details (transaction_id, menu_item_id, item_quantity_sold, order_timestamp)
+        SELECT t.transaction_id, m.ids[1 + (t.transaction_id + k) %% array_length(m.ids, 1)], 1, t.order_timestamp
+        FROM t, m, generate_series(0, 2) AS k
+    """,
+        {"orders": orders},
+    )
+    for table in ("employees", "menu_items", "transactions", "transaction_details"):
+        cur.execute(f"ANALYZE {table}")
+
+
+def scans(node, found):
+    """Collects (node type, relation, index) for every scan in a JSON plan."""
+    if "Scan" in node["Node Type"]:
+        found.append((node["Node Type"], node.get("Relation Name"), node.get("Index Name")))
+    for child in node.get("Plans", []):
+        scans(child, found)
+    return found
+
+
+def check_plans(cur):
+    """
+    Runs EXPLAIN on every query in QUERIES.
+
+    Args:
+        cur: Cursor inside the transaction the data was seeded in
+
+    Returns:
+        tuple: (chosen, failures) where chosen maps query name to the sorted
+            indexes it reads its table through, and failures lists the queries
+            that scan their table sequentially or through no index
+    """
+    chosen = {}
+    failures = []
+    for name, (table, query, params) in QUERIES.items():
+        # partitioned tables are scanned through their partitions' indexes
+        cur.execute(
+            """
+            SELECT indexname FROM pg_indexes
+            WHERE tablename = %(table)s
+               OR tablename IN (
+                   SELECT inhrelid::regclass::text FROM pg_inherits
+                   WHERE inhparent = %(table)s::regclass
+               )
+        """,
+            {"table": table},
+        )
+        table_indexes = {row[0] for row in cur.fetchall()}
+        cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        plan = cur.fetchone()[0][0]["Plan"]
+        found = scans(plan, [])
+        used = sorted({index for _, _, index in found if index in table_indexes})
+        seq = [
+            relation
+            for node_type, relation, _ in found
+            if node_type == "Seq Scan" and relation and relation.split("_p")[0] == table
+        ]
+        chosen[name] = used
+        if seq or not used:
+            failures.append(f"{name}: {table} not read through an index ({found})")
+    return chosen, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--snapshot", help="JSON file of the index chosen per query")
+    parser.add_argument("--update", action="store_true", help="rewrite the snapshot file")
+    args = parser.parse_args()
+
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                seed(cur, args.orders, args.employees, args.items)
+                chosen, failures = check_plans(cur)
+        finally:
+            conn.rollback()
+    for name, used in chosen.items():
+        status = "FAIL" if any(failure.startswith(f"{name}:") for failure in failures) else "ok"
+        print(f"{status:<5} {name:<22} {', '.join(used) or '-'}")
+
+    if args.snapshot:
+        if args.update or not os.path.exists(args.snapshot):
+            with open(args.snapshot, "w") as f:
+                json.dump(chosen, f, indent=2, sort_keys=True)
+                f.write("\n")
+            print(f"wrote {args.snapshot}")
+        else:
+            with open(args.snapshot) as f:
+                expected = json.load(f)
+            for name, indexes in expected.items():
+                if chosen.get(name) != indexes:
+                    failures.append(f"{name}: expected {indexes}, got {chosen.get(name)}")
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+    print("OK: every hot query uses an index")
+
+
+if __name__ == "__main__":
+    main()
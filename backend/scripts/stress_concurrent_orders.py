@@ -0,0 +1,135 @@
+"""
+Concurrent Order Stress Test
+
+Fires many parallel POST /api/transactions/create requests whose menu items
+share ingredients at a running backend (backed by a local Postgres), then
+checks that:
+
+    - no request failed with a deadlock or serialization error, and
+    - every ingredient's final stock equals its starting stock minus exactly
+      what the successful orders consumed.
+
+Orders that are rejected for insufficient stock are expected once stock runs
+out and are not counted as consumption. Exits non-zero if a check fails.
+
+The lock ordering in transactions._deduct_stock() that this exercises end to
+end is also covered directly by backend/tests/test_deduct_stock.py.
+
+Usage:
+    python scripts/stress_concurrent_orders.py --url http://localhost:5000 \
+        --employee "Jane Doe" --item "Orange Chicken" --item "Beijing Beef" \
+        --orders 400 --workers 32
+"""
+
+import argparse
+import json
+import random
+import sys
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def call(method, url, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json"}, method=method
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+def stock_levels(url):
+    _, ingredients = call("GET", f"{url}/api/ingredients/")
+    return {row["ingredient_id"]: float(row["stock"]) for row in ingredients}
+
+
+def recipes(url, names):
+    _, menu = call("GET", f"{url}/api/menuitems/")
+    by_name = {item["menu_item_name"]: item for item in menu}
+    missing = [name for name in names if name not in by_name]
+    if missing:
+        sys.exit(f"unknown menu items: {', '.join(missing)}")
+    return {
+        name: {row["id"]: float(row["amount"]) for row in by_name[name]["ingredients"] or []}
+        for name in names
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--item", action="append", required=True, help="menu item name (repeatable)")
+    parser.add_argument("--employee", required=True)
+    parser.add_argument("--customer-id", type=int, default=None)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=331)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    recipe_by_name = recipes(args.url, args.item)
+    before = stock_levels(args.url)
+
+    # random overlapping combos, shuffled so ingredients are hit in varying order
+    orders = []
+    for _ in range(args.orders):
+        names = rng.sample(args.item, rng.randint(1, len(args.item)))
+        orders.append({name: rng.randint(1, 3) for name in names})
+
+    def place(items):
+        status, body = call(
+            "POST",
+            f"{args.url}/api/transactions/create",
+            {
+                "items": items,
+                "customer": "stress",
+                "customer_id": args.customer_id,
+                "employee": args.employee,
+                "total_price": 0,
+                "discount_points": 0,
+            },
+        )
+        return items, status, body
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(place, orders))
+
+    expected = dict(before)
+    created = rejected = 0
+    failures = []
+    for items, status, body in results:
+        if status == 201:
+            created += 1
+            for name, quantity in items.items():
+                for ingredient_id, amount in recipe_by_name[name].items():
+                    if ingredient_id in expected:
+                        expected[ingredient_id] -= amount * quantity
+        elif "Insufficient stock" in body.get("error", ""):
+            rejected += 1
+        else:
+            failures.append((status, body))
+
+    after = stock_levels(args.url)
+    drift = {
+        ingredient_id: (expected[ingredient_id], after.get(ingredient_id))
+        for ingredient_id in expected
+        if abs(expected[ingredient_id] - after.get(ingredient_id, 0)) > 1e-6
+    }
+
+    print(f"{created} created, {rejected} rejected for stock, {len(failures)} other failures")
+    for status, body in failures[:10]:
+        print(f"  HTTP {status}: {body}")
+    for ingredient_id, (want, got) in drift.items():
+        print(f"  ingredient {ingredient_id}: expected stock {want}, found {got}")
+
+    if failures or drift:
+        sys.exit(1)
+    print("OK: no deadlocks and final stock matches exactly")
+
+
+if __name__ == "__main__":
+    main()
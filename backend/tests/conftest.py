@@ -0,0 +1,31 @@
+"""
+Shared fixtures for the database tests.
+
+The tests run against the PostgreSQL database configured in .env (see
+api/database.py), with the migrations applied (`flask migrate`). They are
+skipped when no database is configured or it cannot be reached.
+
+Usage (from the repository root):
+    python -m pytest backend/tests
+"""
+
+import os
+
+import psycopg2
+import pytest
+
+from backend.api.database import get_db_connection
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Returns get_db_connection, skipping the test unless the configured database accepts connections."""
+    if not os.getenv("DB_NAME"):
+        pytest.skip("no database configured (DB_NAME is not set)")
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+    except psycopg2.Error as e:
+        pytest.skip(f"database not reachable: {e}")
+    return get_db_connection
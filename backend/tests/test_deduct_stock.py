@@ -0,0 +1,108 @@
+"""
+Tests for the ordered, conditional stock deduction in transactions._deduct_stock().
+
+Several threads deduct overlapping ingredient sets, each listed in a different
+order, in concurrent transactions. The rows are locked in ingredient_id
+order, so no transaction may fail with a deadlock, and the final stock must
+equal the starting stock minus every deduction.
+"""
+
+import random
+import threading
+from decimal import Decimal
+
+import pytest
+
+from backend.api.transactions import _deduct_stock
+
+INGREDIENTS = 6
+START_STOCK = 100000
+THREADS = 8
+ROUNDS = 40
+
+
+@pytest.fixture
+def ingredients(database):
+    """Creates throwaway ingredients with plenty of stock and deletes them afterwards."""
+    with database() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO ingredients (ingredient_name, stock)
+                SELECT 'test-deduct-stock-' || g, %s FROM generate_series(1, %s) AS g
+                RETURNING ingredient_id
+            """,
+                (START_STOCK, INGREDIENTS),
+            )
+            ids = [row[0] for row in cur.fetchall()]
+    yield ids
+    with database() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM ingredients WHERE ingredient_id = ANY(%s)", (ids,))
+
+
+def _stock(database, ids):
+    with database() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT ingredient_id, stock FROM ingredients WHERE ingredient_id = ANY(%s)", (ids,))
+            return {ingredient_id: Decimal(stock) for ingredient_id, stock in cur.fetchall()}
+
+
+def test_overlapping_deductions_do_not_deadlock(database, ingredients):
+    rng = random.Random(331)
+    # random.sample() shuffles, so every order lists its ingredients in a different order
+    plans = [
+        [
+            {ingredient_id: rng.randint(1, 5) for ingredient_id in rng.sample(ingredients, rng.randint(2, INGREDIENTS))}
+            for _ in range(ROUNDS)
+        ]
+        for _ in range(THREADS)
+    ]
+    start = threading.Barrier(THREADS)
+    failures = []
+
+    def run(plan):
+        start.wait()
+        for required in plan:
+            try:
+                with database() as conn:
+                    with conn.cursor() as cur:
+                        short = _deduct_stock(cur, required)
+                        # keep the row locks a moment so the transactions overlap
+                        cur.execute("SELECT pg_sleep(0.001)")
+                if short:
+                    failures.append(f"unexpected shortage: {short}")
+            except Exception as e:
+                failures.append(repr(e))
+
+    threads = [threading.Thread(target=run, args=(plan,)) for plan in plans]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    expected = {ingredient_id: Decimal(START_STOCK) for ingredient_id in ingredients}
+    for plan in plans:
+        for required in plan:
+            for ingredient_id, amount in required.items():
+                expected[ingredient_id] -= amount
+    assert _stock(database, ingredients) == expected
+
+
+def test_insufficient_stock_is_reported_and_not_deducted(database, ingredients):
+    low, plenty = ingredients[0], ingredients[1]
+    with database() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE ingredients SET stock = 3 WHERE ingredient_id = %s", (low,))
+                short = _deduct_stock(cur, {plenty: 5, low: 4})
+                cur.execute(
+                    "SELECT ingredient_id, stock FROM ingredients WHERE ingredient_id = ANY(%s)", ([low, plenty],)
+                )
+                stock = {ingredient_id: Decimal(value) for ingredient_id, value in cur.fetchall()}
+        finally:
+            conn.rollback()
+
+    assert short == [low]
+    assert stock == {low: Decimal(3), plenty: Decimal(START_STOCK - 5)}
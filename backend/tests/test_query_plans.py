@@ -0,0 +1,22 @@
+"""
+Tests that the hot lookups in scripts/check_query_plans.py are answered through indexes.
+
+Seeds a realistic volume of rows in a transaction that is rolled back
+afterwards, planner statistics included, and fails for every query that
+scans its table sequentially.
+"""
+
+from backend.scripts.check_query_plans import QUERIES, check_plans, seed
+
+
+def test_hot_queries_use_indexes(database):
+    with database() as conn:
+        try:
+            with conn.cursor() as cur:
+                seed(cur, orders=200000, employees=2000, items=2000)
+                chosen, failures = check_plans(cur)
+        finally:
+            conn.rollback()
+
+    assert set(chosen) == set(QUERIES)
+    assert failures == []
@@ -4,10 +4,20 @@ from .api.transactions import transactions_bp
 from .api.menuitems import menuitem_bp
 from .api.reports import reports_bp
 from .api.ingredients import ingredients_bp
+from .api.monitoring import monitoring_bp
 from .auth import oauth_bp, init_oauth
+from .api.admission import install_statement_budgets
+from .api.database import get_db_connection
+from .api.points import reconcile_points
+from .api.recommendations import refresh_recommendations
+from .api.rollups import backfill_line_totals, fold_rollups, rebuild_rollups, rollup_coverage
 from .models import db
+from .migrations import DB_AUTO_MIGRATE, MIGRATIONS, applied_versions, migrate
+from .partitioning import archive_partitions, backfill_order_timestamps, convert_to_partitions, ensure_partitions
 
 from flask_cors import CORS
+from datetime import datetime
+import click
 import os
 from dotenv import load_dotenv
 
@@ -33,11 +43,24 @@ def create_app():
 
     with app.app_context():
         db.create_all()
+
+    if DB_AUTO_MIGRATE:
+        # index builds are left to `flask migrate`, see migrations.py
+        with get_db_connection() as conn:
+            migrate(conn, concurrent=False)
         
+    install_statement_budgets(app)
     register_blueprints(app)
+    register_commands(app)
     app.register_blueprint(oauth_bp)
 
-    CORS(app, supports_credentials=True, origins=[os.getenv('FRONTEND_URL')])
+    # custom response headers the frontend may read
+    CORS(
+        app,
+        supports_credentials=True,
+        origins=[os.getenv('FRONTEND_URL')],
+        expose_headers=['X-Next-Cursor', 'Retry-After'],
+    )
 
     return app
 
@@ -53,6 +76,133 @@ def register_blueprints(app):
     app.register_blueprint(menuitem_bp)
     app.register_blueprint(reports_bp)
     app.register_blueprint(ingredients_bp)
+    app.register_blueprint(monitoring_bp)
+
+def register_commands(app):
+    """
+    Registers maintenance commands with the Flask CLI (run with `flask <command>`).
+    
+    Args:
+    - app: Flask application instance
+    """
+
+    @app.cli.command("reconcile-points")
+    def reconcile_points_command():
+        """Check loyalty balances against ledger entries added since the last run."""
+        with get_db_connection() as conn:
+            report = reconcile_points(conn)
+        print(
+            f"Processed {report['processed']} ledger entries for {report['checked']} users "
+            f"(watermark {report['watermark']}), {len(report['mismatches'])} mismatches"
+        )
+        for mismatch in report["mismatches"]:
+            print(mismatch)
+
+    @app.cli.command("migrate")
+    @click.option("--status", is_flag=True, help="List migrations and whether they are applied, without applying any.")
+    def migrate_command(status):
+        """Apply pending schema migrations."""
+        with get_db_connection() as conn:
+            if status:
+                applied = applied_versions(conn)
+                for migration in MIGRATIONS:
+                    state = "applied" if migration.version in applied else "pending"
+                    kind = "concurrent" if migration.concurrent else ""
+                    print(f"{migration.version:>4}  {state:<8} {kind:<10} {migration.description}")
+                return
+            versions = migrate(conn)
+        print(f"Applied {len(versions)} migration(s)" if versions else "Schema is up to date")
+
+    @app.cli.command("rebuild-rollups")
+    @click.option("--start", default=None, help="First hour to rebuild (ISO format); defaults to the oldest transaction.")
+    def rebuild_rollups_command(start):
+        """Recompute the hourly sales rollups from raw transactions."""
+        with get_db_connection() as conn:
+            if start is None:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT MIN(order_timestamp) FROM transactions")
+                    first = cur.fetchone()[0]
+                conn.commit()
+                if first is None:
+                    print("No transactions to roll up")
+                    return
+            else:
+                first = datetime.fromisoformat(start)
+            chunks = rebuild_rollups(conn, first)
+        print(f"Rebuilt {chunks} day(s) of rollups starting {first}")
+
+    @app.cli.command("fold-rollups")
+    @click.option("--batch-size", default=5000, show_default=True, help="Queued orders folded in per transaction.")
+    @click.option("--pause", default=0.0, show_default=True, help="Seconds to sleep between batches.")
+    def fold_rollups_command(batch_size, pause):
+        """Add the orders placed since the last run to the hourly sales rollups (run every minute or so)."""
+        with get_db_connection() as conn:
+            result = fold_rollups(conn, batch_size, pause)
+        print(f"Folded {result['orders']} order(s) into the rollups in {result['batches']} batch(es)")
+
+    @app.cli.command("backfill-line-totals")
+    @click.option("--batch-size", default=2000, show_default=True, help="Transaction IDs updated per transaction.")
+    @click.option("--pause", default=0.0, show_default=True, help="Seconds to sleep between batches.")
+    def backfill_line_totals_command(batch_size, pause):
+        """Record unit price and line total on order lines written before they were stored."""
+        with get_db_connection() as conn:
+            updated = backfill_line_totals(conn, batch_size, pause)
+            print(f"Priced {updated} order line(s)")
+            with conn.cursor() as cur:
+                coverage = rollup_coverage(cur)
+            conn.commit()
+            if coverage is not None:
+                # rollup hours built before the backfill still price at today's menu
+                chunks = rebuild_rollups(conn, coverage)
+                print(f"Rebuilt {chunks} day(s) of rollups starting {coverage}")
+
+    @app.cli.command("backfill-order-timestamps")
+    @click.option("--batch-size", default=2000, show_default=True, help="Transaction IDs updated per transaction.")
+    @click.option("--pause", default=0.0, show_default=True, help="Seconds to sleep between batches.")
+    def backfill_order_timestamps_command(batch_size, pause):
+        """Copy the order time onto order lines written before transaction_details stored it."""
+        with get_db_connection() as conn:
+            updated = backfill_order_timestamps(conn, batch_size, pause)
+        print(f"Stamped {updated} order line(s)")
+
+    @app.cli.command("refresh-recommendations")
+    @click.option("--batch-size", default=2000, show_default=True, help="Orders folded in per transaction.")
+    @click.option("--pause", default=0.0, show_default=True, help="Seconds to sleep between batches.")
+    @click.option("--rebuild", is_flag=True, help="Empty the recommendation tables and fold in every order again.")
+    def refresh_recommendations_command(batch_size, pause, rebuild):
+        """Fold new orders into the customer top items and bought-together counts (run every few minutes)."""
+        with get_db_connection() as conn:
+            result = refresh_recommendations(conn, batch_size, pause, rebuild)
+        print(f"Folded in {result['orders']} order(s) in {result['batches']} batch(es) (watermark {result['watermark']})")
+
+    @app.cli.group("partitions")
+    def partitions_group():
+        """Manage monthly partitions of transactions and transaction_details."""
+
+    @partitions_group.command("convert")
+    @click.option("--months-ahead", default=3, show_default=True, help="Future months to create partitions for.")
+    def convert_partitions_command(months_ahead):
+        """Convert both tables to monthly partitions (locks them; run in a maintenance window)."""
+        with get_db_connection() as conn:
+            result = convert_to_partitions(conn, months_ahead)
+        print(f"Copied {result['rows']} rows into {result['partitions']} monthly partitions per table")
+
+    @partitions_group.command("ensure")
+    @click.option("--months-ahead", default=3, show_default=True, help="Future months to create partitions for.")
+    def ensure_partitions_command(months_ahead):
+        """Create missing partitions for the coming months (run daily, e.g. from cron)."""
+        with get_db_connection() as conn:
+            created = ensure_partitions(conn, months_ahead)
+        print(f"Created {', '.join(created)}" if created else "All partitions exist")
+
+    @partitions_group.command("archive")
+    @click.option("--before", required=True, help="Archive months that end on or before this date (ISO format).")
+    @click.option("--schema", default="archive", show_default=True, help="Schema the detached partitions are moved to.")
+    def archive_partitions_command(before, schema):
+        """Detach old monthly partitions and move them to an archive schema."""
+        with get_db_connection() as conn:
+            archived = archive_partitions(conn, datetime.fromisoformat(before), schema)
+        print(f"Archived {', '.join(archived)}" if archived else "Nothing to archive")
 
 app = create_app()
 